@@ -2,12 +2,10 @@
 
 import pyodbc
 import os
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    # dotenv not available (that's okay in production)
-    pass
+import threading
+import time
+from collections import deque
+from flask import g, has_app_context
 DB_SERVER = os.getenv('DB_SERVER')
 DB_NAME = os.getenv('DB_NAME')
 DB_USER = os.getenv('DB_USER')
@@ -15,22 +13,341 @@ DB_PASSWORD = os.getenv('DB_PASSWORD')
 
 CONNECTION_STRING = f'Driver={{ODBC Driver 18 for SQL Server}};Server=tcp:{DB_SERVER},1433;Database={DB_NAME};Uid={DB_USER};Pwd={DB_PASSWORD};Encrypt=yes;TrustServerCertificate=no;Connection Timeout=30;'
 
-def get_db_connection():
+# Connection pool tuning
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+DB_POOL_MAX_AGE = float(os.getenv('DB_POOL_MAX_AGE', '1800'))
+DB_POOL_PING_IDLE = float(os.getenv('DB_POOL_PING_IDLE', '10'))
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes free within the checkout timeout"""
+
+
+class PooledConnection:
     """
-    Establish connection to Azure SQL Database
-    Returns: Connection object or None if connection fails
+    Thin wrapper around a pyodbc connection checked out from the pool.
+    close() hands the connection back to the pool instead of closing it,
+    and a wrapper that is garbage collected without close() is returned too.
+    """
+
+    def __init__(self, pool, conn, created_at):
+        self._pool = pool
+        self._conn = conn
+        self._created_at = created_at
+        self._pid = os.getpid()
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise pyodbc.ProgrammingError('Attempt to use a connection that was returned to the pool')
+        return getattr(self._conn, name)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn, self._created_at, self._pid)
+
+    def discard(self):
+        """
+        Close the connection instead of returning it to the pool
+        (for a session left in a state the next borrower must not inherit)
+        """
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.discard(conn, self._pid)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Bounded pool of pyodbc connections to Azure SQL.
+    - at most max_size connections exist at once (idle + in use)
+    - checkout waits up to timeout seconds for a free connection
+    - connections idle for longer than ping_idle seconds are pinged before use
+    - connections older than max_age seconds are closed instead of reused
+    - the pool is emptied in a forked child (gunicorn workers) so sockets are never shared
+    """
+
+    def __init__(self, connection_string, max_size=10, timeout=10, max_age=1800, ping_idle=10):
+        self.connection_string = connection_string
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.ping_idle = ping_idle
+        self._reset_state()
+
+    def _reset_state(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = deque()  # (conn, created_at, last_used)
+        self._in_use = 0
+        self._pid = os.getpid()
+        self._stats = {
+            'creations': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+            'recycled': 0,
+            'ping_failures': 0,
+            'discarded': 0
+        }
+
+    def reset_after_fork(self):
+        """
+        Forget every connection inherited from the parent process.
+        The parent still owns those sockets, so they are dropped without close().
+        """
+        self._reset_state()
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self.reset_after_fork()
+
+    def _ping(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except pyodbc.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except pyodbc.Error:
+            pass
+
+    def acquire(self):
+        """
+        Check out a connection, waiting for a free slot if the pool is full
+        Returns: PooledConnection
+        """
+        self._check_pid()
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+
+        while True:
+            candidate = None
+            with self._cond:
+                while not self._idle and self._in_use >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeoutError(f"No database connection available after {self.timeout}s")
+                    waited = True
+                    self._cond.wait(remaining)
+
+                # Reserve the slot, then validate or connect outside the lock
+                if self._idle:
+                    candidate = self._idle.pop()
+                self._in_use += 1
+
+            if candidate is None:
+                break
+
+            conn, created_at, last_used = candidate
+            now = time.monotonic()
+            if now - created_at > self.max_age:
+                self._give_back_slot(conn, 'recycled')
+                continue
+            if now - last_used > self.ping_idle and not self._ping(conn):
+                self._give_back_slot(conn, 'ping_failures')
+                continue
+
+            with self._cond:
+                self._record_checkout(start, waited)
+            return PooledConnection(self, conn, created_at)
+
+        try:
+            conn = pyodbc.connect(self.connection_string)
+        except Exception:
+            self._give_back_slot(None, None)
+            raise
+
+        with self._cond:
+            self._stats['creations'] += 1
+            self._record_checkout(start, waited)
+        return PooledConnection(self, conn, time.monotonic())
+
+    def _give_back_slot(self, conn, reason):
+        if conn is not None:
+            self._discard(conn)
+        with self._cond:
+            if reason:
+                self._stats[reason] += 1
+            self._in_use = max(self._in_use - 1, 0)
+            self._cond.notify()
+
+    def _record_checkout(self, start, waited):
+        self._stats['checkouts'] += 1
+        if waited:
+            wait_time = time.monotonic() - start
+            self._stats['waits'] += 1
+            self._stats['wait_time_total'] += wait_time
+            self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait_time)
+
+    def release(self, conn, created_at, owner_pid):
+        """
+        Return a raw connection to the pool, rolling back any open transaction
+        """
+        if owner_pid != os.getpid() or self._pid != owner_pid:
+            # Checked out before the fork - not ours to reuse
+            return
+
+        reusable = time.monotonic() - created_at <= self.max_age
+        if reusable:
+            try:
+                conn.rollback()
+            except pyodbc.Error:
+                reusable = False
+
+        if not reusable:
+            self._give_back_slot(conn, 'recycled')
+            return
+
+        with self._cond:
+            self._in_use = max(self._in_use - 1, 0)
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    def discard(self, conn, owner_pid):
+        """
+        Close a checked-out raw connection and free its slot
+        """
+        if owner_pid != os.getpid() or self._pid != owner_pid:
+            # Checked out before the fork - the parent still owns the socket
+            return
+        self._give_back_slot(conn, 'discarded')
+
+    def dispose(self):
+        """
+        Close every idle connection (used on shutdown)
+        """
+        with self._cond:
+            while self._idle:
+                conn, _, _ = self._idle.pop()
+                try:
+                    conn.close()
+                except pyodbc.Error:
+                    pass
+
+    def stats(self):
+        """
+        Snapshot of pool counters for tuning
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats['in_use'] = self._in_use
+            stats['idle'] = len(self._idle)
+            stats['max_size'] = self.max_size
+            stats['pid'] = self._pid
+            stats['wait_time_avg'] = stats['wait_time_total'] / stats['waits'] if stats['waits'] else 0.0
+            return stats
+
+
+_pool = ConnectionPool(
+    CONNECTION_STRING,
+    max_size=DB_POOL_SIZE,
+    timeout=DB_POOL_TIMEOUT,
+    max_age=DB_POOL_MAX_AGE,
+    ping_idle=DB_POOL_PING_IDLE
+)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_pool.reset_after_fork)
+
+
+class RequestConnection:
+    """
+    Request-scoped view of a pooled connection stored on flask.g.
+    close() is a no-op so helpers can keep calling close_db_connection;
+    the underlying connection goes back to the pool in teardown_appcontext.
     """
+
+    def __init__(self, pooled):
+        self._pooled = pooled
+
+    def __getattr__(self, name):
+        return getattr(self._pooled, name)
+
+    def close(self):
+        pass
+
+
+_session_stats = {'request_sessions': 0, 'request_session_reuses': 0}
+_session_stats_lock = threading.Lock()
+
+
+def _checkout_connection():
     try:
-        conn = pyodbc.connect(CONNECTION_STRING)
-        return conn
-    except pyodbc.Error as e:
+        return _pool.acquire()
+    except (pyodbc.Error, PoolTimeoutError) as e:
         print(f"Database Connection Error: {e}")
         return None
 
 
+def get_db_connection():
+    """
+    Get a connection to Azure SQL Database.
+    Inside a Flask app context every call shares one lazily opened connection
+    for the whole request; outside one (scripts, __main__ blocks) a connection
+    is checked out of the pool and returned by close_db_connection.
+    Returns: Connection object or None if connection fails
+    """
+    if not has_app_context():
+        return _checkout_connection()
+
+    request_conn = g.get('_db_request_conn')
+    if request_conn is not None:
+        with _session_stats_lock:
+            _session_stats['request_session_reuses'] += 1
+        return request_conn
+
+    pooled = _checkout_connection()
+    if not pooled:
+        return None
+
+    request_conn = RequestConnection(pooled)
+    g._db_request_conn = request_conn
+    with _session_stats_lock:
+        _session_stats['request_sessions'] += 1
+    return request_conn
+
+
+def get_dedicated_db_connection():
+    """
+    Check out a connection of its own, separate from the request-scoped one,
+    for work that outlives the request (e.g. a streaming response body).
+    The caller must return it with close_db_connection.
+    Returns: Connection object or None if connection fails
+    """
+    return _checkout_connection()
+
+
+def get_db_cursor():
+    """
+    Get a new cursor on the current request's connection
+    Returns: Cursor object or None if connection fails
+    """
+    conn = get_db_connection()
+    if not conn:
+        return None
+    return conn.cursor()
+
+
 def close_db_connection(conn):
     """
-    Close database connection safely
+    Return database connection to the pool safely
+    (no-op for the request-scoped connection, which is released at teardown)
     """
     try:
         if conn:
@@ -39,32 +356,53 @@ def close_db_connection(conn):
         print(f"Error closing connection: {e}")
 
 
+def release_request_connection(exception=None):
+    """
+    Release the request-scoped connection back to the pool.
+    Uncommitted work is rolled back by the pool on return.
+    """
+    request_conn = g.pop('_db_request_conn', None)
+    if request_conn is not None:
+        close_db_connection(request_conn._pooled)
+
+
+def init_db_session(app):
+    """
+    Register the teardown that releases the request-scoped connection
+    """
+    app.teardown_appcontext(release_request_connection)
+
+
+def get_pool_stats():
+    """
+    Get connection pool statistics (in use, idle, waits, creations)
+    plus request-scoped session counters
+    """
+    stats = _pool.stats()
+    with _session_stats_lock:
+        stats.update(_session_stats)
+    return stats
+
+
+def dispose_pool():
+    """
+    Close all idle pooled connections
+    """
+    _pool.dispose()
+
+
 def insert_user_log(user_id, username, email, action):
     """
-    Insert user activity log into UserLogs table
+    Queue user activity log for the background UserLogs writer
     Args: user_id, username, email, action ('Login' or 'Logout')
     """
     try:
-        conn = get_db_connection()
-        if not conn:
-            print(f"Failed to connect to database for logging")
-            return False
-        
-        cursor = conn.cursor()
-        
-        query = """
-            INSERT INTO UserLogs (UserID, UserName, UserEmail, Action, LogTime)
-            VALUES (?, ?, ?, ?, GETDATE())
-        """
-        
-        cursor.execute(query, (user_id, username, email, action))
-        conn.commit()
-        close_db_connection(conn)
-        
-        print(f"User log inserted: {username} - {action}")
-        return True
+        from Backend.DB_backend.user_log_writer import user_log_writer
+
+        accepted = user_log_writer.enqueue(user_id, username, email, action)
+        if not accepted:
+            print(f"User log dropped: {username} - {action}")
+        return accepted
     except Exception as e:
         print(f"Error inserting user log: {e}")
         return False
-    
-print(get_db_connection())
\ No newline at end of file
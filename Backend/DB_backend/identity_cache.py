@@ -0,0 +1,271 @@
+#identity_cache.py
+
+import os
+import threading
+import time
+from Backend.DB_backend.db_connection import get_db_connection, close_db_connection
+from Backend.cache_backend.shared_cache import shared_cache, invalidation_signal
+
+# Seconds a loaded copy of Users is trusted before a version check
+# (catches users added or changed outside the admin pages)
+IDENTITY_CACHE_TTL = int(os.getenv('IDENTITY_CACHE_TTL', '30'))
+# Seconds between load attempts while the database is failing (the last loaded copy is served meanwhile)
+IDENTITY_CACHE_RETRY_INTERVAL = int(os.getenv('IDENTITY_CACHE_RETRY_INTERVAL', '10'))
+
+IDENTITY_COLUMNS = ('UserID', 'UserEmail', 'UserName', 'DepartmentID', 'DepartmentName', 'Role')
+
+IDENTITY_VERSION_QUERY = """
+    SELECT COUNT(*), MAX(UserID),
+           CHECKSUM_AGG(BINARY_CHECKSUM(UserID, UserEmail, UserName, DepartmentID, DepartmentName, Role))
+    FROM Users
+"""
+
+IDENTITY_LOAD_QUERY = f"SELECT {', '.join(IDENTITY_COLUMNS)} FROM Users"
+
+IDENTITY_LOOKUP_QUERY = f"SELECT {', '.join(IDENTITY_COLUMNS)} FROM Users WHERE UserEmail = ?"
+
+
+class IdentityCache:
+    """
+    In-memory copy of every user's identity (email, name, department, role),
+    indexed by UserID and by email. Loaded in one query; after ttl seconds one
+    version query decides whether to reload. invalidate() (after a role change)
+    forces a reload on the next lookup and is broadcast to the other workers.
+    While one caller reloads, the others keep using the last loaded copy; after a
+    failed load, the next attempt waits retry_interval seconds.
+    """
+
+    def __init__(self, ttl=30, signal=None, retry_interval=10):
+        self.ttl = ttl
+        self.signal = signal
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._generation = 0  # bumped by invalidate(); a load only clears _stale if unchanged
+        self._by_id = {}
+        self._by_email = {}  # lower-cased email -> user (UserEmail comparisons are case-insensitive)
+        self._version = None
+        self._loaded = False
+        self._stale = True
+        self._checked_at = 0
+        self._checking = False
+        self._failed_at = 0
+        self._stats = {'loads': 0, 'load_errors': 0, 'version_checks': 0, 'version_changes': 0,
+                       'invalidations': 0, 'lookups': 0, 'misses': 0, 'stale_served': 0}
+
+    def _load(self):
+        """
+        Read every user in one round trip
+        Returns: True on success
+        """
+        with self._lock:
+            generation = self._generation
+        started = time.perf_counter()
+        try:
+            conn = get_db_connection()
+            if not conn:
+                raise RuntimeError('Database connection failed')
+
+            cursor = conn.cursor()
+            cursor.execute(IDENTITY_VERSION_QUERY)
+            version = tuple(cursor.fetchone())
+            cursor.execute(IDENTITY_LOAD_QUERY)
+            rows = cursor.fetchall()
+            close_db_connection(conn)
+        except Exception as e:
+            print(f"Error loading identity cache: {e}")
+            with self._lock:
+                self._stats['load_errors'] += 1
+                self._failed_at = time.time()
+            return False
+
+        by_id = {}
+        by_email = {}
+        for row in rows:
+            user = dict(zip(IDENTITY_COLUMNS, row))
+            by_id[user['UserID']] = user
+            if user['UserEmail']:
+                by_email[user['UserEmail'].lower()] = user
+
+        with self._lock:
+            self._by_id = by_id
+            self._by_email = by_email
+            self._version = version
+            self._loaded = True
+            self._stale = generation != self._generation
+            self._checked_at = time.time()
+            self._failed_at = 0
+            self._stats['loads'] += 1
+        shared_cache.record_fill('identity_cache', time.perf_counter() - started)
+        return True
+
+    def _check_version(self):
+        try:
+            conn = get_db_connection()
+            if not conn:
+                return
+            cursor = conn.cursor()
+            cursor.execute(IDENTITY_VERSION_QUERY)
+            version = tuple(cursor.fetchone())
+            close_db_connection(conn)
+        except Exception as e:
+            print(f"Error checking identity cache version: {e}")
+            with self._lock:
+                # Keep the current copy and check again after another ttl
+                self._checked_at = time.time()
+            return
+
+        with self._lock:
+            self._stats['version_checks'] += 1
+            self._checked_at = time.time()
+            if version != self._version:
+                self._stats['version_changes'] += 1
+                self._stale = True
+
+    def _ensure_fresh(self):
+        if self.signal is not None and self.signal.poll():
+            # A role was changed through another worker
+            self.invalidate(broadcast=False)
+
+        with self._lock:
+            self._stats['lookups'] += 1
+            stale = self._stale
+            check = (not stale and not self._checking
+                     and time.time() - self._checked_at > self.ttl)
+            if check:
+                # One caller checks; the rest keep using the current copy meanwhile
+                self._checking = True
+
+        if check:
+            try:
+                self._check_version()
+            finally:
+                with self._lock:
+                    self._checking = False
+                    stale = self._stale
+
+        if not stale:
+            return
+
+        with self._lock:
+            loaded = self._loaded
+            backing_off = time.time() - self._failed_at < self.retry_interval
+        # With a copy loaded, one caller reloads and the rest keep using it meanwhile;
+        # before the first load there is nothing to serve, so callers wait for that one load
+        if backing_off or not self._load_lock.acquire(blocking=not loaded):
+            if loaded:
+                with self._lock:
+                    self._stats['stale_served'] += 1
+            return
+        try:
+            with self._lock:
+                retry = self._stale and time.time() - self._failed_at >= self.retry_interval
+            if retry:
+                self._load()
+        finally:
+            self._load_lock.release()
+
+    def warm(self):
+        """
+        Load the cache now instead of on the first lookup
+        Returns: True if it is loaded
+        """
+        self._ensure_fresh()
+        return self.available()
+
+    def available(self):
+        """
+        Returns: True while the cache holds a current copy of Users (lookups returning None
+        then mean "no such user"); False before the first load and while a stale copy is served
+        """
+        with self._lock:
+            return self._loaded and not self._stale
+
+    def get_by_id(self, user_id):
+        """
+        Returns: copy of the user's identity dict, or None if unknown (or the cache could not be loaded)
+        """
+        self._ensure_fresh()
+        with self._lock:
+            user = self._by_id.get(user_id)
+            if user is None:
+                self._stats['misses'] += 1
+            return dict(user) if user else None
+
+    def get_by_email(self, email):
+        """
+        Returns: copy of the user's identity dict, or None if unknown (or the cache could not be loaded)
+        """
+        self._ensure_fresh()
+        with self._lock:
+            user = self._by_email.get((email or '').lower())
+            if user is None:
+                self._stats['misses'] += 1
+            return dict(user) if user else None
+
+    def invalidate(self, broadcast=True):
+        """
+        Force a reload on the next lookup (after a user's role or department changes)
+        """
+        with self._lock:
+            self._stale = True
+            self._generation += 1
+            self._stats['invalidations'] += 1
+        if broadcast and self.signal is not None:
+            self.signal.send()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['loaded'] = self._loaded
+            stats['stale'] = self._stale
+            stats['failed_seconds_ago'] = round(time.time() - self._failed_at, 1) if self._failed_at else None
+            stats['users'] = len(self._by_id)
+            stats['checked_seconds_ago'] = round(time.time() - self._checked_at, 1) if self._checked_at else None
+            return stats
+
+
+identity_cache = IdentityCache(
+    ttl=IDENTITY_CACHE_TTL,
+    signal=invalidation_signal('identity_cache'),
+    retry_interval=IDENTITY_CACHE_RETRY_INTERVAL
+)
+
+
+def lookup_user_by_email(email):
+    """
+    Find a user by email with one query, bypassing the cache
+    (for users added since the cache was last loaded)
+    Returns: identity dict or None
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError('Database connection failed')
+    cursor = conn.cursor()
+    cursor.execute(IDENTITY_LOOKUP_QUERY, (email,))
+    user = cursor.fetchone()
+    close_db_connection(conn)
+    return dict(zip(IDENTITY_COLUMNS, user)) if user else None
+
+
+def invalidate_identity_cache():
+    """
+    Call after writing to Users
+    """
+    identity_cache.invalidate()
+
+
+def start_identity_cache_warmup():
+    """
+    Load the identity cache on a background thread so startup is not delayed
+    """
+    thread = threading.Thread(target=identity_cache.warm, name='identity-cache-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def get_identity_cache_stats():
+    """
+    Get identity cache counters
+    """
+    return identity_cache.stats()
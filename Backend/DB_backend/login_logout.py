@@ -4,16 +4,14 @@ from flask import render_template, request, redirect, url_for, session, flash
 import msal
 import requests
 import os
+import threading
+import time
 
 from functools import wraps
 from Backend.DB_backend.db_connection import insert_user_log
+from Backend.DB_backend.identity_cache import identity_cache, lookup_user_by_email
+from Backend.http_backend.http_client import http_get, shared_http_client
 
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    # dotenv not available (that's okay in production)
-    pass
 
 AZURE_AD_CONFIG = {
     "client_id": os.getenv('SSO_CLIENT_ID'),
@@ -26,64 +24,197 @@ AZURE_AD_CONFIG = {
 
 AZURE_AD_CONFIG["authority"] = f"https://login.microsoftonline.com/{AZURE_AD_CONFIG['tenant']}"
 
+# Seconds of clock difference tolerated when checking ID token times
+ID_TOKEN_CLOCK_SKEW = int(os.getenv('ID_TOKEN_CLOCK_SKEW', '120'))
+
+GRAPH_ME_URL = 'https://graph.microsoft.com/v1.0/me?$select=id,displayName,mail,userPrincipalName'
+
+_msal_app = None
+_msal_app_lock = threading.Lock()
+
+_login_stats_lock = threading.Lock()
+_login_stats = {'claims': 0, 'graph': 0, 'invalid_claims': 0}
+
+# Session key -> Users column, kept in step with the identity cache on every request
+SESSION_IDENTITY_FIELDS = {
+    'email': 'UserEmail',
+    'username': 'UserName',
+    'role': 'Role',
+    'department_id': 'DepartmentID',
+    'department_name': 'DepartmentName'
+}
+
+
+class _LoginTokenCache(msal.TokenCache):
+    """
+    Token cache for the shared login app. A user's tokens are only used during
+    their callback, so none are kept (a shared cache would grow with every login)
+    """
+
+    def add(self, event, **kwargs):
+        pass
+
 
 def get_msal_app():
-    """Create MSAL app for Azure AD authentication"""
-    return msal.ConfidentialClientApplication(
-        AZURE_AD_CONFIG["client_id"],
-        authority=AZURE_AD_CONFIG["authority"],
-        client_credential=AZURE_AD_CONFIG["client_secret"]
+    """
+    MSAL app for Azure AD authentication, built once per process
+    (construction fetches the tenant's OpenID configuration)
+    """
+    global _msal_app
+    if _msal_app is None:
+        with _msal_app_lock:
+            if _msal_app is None:
+                _msal_app = msal.ConfidentialClientApplication(
+                    AZURE_AD_CONFIG["client_id"],
+                    authority=AZURE_AD_CONFIG["authority"],
+                    client_credential=AZURE_AD_CONFIG["client_secret"],
+                    token_cache=_LoginTokenCache(),
+                    http_client=shared_http_client
+                )
+    return _msal_app
+
+
+def _count_login(source):
+    with _login_stats_lock:
+        _login_stats[source] += 1
+
+
+def get_login_stats():
+    """
+    Get counts of logins resolved from ID token claims vs. the Graph /me fallback
+    """
+    with _login_stats_lock:
+        return dict(_login_stats)
+
+
+def validate_id_token_claims(claims, now=None):
+    """
+    Check the ID token claims returned with the code redemption (MSAL decodes them
+    but does not validate them). The token comes straight from the token endpoint
+    over TLS, so its signature is not checked again (OIDC Core 3.1.3.7)
+    Returns: reason string if the claims must not be trusted, None if they are valid
+    """
+    now = now or time.time()
+
+    audience = claims.get('aud')
+    if AZURE_AD_CONFIG['client_id'] not in (audience if isinstance(audience, list) else [audience]):
+        return 'audience does not match the client id'
+
+    tenant_id = claims.get('tid')
+    if not tenant_id:
+        return 'no tenant id'
+    if claims.get('iss') not in (f'https://login.microsoftonline.com/{tenant_id}/v2.0', f'https://sts.windows.net/{tenant_id}/'):
+        return 'unexpected issuer'
+    # The tenant may be configured by domain name; a GUID must match the token's tenant
+    configured_tenant = (AZURE_AD_CONFIG['tenant'] or '').lower()
+    if len(configured_tenant) == 36 and configured_tenant.count('-') == 4 and configured_tenant != tenant_id.lower():
+        return 'token issued by another tenant'
+
+    if not isinstance(claims.get('exp'), (int, float)) or claims['exp'] < now - ID_TOKEN_CLOCK_SKEW:
+        return 'expired'
+    if claims.get('nbf', 0) > now + ID_TOKEN_CLOCK_SKEW:
+        return 'not yet valid'
+    return None
+
+
+def get_identity_from_claims(token_response):
+    """
+    Resolve the signed-in user from the ID token claims in a token response
+    Returns: {'email', 'name', 'object_id', 'source'} or None if the claims are missing or invalid
+    'source' is the claim the email came from ('email' or 'preferred_username')
+    """
+    claims = token_response.get('id_token_claims')
+    if not claims:
+        return None
+
+    problem = validate_id_token_claims(claims)
+    if problem:
+        print(f"Ignoring ID token claims: {problem}")
+        _count_login('invalid_claims')
+        return None
+
+    for source in ('email', 'preferred_username'):
+        if claims.get(source):
+            return {
+                'email': claims[source],
+                'name': claims.get('name'),
+                'object_id': claims.get('oid'),
+                'source': source
+            }
+    return None
+
+
+def get_identity_from_graph(access_token):
+    """
+    Resolve the signed-in user from Microsoft Graph /me (one extra round trip)
+    Returns: {'email', 'name', 'object_id', 'source'} or None if the request fails
+    """
+    user_response = http_get(
+        GRAPH_ME_URL,
+        headers={
+            'Authorization': f"Bearer {access_token}",
+            'Content-Type': 'application/json'
+        }
     )
+    if user_response.status_code != 200:
+        return None
+
+    user_data = user_response.json()
+    return {
+        'email': user_data.get('mail') or user_data.get('userPrincipalName', ''),
+        'name': user_data.get('displayName'),
+        'object_id': user_data.get('id'),
+        'source': 'graph'
+    }
 
 
 def authenticate_user(email):
     """
-    Authenticate user by checking email against database
+    Authenticate user by checking email against the identity cache
+    (falls back to one query for users added since the cache was loaded)
     """
-    from Backend.DB_backend.db_connection import get_db_connection, close_db_connection
-    
     try:
-        conn = get_db_connection()
-        if not conn:
-            print("Failed to connect to database")
-            return None
-        
-        cursor = conn.cursor()
-        
-        query = """
-            SELECT UserID, UserEmail, UserName, DepartmentID, DepartmentName, Role 
-            FROM Users 
-            WHERE UserEmail = ?
-        """
-        
-        cursor.execute(query, (email,))
-        user = cursor.fetchone()
-        close_db_connection(conn)
-        
+        user = identity_cache.get_by_email(email)
         if user:
-            user_dict = {
-                'UserID': user[0],
-                'UserEmail': user[1],
-                'UserName': user[2],
-                'DepartmentID': user[3],
-                'DepartmentName': user[4],
-                'Role': user[5]
-            }
-            return user_dict
+            return user
         
-        return None
+        user = lookup_user_by_email(email)
+        if user:
+            # The cached copy of Users is out of date
+            identity_cache.invalidate(broadcast=False)
+        return user
     except Exception as e:
         print(f"Authentication Error: {e}")
         return None
 
 
+def revalidate_session():
+    """
+    Bring the session's role and department up to date from the identity cache,
+    so an admin's role change applies on the user's next request, not their next login
+    Returns: False if the user no longer exists (the session is cleared)
+    """
+    user = identity_cache.get_by_id(session['user_id'])
+    if user is None:
+        if identity_cache.available():
+            session.clear()
+            return False
+        # Users could not be loaded: keep what was read at login
+        return True
+    
+    for key, column in SESSION_IDENTITY_FIELDS.items():
+        if session.get(key) != user[column]:
+            session[key] = user[column]
+    return True
+
+
 def login_required(f):
     """
     Decorator to check if user is logged in
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        if 'user_id' not in session or not revalidate_session():
             flash('Please login first', 'warning')
             return redirect(url_for('login'))
         return f(*args, **kwargs)
@@ -96,7 +227,7 @@ def admin_required(f):
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        if 'user_id' not in session or not revalidate_session():
             flash('Please login first', 'warning')
             return redirect(url_for('login'))
         if session.get('role') not in ['admin', 'superuser']:
@@ -113,7 +244,7 @@ def admin_write_required(f):
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        if 'user_id' not in session or not revalidate_session():
             flash('Please login first', 'warning')
             return redirect(url_for('login'))
         if session.get('role') != 'admin':
@@ -174,27 +305,23 @@ def register_login_routes(app):
                 flash('No access token received', 'danger')
                 return redirect(url_for('login'))
             
-            headers = {
-                'Authorization': f"Bearer {token_response['access_token']}",
-                'Content-Type': 'application/json'
-            }
-            
-            user_response = requests.get(
-                'https://graph.microsoft.com/v1.0/me?$select=id,displayName,mail,userPrincipalName',
-                headers=headers,
-                timeout=5
-            )
-            
-            if user_response.status_code != 200:
-                flash('Failed to fetch user information', 'danger')
-                return redirect(url_for('login'))
-            
-            user_data = user_response.json()
-            user_email = user_data.get('mail') or user_data.get('userPrincipalName', '')
+            identity = get_identity_from_claims(token_response)
+            user = authenticate_user(identity['email']) if identity else None
             
-            user = authenticate_user(user_email)
+            # Graph /me only when the claims are unusable, or when they carried just the UPN
+            # (preferred_username), which can differ from the mail address Users is keyed on
+            if user is None and (identity is None or identity['source'] == 'preferred_username'):
+                graph_identity = get_identity_from_graph(token_response['access_token'])
+                if graph_identity is None and identity is None:
+                    flash('Failed to fetch user information', 'danger')
+                    return redirect(url_for('login'))
+                if graph_identity and (identity is None or graph_identity['email'].lower() != identity['email'].lower()):
+                    identity = graph_identity
+                    user = authenticate_user(identity['email'])
+            user_email = identity['email']
             
             if user:
+                _count_login('graph' if identity['source'] == 'graph' else 'claims')
                 session['user_id'] = user['UserID']
                 session['email'] = user['UserEmail']
                 session['username'] = user['UserName']
@@ -0,0 +1,173 @@
+#reference_cache.py
+
+import copy
+import os
+import threading
+import time
+from Backend.DB_backend.db_connection import get_db_connection, close_db_connection
+from Backend.cache_backend.shared_cache import shared_cache, invalidation_signal
+
+# After this many seconds a cached result is revalidated with one signature query
+REFERENCE_CACHE_TTL = int(os.getenv('REFERENCE_CACHE_TTL', '60'))
+
+# Change detector per cacheable table: row count and max id catch inserts and deletes,
+# the checksum catches in-place updates
+REFERENCE_TABLES = {
+    'Departments': (
+        "SELECT COUNT(*) FROM Departments",
+        "SELECT MAX(DepartmentID) FROM Departments",
+        "SELECT CHECKSUM_AGG(BINARY_CHECKSUM(*)) FROM Departments"
+    ),
+    'Dashboards': (
+        "SELECT COUNT(*) FROM Dashboards",
+        "SELECT MAX(DashboardID) FROM Dashboards",
+        "SELECT CHECKSUM_AGG(BINARY_CHECKSUM(*)) FROM Dashboards"
+    ),
+    'DepartmentDashboards': (
+        "SELECT COUNT(*) FROM DepartmentDashboards",
+        "SELECT MAX(DepartmentDashboardID) FROM DepartmentDashboards",
+        "SELECT CHECKSUM_AGG(BINARY_CHECKSUM(*)) FROM DepartmentDashboards"
+    )
+}
+
+
+def read_table_signature(tables):
+    """
+    Read the change detectors of several tables in one round trip
+    Returns: tuple of values (changes whenever any of the tables changes)
+    """
+    query = "SELECT " + ", ".join(f"({part})" for table in tables for part in REFERENCE_TABLES[table])
+
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError('Database connection failed')
+    cursor = conn.cursor()
+    cursor.execute(query)
+    signature = tuple(cursor.fetchone())
+    close_db_connection(conn)
+    return signature
+
+
+class ReferenceCache:
+    """
+    Read-through cache for results built from small, rarely changing tables.
+    Each entry names the tables it was read from; writes call invalidate(table)
+    to drop dependent entries at once, and entries older than ttl are
+    revalidated with a single signature query before being reloaded.
+    Invalidations are broadcast per table to the other workers.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._signals = {table: invalidation_signal(f"reference:{table}") for table in REFERENCE_TABLES}
+        self._lock = threading.Lock()
+        self._entries = {}  # name -> {'value', 'tables', 'signature', 'checked_at'}
+        self._load_locks = {}
+        self._generation = 0  # bumped by invalidate()
+        self._stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'reloads': 0, 'invalidations': 0}
+
+    def _load_lock(self, name):
+        with self._lock:
+            return self._load_locks.setdefault(name, threading.Lock())
+
+    def _fresh_value(self, name):
+        # Called with self._lock held
+        entry = self._entries.get(name)
+        if entry is not None and time.time() - entry['checked_at'] <= self.ttl:
+            self._stats['hits'] += 1
+            return entry
+        return None
+
+    def get(self, name, tables, loader, copy_result=True):
+        """
+        Return the cached result for name, calling loader() to fill it
+        tables: the REFERENCE_TABLES the loader reads from
+        Returns: a copy of the cached value (callers may modify it);
+        with copy_result=False the shared value itself, which must not be modified
+        """
+        result = copy.deepcopy if copy_result else (lambda value: value)
+        changed = [table for table in tables if self._signals[table].poll()]
+        if changed:
+            # Written through another worker
+            self.invalidate(*changed, broadcast=False)
+
+        with self._lock:
+            entry = self._fresh_value(name)
+        if entry is not None:
+            return result(entry['value'])
+
+        # One loader per name; concurrent callers wait and reuse its result
+        with self._load_lock(name):
+            with self._lock:
+                entry = self._fresh_value(name)
+                stale = self._entries.get(name)
+                generation = self._generation
+            if entry is not None:
+                return result(entry['value'])
+
+            signature = read_table_signature(tables)
+            if stale is not None and stale['signature'] == signature:
+                with self._lock:
+                    stale['checked_at'] = time.time()
+                    self._stats['revalidated'] += 1
+                return result(stale['value'])
+
+            started = time.perf_counter()
+            value = loader()
+            shared_cache.record_fill('reference_data', time.perf_counter() - started)
+            with self._lock:
+                self._entries[name] = {
+                    'value': value,
+                    'tables': tuple(tables),
+                    'signature': signature,
+                    # A write landed while loading: keep the value but revalidate on next use
+                    'checked_at': time.time() if generation == self._generation else 0
+                }
+                if stale is None:
+                    self._stats['misses'] += 1
+                else:
+                    self._stats['reloads'] += 1
+            return result(value)
+
+    def invalidate(self, *tables, broadcast=True):
+        """
+        Drop every entry read from any of the given tables (all entries if none given)
+        """
+        if broadcast:
+            for table in tables or REFERENCE_TABLES:
+                self._signals[table].send()
+        with self._lock:
+            names = [
+                name for name, entry in self._entries.items()
+                if not tables or set(entry['tables']) & set(tables)
+            ]
+            for name in names:
+                del self._entries[name]
+            self._generation += 1
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = {
+                name: round(time.time() - entry['checked_at'], 1)
+                for name, entry in self._entries.items()
+            }
+            return stats
+
+
+reference_cache = ReferenceCache(ttl=REFERENCE_CACHE_TTL)
+
+
+def invalidate_reference_data(*tables):
+    """
+    Call after writing to Departments, Dashboards or DepartmentDashboards
+    """
+    reference_cache.invalidate(*tables)
+
+
+def get_reference_cache_stats():
+    """
+    Get reference data cache counters (entries map to seconds since last validation)
+    """
+    return reference_cache.stats()
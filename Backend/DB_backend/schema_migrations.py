@@ -0,0 +1,132 @@
+#schema_migrations.py
+#
+# Idempotent schema changes the app's queries depend on. Run once per deployment,
+# before the new version takes traffic (each step checks whether it is needed, so
+# re-running is safe); the web workers never run DDL themselves:
+#
+#   python -m Backend.DB_backend.schema_migrations
+
+if __name__ == "__main__":
+    # Run from the command line: read .env before any settings are read (the app does this in app.py)
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        # dotenv not available (that's okay in production)
+        pass
+
+from Backend.DB_backend.db_connection import get_db_connection, close_db_connection
+
+# (name, statement) in the order they must run
+MIGRATIONS = (
+    (
+        # Keyset pagination of the user logs page (get_user_logs_page): newest first by (LogTime, LogID)
+        'IX_UserLogs_LogTime_LogID',
+        """
+        IF NOT EXISTS (SELECT 1 FROM sys.indexes
+                       WHERE name = 'IX_UserLogs_LogTime_LogID' AND object_id = OBJECT_ID('dbo.UserLogs'))
+            CREATE INDEX IX_UserLogs_LogTime_LogID ON dbo.UserLogs (LogTime DESC, LogID DESC)
+        """
+    ),
+    # UserLogs rollups and archive (user_log_maintenance); UserLogMaintenance goes last,
+    # its presence tells readers the rollup tables are ready
+    (
+        'UserLogRollupsHourly',
+        """
+        IF OBJECT_ID('dbo.UserLogRollupsHourly') IS NULL
+            CREATE TABLE dbo.UserLogRollupsHourly (
+                BucketStart DATETIME2(0) NOT NULL,
+                DepartmentID INT NULL,
+                Logins INT NOT NULL,
+                Logouts INT NOT NULL,
+                DistinctUsers INT NOT NULL,
+                INDEX CIX_UserLogRollupsHourly CLUSTERED (BucketStart, DepartmentID)
+            )
+        """
+    ),
+    (
+        'UserActivityDaily',
+        """
+        IF OBJECT_ID('dbo.UserActivityDaily') IS NULL
+            CREATE TABLE dbo.UserActivityDaily (
+                ActivityDate DATE NOT NULL,
+                UserID INT NOT NULL,
+                DepartmentID INT NULL,
+                Logins INT NOT NULL,
+                Logouts INT NOT NULL,
+                INDEX CIX_UserActivityDaily CLUSTERED (ActivityDate, UserID)
+            )
+        """
+    ),
+    (
+        'UserLogRollupsDaily',
+        """
+        IF OBJECT_ID('dbo.UserLogRollupsDaily') IS NULL
+            CREATE TABLE dbo.UserLogRollupsDaily (
+                ActivityDate DATE NOT NULL,
+                DepartmentID INT NULL,
+                Logins INT NOT NULL,
+                Logouts INT NOT NULL,
+                DistinctUsers INT NOT NULL,
+                INDEX CIX_UserLogRollupsDaily CLUSTERED (ActivityDate, DepartmentID)
+            )
+        """
+    ),
+    (
+        'UserLogsArchive',
+        """
+        IF OBJECT_ID('dbo.UserLogsArchive') IS NULL
+            CREATE TABLE dbo.UserLogsArchive (
+                LogID BIGINT NOT NULL,
+                UserID INT NULL,
+                UserName NVARCHAR(255) NULL,
+                UserEmail NVARCHAR(255) NULL,
+                Action NVARCHAR(50) NULL,
+                LogTime DATETIME2 NULL,
+                ArchivedAt DATETIME2 NOT NULL,
+                INDEX CIX_UserLogsArchive CLUSTERED (LogTime, LogID)
+            )
+        """
+    ),
+    (
+        'UserLogMaintenance',
+        """
+        IF OBJECT_ID('dbo.UserLogMaintenance') IS NULL
+            CREATE TABLE dbo.UserLogMaintenance (
+                JobName NVARCHAR(50) NOT NULL PRIMARY KEY,
+                RolledUpTo DATETIME2 NULL,
+                LastRunAt DATETIME2 NULL
+            )
+        """
+    ),
+)
+
+
+def run_migrations():
+    """
+    Apply every migration, each in its own transaction
+    Returns: list of migration names applied (or already in place)
+    Raises: RuntimeError if the database is unavailable; the failing statement's error otherwise
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError('Database connection failed')
+
+    applied = []
+    try:
+        cursor = conn.cursor()
+        for name, statement in MIGRATIONS:
+            cursor.execute(statement)
+            conn.commit()
+            applied.append(name)
+            print(f"Schema migration ok: {name}")
+        return applied
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        close_db_connection(conn)
+
+
+if __name__ == "__main__":
+    run_migrations()
@@ -0,0 +1,349 @@
+#session_store.py
+
+import os
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from flask.sessions import SessionInterface, SessionMixin
+from flask.json.tag import TaggedJSONSerializer
+from itsdangerous import Signer, BadSignature
+from werkzeug.datastructures import CallbackDict
+from Backend.cache_backend.private_files import private_data_dir, prepare_sqlite_file, check_private_file, O_NOFOLLOW
+
+# Session backend, a key of SESSION_STORES
+SESSION_STORE = os.getenv('SESSION_STORE', 'sqlite')
+# SQLite file on the container's local disk, shared by every gunicorn worker
+# (defaults to sessions.sqlite3 in the app's private data directory, APP_DATA_DIR)
+SESSION_STORE_PATH = os.getenv('SESSION_STORE_PATH')
+SESSION_STORE_BUSY_TIMEOUT = float(os.getenv('SESSION_STORE_BUSY_TIMEOUT', '5'))
+# Signing key for session cookies; must be the same on every replica
+SECRET_KEY = os.getenv('SECRET_KEY')
+# Without SECRET_KEY, a key is generated once and kept here for the workers on this host
+# (defaults to secret_key in APP_DATA_DIR)
+SECRET_KEY_FILE = os.getenv('SECRET_KEY_FILE')
+# An unchanged session's expiry is pushed forward at most once per this many seconds
+SESSION_TOUCH_INTERVAL = int(os.getenv('SESSION_TOUCH_INTERVAL', '300'))
+# Seconds between deletes of expired sessions (per worker)
+SESSION_PURGE_INTERVAL = int(os.getenv('SESSION_PURGE_INTERVAL', '600'))
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        sid TEXT PRIMARY KEY,
+        data BLOB NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions (expires_at);
+"""
+
+
+class SessionStore(ABC):
+    """
+    Storage for server-side sessions: opaque serialized data keyed by session id,
+    each record with an absolute expiry time. A networked store (Redis, a database
+    table) implements these methods and is added to SESSION_STORES so several
+    replicas can share sessions.
+    """
+
+    @abstractmethod
+    def load(self, sid):
+        """
+        Returns: (data bytes, expires_at) or None if the session is missing or expired
+        """
+
+    @abstractmethod
+    def save(self, sid, data, expires_at):
+        """
+        Store a session's data until expires_at (epoch seconds)
+        """
+
+    @abstractmethod
+    def touch(self, sid, expires_at):
+        """
+        Move an existing session's expiry without rewriting its data
+        """
+
+    @abstractmethod
+    def delete(self, sid):
+        """
+        Remove a session (no error if it is already gone)
+        """
+
+    @abstractmethod
+    def purge_expired(self):
+        """
+        Returns: number of expired sessions removed
+        """
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Session store in a local SQLite file (WAL mode), shared by every worker
+    process on this host. Replicas on other hosts need a networked store.
+    The file must be private to the app's user: anyone who can write to it can
+    create a session for any user and role.
+    """
+
+    def __init__(self, path, busy_timeout=5):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._schema_ready = False
+
+    def _connection(self):
+        if self._pid != os.getpid():
+            # Never use a parent's SQLite handles after fork
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self.path is None:
+                self.path = os.path.join(private_data_dir(), 'sessions.sqlite3')
+            # Refuses a file another user created or can write to
+            prepare_sqlite_file(self.path)
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with self._lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def load(self, sid):
+        return self._connection().execute(
+            "SELECT data, expires_at FROM sessions WHERE sid = ? AND expires_at > ?",
+            (sid, time.time())
+        ).fetchone()
+
+    def save(self, sid, data, expires_at):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)",
+            (sid, data, expires_at)
+        )
+
+    def touch(self, sid, expires_at):
+        self._connection().execute("UPDATE sessions SET expires_at = ? WHERE sid = ?", (expires_at, sid))
+
+    def delete(self, sid):
+        self._connection().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def purge_expired(self):
+        return self._connection().execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+
+
+SESSION_STORES = {
+    'sqlite': lambda: SQLiteSessionStore(SESSION_STORE_PATH, busy_timeout=SESSION_STORE_BUSY_TIMEOUT)
+}
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """
+    Session data held server-side; the cookie only carries the signed session id
+    """
+
+    def __init__(self, initial=None, sid=None, expires_at=0):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        # The user the session was loaded for; a different one after login means a new session id
+        self.loaded_user_id = self.get('user_id')
+        self.modified = False
+
+
+class ServerSessionInterface(SessionInterface):
+    """
+    Flask session interface backed by a SessionStore.
+    Expiry slides: each request moves it to now + PERMANENT_SESSION_LIFETIME, with
+    unchanged sessions touched at most once per touch_interval instead of rewritten.
+    The session id is replaced whenever the signed-in user changes (no fixation),
+    and expired sessions are purged on a background thread in each worker.
+    """
+
+    serializer = TaggedJSONSerializer()
+    salt = 'server-session'
+
+    def __init__(self, store, touch_interval=300, purge_interval=600):
+        self.store = store
+        self.touch_interval = touch_interval
+        self.purge_interval = purge_interval
+        self._lock = threading.Lock()
+        self._purger_pid = None
+        self._stats = {'loads': 0, 'misses': 0, 'bad_signatures': 0, 'saves': 0, 'touches': 0,
+                       'rotations': 0, 'deletes': 0, 'purged': 0, 'errors': 0}
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self._stats[counter] += amount
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt, key_derivation='hmac')
+
+    def _ensure_purger(self):
+        # One purge thread per worker process, started after any fork
+        if self._purger_pid == os.getpid():
+            return
+        with self._lock:
+            if self._purger_pid == os.getpid():
+                return
+            self._purger_pid = os.getpid()
+        thread = threading.Thread(target=self._purge_loop, name='session-purge', daemon=True)
+        thread.start()
+
+    def _purge_loop(self):
+        while True:
+            time.sleep(self.purge_interval)
+            try:
+                self._count('purged', self.store.purge_expired())
+            except Exception as e:
+                print(f"Error purging expired sessions: {e}")
+                self._count('errors')
+
+    def open_session(self, app, request):
+        self._ensure_purger()
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie:
+            return ServerSession()
+
+        try:
+            sid = self._signer(app).unsign(cookie).decode('utf-8')
+        except BadSignature:
+            self._count('bad_signatures')
+            return ServerSession()
+
+        try:
+            record = self.store.load(sid)
+        except Exception as e:
+            print(f"Error loading session: {e}")
+            self._count('errors')
+            return ServerSession()
+
+        if record is None:
+            self._count('misses')
+            return ServerSession()
+
+        data, expires_at = record
+        self._count('loads')
+        return ServerSession(self.serializer.loads(bytes(data).decode('utf-8')), sid=sid, expires_at=expires_at)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        try:
+            if not session:
+                if session.sid is not None:
+                    # Logged out (session cleared): drop the record and the cookie
+                    self.store.delete(session.sid)
+                    self._count('deletes')
+                    response.delete_cookie(name, domain=domain, path=path,
+                                           secure=self.get_cookie_secure(app),
+                                           samesite=self.get_cookie_samesite(app),
+                                           httponly=self.get_cookie_httponly(app))
+                return
+
+            now = time.time()
+            lifetime = app.permanent_session_lifetime.total_seconds()
+            rotate = session.sid is None or session.get('user_id') != session.loaded_user_id
+
+            if rotate:
+                if session.sid is not None:
+                    self.store.delete(session.sid)
+                    self._count('rotations')
+                session.sid = secrets.token_urlsafe(24)
+                session.loaded_user_id = session.get('user_id')
+
+            if rotate or session.modified:
+                self.store.save(session.sid, self.serializer.dumps(dict(session)).encode('utf-8'), now + lifetime)
+                self._count('saves')
+            elif session.expires_at - now < lifetime - self.touch_interval:
+                self.store.touch(session.sid, now + lifetime)
+                self._count('touches')
+            else:
+                return
+            session.expires_at = now + lifetime
+        except Exception as e:
+            print(f"Error saving session: {e}")
+            self._count('errors')
+            return
+
+        response.vary.add('Cookie')
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid.encode('utf-8')).decode('utf-8'),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['store'] = type(self.store).__name__
+            return stats
+
+
+server_session_interface = ServerSessionInterface(
+    SESSION_STORES[SESSION_STORE](),
+    touch_interval=SESSION_TOUCH_INTERVAL,
+    purge_interval=SESSION_PURGE_INTERVAL
+)
+
+
+def load_secret_key():
+    """
+    Stable session signing key: SECRET_KEY if set, otherwise one generated on first
+    start and kept in SECRET_KEY_FILE, so every worker on this host signs alike
+    Returns: key string
+    Raises: PermissionError if an existing key file is not private to this user
+    """
+    if SECRET_KEY:
+        return SECRET_KEY
+
+    key_file = SECRET_KEY_FILE or os.path.join(private_data_dir(), 'secret_key')
+    if not os.path.lexists(key_file):
+        # mkstemp creates a new 0600 file (O_EXCL, never an existing path or symlink)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(key_file) or '.', prefix='.secret_key.')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(secrets.token_hex(32))
+            # Atomic create-if-absent: the first worker's key wins
+            os.link(temp_path, key_file)
+            print(f"SECRET_KEY is not set; generated a session signing key in {key_file} "
+                  f"(set SECRET_KEY when running more than one replica)")
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(temp_path)
+
+    # A key someone else wrote would let them sign session cookies
+    check_private_file(key_file)
+    with os.fdopen(os.open(key_file, os.O_RDONLY | O_NOFOLLOW)) as f:
+        return f.read().strip()
+
+
+def init_server_sessions(app):
+    """
+    Keep sessions server-side (the cookie holds only a signed session id)
+    """
+    app.secret_key = load_secret_key()
+    app.session_interface = server_session_interface
+
+
+def get_session_stats():
+    """
+    Get session store counters for this worker
+    """
+    return server_session_interface.stats()
@@ -0,0 +1,355 @@
+#user_log_maintenance.py
+#
+# Rolls raw UserLogs events up into hourly/daily activity tables and moves rows
+# older than the retention window into UserLogsArchive, a batch at a time.
+# Runs on a background thread in every worker (only one holds the SQL Server app
+# lock at a time) or once from the command line. Its tables are created by
+# Backend.DB_backend.schema_migrations.
+#
+#   python -m Backend.DB_backend.user_log_maintenance
+
+if __name__ == "__main__":
+    # Run from the command line: read .env before any settings are read (the app does this in app.py)
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        # dotenv not available (that's okay in production)
+        pass
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from Backend.DB_backend.db_connection import get_dedicated_db_connection, close_db_connection
+
+# Seconds between maintenance runs in the background (0 disables the background job)
+USER_LOG_MAINTENANCE_INTERVAL = int(os.getenv('USER_LOG_MAINTENANCE_INTERVAL', '3600'))
+# Raw rows older than this many days are moved to UserLogsArchive (0 keeps them forever)
+USER_LOG_RETENTION_DAYS = int(os.getenv('USER_LOG_RETENTION_DAYS', '90'))
+# Rows moved per DELETE statement; kept below SQL Server's 5000-lock escalation threshold
+USER_LOG_ARCHIVE_BATCH_SIZE = int(os.getenv('USER_LOG_ARCHIVE_BATCH_SIZE', '2000'))
+USER_LOG_ARCHIVE_BATCH_PAUSE = float(os.getenv('USER_LOG_ARCHIVE_BATCH_PAUSE', '0.2'))
+USER_LOG_ARCHIVE_MAX_BATCHES = int(os.getenv('USER_LOG_ARCHIVE_MAX_BATCHES', '500'))
+# Hours are only rolled up once they ended this many seconds ago (the log writer inserts late)
+USER_LOG_ROLLUP_GRACE = int(os.getenv('USER_LOG_ROLLUP_GRACE', '600'))
+
+MAINTENANCE_JOB_NAME = 'UserLogs'
+MAINTENANCE_LOCK_RESOURCE = 'UserLogMaintenance'
+
+ACQUIRE_LOCK_QUERY = """
+    SET NOCOUNT ON;
+    DECLARE @result INT;
+    EXEC @result = sp_getapplock @Resource = ?, @LockMode = 'Exclusive', @LockOwner = 'Session', @LockTimeout = 0;
+    SELECT @result;
+"""
+
+RELEASE_LOCK_QUERY = "EXEC sp_releaseapplock @Resource = ?, @LockOwner = 'Session'"
+
+# Rollups for [?, ?): raw events bucketed by hour and department (the user's current department)
+ROLLUP_HOURLY_QUERIES = (
+    "DELETE FROM UserLogRollupsHourly WHERE BucketStart >= ? AND BucketStart < ?",
+    """
+    INSERT INTO UserLogRollupsHourly (BucketStart, DepartmentID, Logins, Logouts, DistinctUsers)
+    SELECT DATEADD(hour, DATEDIFF(hour, 0, ul.LogTime), 0), u.DepartmentID,
+           SUM(CASE WHEN ul.Action = 'Login' THEN 1 ELSE 0 END),
+           SUM(CASE WHEN ul.Action = 'Logout' THEN 1 ELSE 0 END),
+           COUNT(DISTINCT ul.UserID)
+    FROM UserLogs ul
+    LEFT JOIN Users u ON u.UserID = ul.UserID
+    WHERE ul.LogTime >= ? AND ul.LogTime < ?
+    GROUP BY DATEADD(hour, DATEDIFF(hour, 0, ul.LogTime), 0), u.DepartmentID
+    """
+)
+
+# Per-user activity for one day, rebuilt from the raw rows of [day start, ?)
+ROLLUP_USER_DAILY_QUERIES = (
+    "DELETE FROM UserActivityDaily WHERE ActivityDate = ?",
+    """
+    INSERT INTO UserActivityDaily (ActivityDate, UserID, DepartmentID, Logins, Logouts)
+    SELECT CAST(ul.LogTime AS date), ul.UserID, MAX(u.DepartmentID),
+           SUM(CASE WHEN ul.Action = 'Login' THEN 1 ELSE 0 END),
+           SUM(CASE WHEN ul.Action = 'Logout' THEN 1 ELSE 0 END)
+    FROM UserLogs ul
+    LEFT JOIN Users u ON u.UserID = ul.UserID
+    WHERE ul.LogTime >= ? AND ul.LogTime < ? AND ul.UserID IS NOT NULL
+    GROUP BY CAST(ul.LogTime AS date), ul.UserID
+    """
+)
+
+ROLLUP_DEPARTMENT_DAILY_QUERIES = (
+    "DELETE FROM UserLogRollupsDaily WHERE ActivityDate = ?",
+    """
+    INSERT INTO UserLogRollupsDaily (ActivityDate, DepartmentID, Logins, Logouts, DistinctUsers)
+    SELECT ActivityDate, DepartmentID, SUM(Logins), SUM(Logouts), COUNT(*)
+    FROM UserActivityDaily
+    WHERE ActivityDate = ?
+    GROUP BY ActivityDate, DepartmentID
+    """
+)
+
+SAVE_WATERMARK_QUERY = """
+    MERGE UserLogMaintenance AS target
+    USING (SELECT ? AS JobName, ? AS RolledUpTo) AS source
+    ON target.JobName = source.JobName
+    WHEN MATCHED THEN UPDATE SET RolledUpTo = source.RolledUpTo, LastRunAt = SYSUTCDATETIME()
+    WHEN NOT MATCHED THEN INSERT (JobName, RolledUpTo, LastRunAt) VALUES (source.JobName, source.RolledUpTo, SYSUTCDATETIME());
+"""
+
+# Moves one batch in a single statement, so a row is never in both tables or in neither
+ARCHIVE_BATCH_QUERY = """
+    DELETE TOP (?) FROM UserLogs
+    OUTPUT DELETED.LogID, DELETED.UserID, DELETED.UserName, DELETED.UserEmail, DELETED.Action, DELETED.LogTime, SYSUTCDATETIME()
+    INTO UserLogsArchive (LogID, UserID, UserName, UserEmail, Action, LogTime, ArchivedAt)
+    WHERE LogTime < ?
+"""
+
+
+def _floor_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _floor_day(value):
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class UserLogMaintenance:
+    """
+    Keeps the UserLogs activity rollups current and the raw table bounded.
+    - Rollups advance a watermark (UserLogMaintenance.RolledUpTo) one day-sized
+      chunk per transaction; readers combine rollups before the watermark with
+      raw rows after it.
+    - Archival only touches rows older than both the retention window and the
+      watermark's day, moving at most batch_size rows per short transaction.
+    A session-level app lock ensures a single runner across workers and hosts;
+    if releasing it fails, the connection is closed rather than pooled so the
+    lock dies with its session.
+    """
+
+    def __init__(self, interval=3600, retention_days=90, batch_size=2000, batch_pause=0.2,
+                 max_batches=500, grace=600):
+        self.interval = interval
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.max_batches = max_batches
+        self.grace = grace
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._thread = None
+        self._pid = os.getpid()
+        self._stop = threading.Event()
+        self._stats = {
+            'runs': 0,
+            'skipped_locked': 0,
+            'errors': 0,
+            'chunks_rolled_up': 0,
+            'rows_archived': 0,
+            'rolled_up_to': None,
+            'last_run_at': None,
+            'last_run_seconds': 0.0,
+            'last_error': None
+        }
+
+    def _roll_up(self, cursor, conn, now):
+        """
+        Roll raw events up to the last hour that ended more than grace seconds ago
+        Returns: the new watermark
+        """
+        target = _floor_hour(now - timedelta(seconds=self.grace))
+
+        cursor.execute("SELECT RolledUpTo FROM UserLogMaintenance WHERE JobName = ?", (MAINTENANCE_JOB_NAME,))
+        row = cursor.fetchone()
+        start = row[0] if row and row[0] else None
+        if start is None:
+            cursor.execute("SELECT MIN(LogTime) FROM UserLogs")
+            first = cursor.fetchone()[0]
+            start = _floor_hour(first) if first else target
+
+        while start < target:
+            # One day at most per transaction
+            day = _floor_day(start)
+            end = min(day + timedelta(days=1), target)
+
+            cursor.execute(ROLLUP_HOURLY_QUERIES[0], (start, end))
+            cursor.execute(ROLLUP_HOURLY_QUERIES[1], (start, end))
+            cursor.execute(ROLLUP_USER_DAILY_QUERIES[0], (day.date(),))
+            cursor.execute(ROLLUP_USER_DAILY_QUERIES[1], (day, end))
+            cursor.execute(ROLLUP_DEPARTMENT_DAILY_QUERIES[0], (day.date(),))
+            cursor.execute(ROLLUP_DEPARTMENT_DAILY_QUERIES[1], (day.date(),))
+            cursor.execute(SAVE_WATERMARK_QUERY, (MAINTENANCE_JOB_NAME, end))
+            conn.commit()
+
+            with self._lock:
+                self._stats['chunks_rolled_up'] += 1
+                self._stats['rolled_up_to'] = end.isoformat()
+            start = end
+
+        return start
+
+    def _archive(self, cursor, conn, now, rolled_up_to):
+        """
+        Move raw rows past the retention window to UserLogsArchive in batches
+        Returns: number of rows moved
+        """
+        if self.retention_days <= 0:
+            return 0
+        # Rows of the watermark's day are still needed to rebuild that day's rollups
+        cutoff = min(now - timedelta(days=self.retention_days), _floor_day(rolled_up_to))
+
+        moved = 0
+        for _ in range(self.max_batches):
+            if self._stop.is_set():
+                break
+            cursor.execute(ARCHIVE_BATCH_QUERY, (self.batch_size, cutoff))
+            count = cursor.rowcount
+            conn.commit()
+            moved += max(count, 0)
+            with self._lock:
+                self._stats['rows_archived'] += max(count, 0)
+            if count < self.batch_size:
+                break
+            # Let the log writer and readers in between batches
+            time.sleep(self.batch_pause)
+        return moved
+
+    def run_once(self):
+        """
+        Run one rollup + archival pass
+        Returns: {'ran': bool, 'rolled_up_to': str or None, 'archived': int}
+        """
+        # One pass at a time in this process; the app lock covers the other workers
+        if not self._run_lock.acquire(blocking=False):
+            return {'ran': False, 'rolled_up_to': None, 'archived': 0}
+        started = time.monotonic()
+        conn = None
+        locked = False
+        try:
+            conn = get_dedicated_db_connection()
+            if not conn:
+                raise RuntimeError('Database connection failed')
+            cursor = conn.cursor()
+            if not user_log_rollups_ready(cursor):
+                raise RuntimeError('Rollup tables are missing; run python -m Backend.DB_backend.schema_migrations')
+
+            cursor.execute(ACQUIRE_LOCK_QUERY, (MAINTENANCE_LOCK_RESOURCE,))
+            locked = cursor.fetchone()[0] >= 0
+            conn.commit()
+            if not locked:
+                with self._lock:
+                    self._stats['skipped_locked'] += 1
+                return {'ran': False, 'rolled_up_to': None, 'archived': 0}
+
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            rolled_up_to = self._roll_up(cursor, conn, now)
+            archived = self._archive(cursor, conn, now, rolled_up_to)
+
+            with self._lock:
+                self._stats['runs'] += 1
+                self._stats['last_run_at'] = now.isoformat()
+                self._stats['last_run_seconds'] = round(time.monotonic() - started, 3)
+            return {'ran': True, 'rolled_up_to': rolled_up_to.isoformat(), 'archived': archived}
+        except Exception as e:
+            print(f"Error in user log maintenance: {e}")
+            with self._lock:
+                self._stats['errors'] += 1
+                self._stats['last_error'] = str(e)
+            if conn:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+            return {'ran': False, 'rolled_up_to': None, 'archived': 0}
+        finally:
+            if conn:
+                released = not locked
+                if locked:
+                    try:
+                        conn.cursor().execute(RELEASE_LOCK_QUERY, (MAINTENANCE_LOCK_RESOURCE,))
+                        conn.commit()
+                        released = True
+                    except Exception as e:
+                        print(f"Error releasing user log maintenance lock: {e}")
+                if released:
+                    close_db_connection(conn)
+                else:
+                    # Closing the session releases its app lock; pooled, it would hold it indefinitely
+                    conn.discard()
+            self._run_lock.release()
+
+    def _run(self):
+        # First pass soon after startup, then every interval
+        if self._stop.wait(min(60, self.interval)):
+            return
+        while True:
+            self.run_once()
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        """
+        Start the background job (threads do not survive fork; call again in each worker)
+        """
+        with self._lock:
+            if self.interval <= 0:
+                return None
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return self._thread
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='user-log-maintenance', daemon=True)
+            self._thread.start()
+            return self._thread
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['interval'] = self.interval
+            stats['retention_days'] = self.retention_days
+            stats['running'] = self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+            return stats
+
+
+user_log_maintenance = UserLogMaintenance(
+    interval=USER_LOG_MAINTENANCE_INTERVAL,
+    retention_days=USER_LOG_RETENTION_DAYS,
+    batch_size=USER_LOG_ARCHIVE_BATCH_SIZE,
+    batch_pause=USER_LOG_ARCHIVE_BATCH_PAUSE,
+    max_batches=USER_LOG_ARCHIVE_MAX_BATCHES,
+    grace=USER_LOG_ROLLUP_GRACE
+)
+
+_rollups_ready = False
+
+
+def user_log_rollups_ready(cursor):
+    """
+    Check (with the caller's cursor) whether the rollup tables exist yet
+    Returns: True once schema_migrations has created them
+    """
+    global _rollups_ready
+    if not _rollups_ready:
+        cursor.execute("SELECT OBJECT_ID('dbo.UserLogMaintenance')")
+        _rollups_ready = cursor.fetchone()[0] is not None
+    return _rollups_ready
+
+
+def start_user_log_maintenance():
+    """
+    Start the background rollup/archival job in this process
+    """
+    return user_log_maintenance.start()
+
+
+def get_user_log_maintenance_stats():
+    """
+    Get user log rollup and archival counters
+    """
+    return user_log_maintenance.stats()
+
+
+if __name__ == "__main__":
+    print(user_log_maintenance.run_once())
@@ -0,0 +1,264 @@
+#user_log_writer.py
+
+import os
+import threading
+import time
+import atexit
+from collections import deque
+from datetime import datetime, timezone
+from Backend.DB_backend.db_connection import get_db_connection, close_db_connection
+
+
+USER_LOG_QUEUE_SIZE = int(os.getenv('USER_LOG_QUEUE_SIZE', '10000'))
+USER_LOG_BATCH_SIZE = int(os.getenv('USER_LOG_BATCH_SIZE', '200'))
+USER_LOG_FLUSH_INTERVAL = float(os.getenv('USER_LOG_FLUSH_INTERVAL', '2'))
+# drop_newest | drop_oldest | block | sync
+USER_LOG_OVERFLOW_POLICY = os.getenv('USER_LOG_OVERFLOW_POLICY', 'drop_oldest')
+USER_LOG_BLOCK_TIMEOUT = float(os.getenv('USER_LOG_BLOCK_TIMEOUT', '0.5'))
+USER_LOG_MAX_RETRIES = int(os.getenv('USER_LOG_MAX_RETRIES', '3'))
+
+OVERFLOW_POLICIES = ('drop_newest', 'drop_oldest', 'block', 'sync')
+
+INSERT_USER_LOG_QUERY = """
+    INSERT INTO UserLogs (UserID, UserName, UserEmail, Action, LogTime)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+
+def write_user_logs(rows):
+    """
+    Bulk insert user log rows into UserLogs in one round trip
+    Args: rows - list of (user_id, username, email, action, log_time)
+    Returns: True on success
+    """
+    conn = get_db_connection()
+    if not conn:
+        return False
+
+    try:
+        cursor = conn.cursor()
+        cursor.fast_executemany = True
+        cursor.executemany(INSERT_USER_LOG_QUERY, rows)
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error writing user logs batch: {e}")
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        return False
+    finally:
+        close_db_connection(conn)
+
+
+class UserLogWriter:
+    """
+    Background sink for UserLogs inserts.
+    Events go into a bounded in-process queue and a worker thread bulk-inserts
+    them when batch_size events are waiting or flush_interval seconds have passed.
+    When the queue is full the overflow policy decides what happens:
+    - drop_newest: reject the new event
+    - drop_oldest: discard the oldest queued event to make room
+    - block: wait up to block_timeout for room, then reject
+    - sync: write the event inline on the caller's thread
+    """
+
+    def __init__(self, max_size=10000, batch_size=200, flush_interval=2,
+                 overflow_policy='drop_oldest', block_timeout=0.5, max_retries=3):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.max_retries = max_retries
+        self._reset_state()
+        if hasattr(os, 'register_at_fork'):
+            # The worker thread does not survive fork, and the parent may have held the
+            # condition when it forked: start over in the child before anything else runs
+            os.register_at_fork(after_in_child=self._reset_state)
+
+    def _reset_state(self):
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._in_flight = 0
+        self._thread = None
+        self._stopping = False
+        self._flush_requested = False
+        self._pid = os.getpid()
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'failed_batches': 0,
+            'dropped_overflow': 0,
+            'dropped_error': 0,
+            'written_inline': 0,
+            'last_batch_size': 0,
+            'last_flush_seconds': 0.0
+        }
+
+    def _ensure_started(self):
+        # Called with self._cond held
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='user-log-writer', daemon=True)
+            self._thread.start()
+
+    def enqueue(self, user_id, username, email, action):
+        """
+        Queue one UserLogs event
+        Returns: True if the event was accepted (queued or written inline)
+        """
+        row = (user_id, username, email, action, datetime.now(timezone.utc).replace(tzinfo=None))
+
+        with self._cond:
+            self._ensure_started()
+
+            if len(self._queue) >= self.max_size:
+                if self.overflow_policy == 'drop_newest':
+                    self._stats['dropped_overflow'] += 1
+                    return False
+                if self.overflow_policy == 'drop_oldest':
+                    self._queue.popleft()
+                    self._stats['dropped_overflow'] += 1
+                elif self.overflow_policy == 'block':
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(self._queue) >= self.max_size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._stats['dropped_overflow'] += 1
+                            return False
+                        self._cond.wait(remaining)
+                # sync: fall through and write inline below
+
+            if len(self._queue) < self.max_size:
+                self._queue.append(row)
+                self._stats['enqueued'] += 1
+                if len(self._queue) >= self.batch_size:
+                    self._cond.notify_all()
+                return True
+
+        # sync policy with a full queue
+        if write_user_logs([row]):
+            with self._cond:
+                self._stats['written_inline'] += 1
+            return True
+        with self._cond:
+            self._stats['dropped_error'] += 1
+        return False
+
+    def _take_batch(self):
+        with self._cond:
+            deadline = time.monotonic() + self.flush_interval
+            while len(self._queue) < self.batch_size and not (self._stopping or self._flush_requested):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = []
+            while self._queue and len(batch) < self.batch_size:
+                batch.append(self._queue.popleft())
+            self._in_flight = len(batch)
+            if not self._queue:
+                self._flush_requested = False
+            if batch:
+                # Room was freed for producers blocked on a full queue
+                self._cond.notify_all()
+            return batch
+
+    def _write_batch(self, batch):
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            if write_user_logs(batch):
+                with self._cond:
+                    self._stats['written'] += len(batch)
+                    self._stats['batches'] += 1
+                    self._stats['last_batch_size'] = len(batch)
+                    self._stats['last_flush_seconds'] = time.monotonic() - start
+                return
+            attempt += 1
+            with self._cond:
+                self._stats['failed_batches'] += 1
+                if attempt > self.max_retries or self._stopping:
+                    self._stats['dropped_error'] += len(batch)
+                    print(f"Dropping {len(batch)} user log events after {attempt} failed attempts")
+                    return
+            time.sleep(min(2 ** attempt, 30))
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch:
+                self._write_batch(batch)
+            with self._cond:
+                self._in_flight = 0
+                self._cond.notify_all()
+                if self._stopping and not self._queue:
+                    return
+
+    def flush(self, timeout=10):
+        """
+        Wait until every queued event has been written (or timeout)
+        Returns: True if the queue drained in time
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                return not self._queue
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._queue or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def stop(self, timeout=10):
+        """
+        Flush remaining events and stop the worker thread (called on shutdown)
+        """
+        with self._cond:
+            if self._pid != os.getpid() or self._thread is None:
+                return
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        thread.join(timeout)
+
+    def stats(self):
+        """
+        Snapshot of queue depth and writer counters
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats['queue_depth'] = len(self._queue)
+            stats['in_flight'] = self._in_flight
+            stats['max_size'] = self.max_size
+            stats['overflow_policy'] = self.overflow_policy
+            stats['running'] = self._thread is not None and self._thread.is_alive()
+            return stats
+
+
+user_log_writer = UserLogWriter(
+    max_size=USER_LOG_QUEUE_SIZE,
+    batch_size=USER_LOG_BATCH_SIZE,
+    flush_interval=USER_LOG_FLUSH_INTERVAL,
+    overflow_policy=USER_LOG_OVERFLOW_POLICY,
+    block_timeout=USER_LOG_BLOCK_TIMEOUT,
+    max_retries=USER_LOG_MAX_RETRIES
+)
+
+atexit.register(user_log_writer.stop)
+
+
+def get_user_log_writer_stats():
+    """
+    Get background user log writer statistics (queue depth, dropped events)
+    """
+    return user_log_writer.stats()
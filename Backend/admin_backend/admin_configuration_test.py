@@ -3,6 +3,7 @@
 from flask import request, jsonify, session
 from Backend.DB_backend.login_logout import admin_required
 from Backend.powerbi_backend.embed_token_url import get_embed_token
+from Backend.powerbi_backend.msal_clients import configuration_client_registry
 
 
 def register_admin_configuration_routes(app):
@@ -62,6 +63,7 @@ def register_admin_configuration_routes(app):
             
             roles_to_use = [config_role] if config_role else ['RM']
             
+            timings = {}
             token, embed_url, workspace_name, report_name, error = get_embed_token(
                 client_id=client_id,
                 tenant_id=tenant_id,
@@ -71,7 +73,10 @@ def register_admin_configuration_routes(app):
                 core_dataset=core_dataset,
                 proxy_dataset=proxy_dataset,
                 username=username_to_use,
-                roles=roles_to_use
+                roles=roles_to_use,
+                client_registry=configuration_client_registry,
+                use_cache=False,
+                timings=timings
             )
             
             if error:
@@ -85,6 +90,7 @@ def register_admin_configuration_routes(app):
                 'report_name': report_name,
                 'username_used': username_to_use,
                 'role_used': roles_to_use[0],
+                'timings': timings,
                 'message': 'Embed token generated successfully!'
             }), 200
         
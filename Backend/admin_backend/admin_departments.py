@@ -1,15 +1,41 @@
 #admin_departments
 from Backend.DB_backend.db_connection import get_db_connection, close_db_connection
+from Backend.DB_backend.reference_cache import reference_cache
 
 
 def get_all_departments():
+    """
+    Fetch all departments (cached, see reference_cache)
+    """
+    try:
+        return reference_cache.get('departments', ('Departments',), _fetch_all_departments)
+    except Exception:
+        return []
+
+
+def get_departments_with_dashboards():
+    """
+    Fetch all departments with their accessible dashboards (cached, see reference_cache)
+    Returns a structured dictionary with departments and their dashboards
+    """
+    try:
+        return reference_cache.get(
+            'departments_with_dashboards',
+            ('Departments', 'Dashboards', 'DepartmentDashboards'),
+            _fetch_departments_with_dashboards
+        )
+    except Exception:
+        return []
+
+
+def _fetch_all_departments():
     """
     Fetch all departments from database
     """
     try:
         conn = get_db_connection()
         if not conn:
-            return []
+            raise RuntimeError('Database connection failed')
         
         cursor = conn.cursor()
         
@@ -34,18 +60,19 @@ def get_all_departments():
         return dept_list
     except Exception as e:
         print(f"Error fetching all departments: {e}")
-        return []
+        raise
 
 
-def get_departments_with_dashboards():
+def _fetch_departments_with_dashboards():
     """
-    Fetch all departments with their accessible dashboards
-    Returns a structured dictionary with departments and their dashboards
+    Fetch all departments with their accessible dashboards from database
+    Two bulk queries (departments, then every grant) grouped in Python,
+    so the cost does not grow with the number of departments
     """
     try:
         conn = get_db_connection()
         if not conn:
-            return []
+            raise RuntimeError('Database connection failed')
         
         cursor = conn.cursor()
         
@@ -58,6 +85,33 @@ def get_departments_with_dashboards():
         cursor.execute(dept_query)
         departments = cursor.fetchall()
         
+        dashboard_query = """
+            SELECT DISTINCT dd.DepartmentID, d.DashboardID, d.DashboardName, d.Status, d.Description, 
+                   d.CreatedBy, d.CreatedAt, dd.GrantedAt, dd.GrantedBy, d.DashboardOwner
+            FROM Dashboards d
+            INNER JOIN DepartmentDashboards dd ON d.DashboardID = dd.DashboardID
+            ORDER BY d.DashboardName
+        """
+        
+        cursor.execute(dashboard_query)
+        dashboards = cursor.fetchall()
+        close_db_connection(conn)
+        
+        # Rows arrive sorted by dashboard name, so each department's list keeps that order
+        dashboards_by_dept = {}
+        for dash in dashboards:
+            dashboards_by_dept.setdefault(dash[0], []).append({
+                'DashboardID': dash[1],
+                'DashboardName': dash[2],
+                'Status': dash[3],
+                'Description': dash[4],
+                'CreatedBy': dash[5],
+                'CreatedAt': dash[6],
+                'GrantedAt': dash[7],
+                'GrantedBy': dash[8],
+                'DashboardOwner': dash[9]
+            })
+        
         dept_dashboard_map = []
         
         for dept in departments:
@@ -65,31 +119,7 @@ def get_departments_with_dashboards():
             dept_name = dept[1]
             dept_created = dept[2]
             
-            dashboard_query = """
-                SELECT DISTINCT d.DashboardID, d.DashboardName, d.Status, d.Description, 
-                       d.CreatedBy, d.CreatedAt, dd.GrantedAt, dd.GrantedBy, d.DashboardOwner
-                FROM Dashboards d
-                INNER JOIN DepartmentDashboards dd ON d.DashboardID = dd.DashboardID
-                WHERE dd.DepartmentID = ?
-                ORDER BY d.DashboardName
-            """
-            
-            cursor.execute(dashboard_query, (dept_id,))
-            dashboards = cursor.fetchall()
-            
-            dashboard_list = []
-            for dash in dashboards:
-                dashboard_list.append({
-                    'DashboardID': dash[0],
-                    'DashboardName': dash[1],
-                    'Status': dash[2],
-                    'Description': dash[3],
-                    'CreatedBy': dash[4],
-                    'CreatedAt': dash[5],
-                    'GrantedAt': dash[6],
-                    'GrantedBy': dash[7],
-                    'DashboardOwner': dash[8]
-                })
+            dashboard_list = dashboards_by_dept.get(dept_id, [])
             
             dept_dashboard_map.append({
                 'DepartmentID': dept_id,
@@ -99,12 +129,11 @@ def get_departments_with_dashboards():
                 'Dashboards': dashboard_list
             })
         
-        close_db_connection(conn)
         return dept_dashboard_map
         
     except Exception as e:
         print(f"Error fetching departments with dashboards: {e}")
-        return []
+        raise
     
 if __name__=="__main__":
     print(get_all_departments())
@@ -0,0 +1,190 @@
+#admin_diagnostics
+
+from flask import jsonify
+from Backend.DB_backend.db_connection import get_pool_stats
+from Backend.DB_backend.user_log_writer import get_user_log_writer_stats
+from Backend.DB_backend.user_log_maintenance import get_user_log_maintenance_stats
+from Backend.http_backend.http_client import get_http_stats
+from Backend.DB_backend.login_logout import admin_required, get_login_stats
+from Backend.DB_backend.identity_cache import get_identity_cache_stats
+from Backend.DB_backend.session_store import get_session_stats
+from Backend.powerbi_backend.msal_clients import get_msal_client_stats
+from Backend.powerbi_backend.embed_token_cache import get_embed_token_cache_stats
+from Backend.powerbi_backend.embed_token_url import embed_token_single_flight
+from Backend.powerbi_backend.report_metadata_cache import get_report_metadata_cache_stats
+from Backend.powerbi_backend.embed_token_refresher import get_embed_session_stats
+from Backend.user_backend.acl_index import get_acl_index_stats
+from Backend.DB_backend.reference_cache import get_reference_cache_stats
+from Backend.cache_backend.shared_cache import get_shared_cache_stats
+from Backend.admin_backend.admin_events import get_admin_event_stats
+
+
+def register_admin_diagnostics_routes(app):
+    """Register admin diagnostics routes"""
+
+    @app.route('/admin/diagnostics/db-pool', methods=['GET'])
+    @admin_required
+    def db_pool_stats():
+        """
+        Database connection pool statistics for tuning
+        """
+        try:
+            return jsonify({'success': True, 'stats': get_pool_stats()}), 200
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/admin/diagnostics/log-writer', methods=['GET'])
+    @admin_required
+    def log_writer_stats():
+        """
+        Background user log writer statistics (queue depth, dropped events)
+        """
+        try:
+            return jsonify({'success': True, 'stats': get_user_log_writer_stats()}), 200
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/admin/diagnostics/log-maintenance', methods=['GET'])
+    @admin_required
+    def log_maintenance_stats():
+        """
+        UserLogs rollup watermark and archival counters
+        """
+        try:
+            return jsonify({'success': True, 'stats': get_user_log_maintenance_stats()}), 200
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/admin/diagnostics/admin-events', methods=['GET'])
+    @admin_required
+    def admin_event_stats():
+        """
+        Open admin event streams and fan-out counters for this worker
+        """
+        try:
+            return jsonify({'success': True, 'stats': get_admin_event_stats()}), 200
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/admin/diagnostics/login', methods=['GET'])
+    @admin_required
+    def login_stats():
+        """
+        Logins resolved from ID token claims vs. the Graph /me fallback
+        """
+        try:
+            return jsonify({'success': True, 'stats': get_login_stats()}), 200
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/admin/diagnostics/identity-cache', methods=['GET'])
+    @admin_required
+    def identity_cache_stats():
+        """
+        Cached Users identities and their reload/version-check counters
+        """
+        try:
+            return jsonify({'success': True, 'stats': get_identity_cache_stats()}), 200
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/admin/diagnostics/sessions', methods=['GET'])
+    @admin_required
+    def session_stats():
+        """
+        Server-side session loads, writes and purges for this worker
+        """
+        try:
+            return jsonify({'success': True, 'stats': get_session_stats()}), 200
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/admin/diagnostics/msal-clients', methods=['GET'])
+    @admin_required
+    def msal_client_stats():
+        """
+        AAD access token cache statistics per MSAL client registry
+        """
+        try:
+            return jsonify({'success': True, 'stats': get_msal_client_stats()}), 200
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/admin/diagnostics/embed-token-cache', methods=['GET'])
+    @admin_required
+    def embed_token_cache_stats():
+        """
+        Embed token cache hit/miss counters and request coalescing
+        """
+        try:
+            stats = get_embed_token_cache_stats()
+            stats['single_flight'] = embed_token_single_flight.stats()
+            return jsonify({'success': True, 'stats': stats}), 200
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/admin/diagnostics/embed-sessions', methods=['GET'])
+    @admin_required
+    def embed_session_stats():
+        """
+        Live embed sessions and background token refresh counters
+        """
+        try:
+            return jsonify({'success': True, 'stats': get_embed_session_stats()}), 200
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/admin/diagnostics/acl-index', methods=['GET'])
+    @admin_required
+    def acl_index_stats():
+        """
+        Dashboard ACL index size, reloads and version checks
+        """
+        try:
+            return jsonify({'success': True, 'stats': get_acl_index_stats()}), 200
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/admin/diagnostics/reference-cache', methods=['GET'])
+    @admin_required
+    def reference_cache_stats():
+        """
+        Reference data (departments, dashboards, permissions) cache counters
+        """
+        try:
+            return jsonify({'success': True, 'stats': get_reference_cache_stats()}), 200
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/admin/diagnostics/shared-cache', methods=['GET'])
+    @admin_required
+    def shared_cache_stats():
+        """
+        Cross-worker cache hit ratios and fill costs per worker
+        """
+        try:
+            return jsonify({'success': True, 'stats': get_shared_cache_stats()}), 200
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/admin/diagnostics/report-metadata-cache', methods=['GET'])
+    @admin_required
+    def report_metadata_cache_stats():
+        """
+        Report metadata cache counters
+        """
+        try:
+            return jsonify({'success': True, 'stats': get_report_metadata_cache_stats()}), 200
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/admin/diagnostics/http', methods=['GET'])
+    @admin_required
+    def http_stats():
+        """
+        Outbound HTTP latency and connection reuse per host
+        """
+        try:
+            return jsonify({'success': True, 'stats': get_http_stats()}), 200
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
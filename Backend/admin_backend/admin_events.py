@@ -0,0 +1,291 @@
+#admin_events
+
+import json
+import os
+import queue
+import threading
+import time
+from flask import Response, jsonify, session, request, get_template_attribute
+from Backend.DB_backend.login_logout import admin_required
+from Backend.cache_backend.shared_cache import shared_cache
+from Backend.admin_backend.admin_json import json_value
+
+# Open event streams allowed per worker (each one holds a server thread)
+ADMIN_EVENTS_MAX_CONNECTIONS = int(os.getenv('ADMIN_EVENTS_MAX_CONNECTIONS', '20'))
+# Events buffered per stream; a stream that falls further behind is told to resync
+ADMIN_EVENTS_QUEUE_SIZE = int(os.getenv('ADMIN_EVENTS_QUEUE_SIZE', '100'))
+# Seconds between reads of the shared event log (one reader per worker, not per stream)
+ADMIN_EVENTS_POLL_INTERVAL = float(os.getenv('ADMIN_EVENTS_POLL_INTERVAL', '0.5'))
+ADMIN_EVENTS_KEEPALIVE = int(os.getenv('ADMIN_EVENTS_KEEPALIVE', '15'))
+# Streams are closed after this many seconds; the browser reconnects with Last-Event-ID
+ADMIN_EVENTS_MAX_LIFETIME = int(os.getenv('ADMIN_EVENTS_MAX_LIFETIME', '300'))
+
+EVENT_CHANNEL = 'admin_changes'
+
+# Row macro in admin_rows.html per kind of changed row
+ROW_MACROS = {
+    'dashboard': 'dashboard_row',
+    'permission': 'permission_row',
+    'user': 'user_row'
+}
+
+# Row HTML differs between full admins and read-only superusers
+ROLE_VARIANTS = ('admin', 'superuser')
+
+
+def _role_variant(role):
+    return 'superuser' if role == 'superuser' else 'admin'
+
+
+def serialize_row(row):
+    """
+    Returns: copy of a row dict that json.dumps accepts
+    """
+    return {key: json_value(value) for key, value in row.items()} if row else None
+
+
+def render_admin_row(kind, row, role=None):
+    """
+    Render a changed row with the admin_rows.html macro for its kind
+    (role defaults to the current user's)
+    Returns: HTML string
+    """
+    if role is None:
+        role = session.get('role')
+    macro = get_template_attribute('admin/admin_rows.html', ROW_MACROS[kind])
+    return str(macro(row, _role_variant(role)))
+
+
+def format_event(event_id, event, variant):
+    """
+    Returns: the SSE message for an event, with the row HTML for one role variant
+    """
+    payload = dict(event, id=event_id, html=event['html'].get(variant))
+    return f"id: {event_id}\nevent: change\ndata: {json.dumps(payload)}\n\n"
+
+
+class EventStream:
+    """
+    One open event stream: a bounded queue of formatted SSE messages
+    """
+
+    def __init__(self, variant, queue_size):
+        self.variant = variant
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def offer(self, message):
+        """
+        Returns: False (and marks the stream for resync) if the queue is full
+        """
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except queue.Full:
+            self.overflowed = True
+            return False
+
+
+class AdminEventBus:
+    """
+    Fans admin change events out to open event streams.
+    Events are appended to a shared log (so every worker sees them); one poller
+    thread per worker reads the log and hands each event, formatted once per
+    role variant, to the streams' bounded queues. A stream whose queue is full
+    gets a resync event and is closed instead of buffering without limit.
+    """
+
+    def __init__(self, max_connections=20, queue_size=100, poll_interval=0.5):
+        self.max_connections = max_connections
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._reset_state()
+
+    def _reset_state(self):
+        self._streams = set()
+        self._last_id = None
+        self._local_id = 0
+        self._thread = None
+        self._pid = os.getpid()
+        self._stats = {'published': 0, 'delivered': 0, 'resyncs': 0, 'rejected': 0, 'streams_opened': 0}
+
+    def _check_pid(self):
+        # Called with self._lock held; threads and queues do not survive fork
+        if self._pid != os.getpid():
+            self._reset_state()
+
+    def publish(self, kind, action, key, row=None, stale_tabs=(), actor=None):
+        """
+        Publish a change to every open admin page
+        kind: 'dashboard' | 'permission' | 'user'; action: 'created' | 'updated' | 'deleted'
+        key: the row's id; row: the changed row (None for deletes)
+        stale_tabs: other admin tabs whose content the change affects
+        Must run inside a request (row HTML is rendered from admin_rows.html)
+        Returns: the event id
+        """
+        html = {}
+        if row is not None:
+            html = {variant: render_admin_row(kind, row, variant) for variant in ROLE_VARIANTS}
+        event = {
+            'kind': kind,
+            'action': action,
+            'key': key,
+            'row': serialize_row(row),
+            'html': html,
+            'stale_tabs': list(stale_tabs),
+            'actor': actor,
+            'at': time.time()
+        }
+
+        event_id = shared_cache.append_event(EVENT_CHANNEL, event)
+        with self._lock:
+            self._check_pid()
+            self._stats['published'] += 1
+            if event_id is None:
+                # No shared log: only this worker's streams can be reached
+                self._local_id += 1
+                event_id = self._local_id
+                self._dispatch(event_id, event)
+        return event_id
+
+    def _dispatch(self, event_id, event):
+        # Called with self._lock held
+        messages = {variant: format_event(event_id, event, variant) for variant in ROLE_VARIANTS}
+        for stream in self._streams:
+            if stream.offer(messages[stream.variant]):
+                self._stats['delivered'] += 1
+            else:
+                self._stats['resyncs'] += 1
+
+    def _poll(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                if self._pid != os.getpid() or not self._streams:
+                    self._thread = None
+                    return
+                last_id = self._last_id
+            events = shared_cache.read_events(EVENT_CHANNEL, last_id, limit=self.queue_size)
+            if not events:
+                continue
+            with self._lock:
+                for event_id, event in events:
+                    self._dispatch(event_id, event)
+                self._last_id = events[-1][0]
+
+    def subscribe(self, role, last_event_id=None):
+        """
+        Open a stream for a viewer with the given role
+        last_event_id: resume after this event (sent by EventSource when it reconnects)
+        Returns: EventStream, or None when this worker is at max_connections
+        """
+        stream = EventStream(_role_variant(role), self.queue_size)
+        bounds = shared_cache.event_bounds(EVENT_CHANNEL)
+        with self._lock:
+            self._check_pid()
+            if len(self._streams) >= self.max_connections:
+                self._stats['rejected'] += 1
+                return None
+            if self._last_id is None:
+                self._last_id = bounds[1] if bounds else 0
+            resume_to = self._last_id
+
+            if last_event_id is not None and bounds is not None and last_event_id < resume_to:
+                # Replay what the page missed while reconnecting, if the log still holds all of it
+                missed = []
+                if last_event_id + 1 >= bounds[0]:
+                    missed = shared_cache.read_events(EVENT_CHANNEL, last_event_id, limit=self.queue_size) or []
+                    missed = [(event_id, event) for event_id, event in missed if event_id <= resume_to]
+                if not missed or missed[-1][0] < resume_to:
+                    stream.overflowed = True
+                for event_id, event in missed:
+                    stream.offer(format_event(event_id, event, stream.variant))
+
+            self._streams.add(stream)
+            self._stats['streams_opened'] += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._poll, name='admin-events', daemon=True)
+                self._thread.start()
+        return stream
+
+    def unsubscribe(self, stream):
+        with self._lock:
+            self._streams.discard(stream)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open_streams'] = len(self._streams) if self._pid == os.getpid() else 0
+            stats['max_connections'] = self.max_connections
+            stats['poller_running'] = self._thread is not None and self._thread.is_alive()
+            return stats
+
+
+admin_event_bus = AdminEventBus(
+    max_connections=ADMIN_EVENTS_MAX_CONNECTIONS,
+    queue_size=ADMIN_EVENTS_QUEUE_SIZE,
+    poll_interval=ADMIN_EVENTS_POLL_INTERVAL
+)
+
+
+def publish_admin_event(kind, action, key, row=None, stale_tabs=()):
+    """
+    Publish an admin change made by the current user (errors are logged, never raised:
+    the write has already been committed)
+    """
+    try:
+        return admin_event_bus.publish(kind, action, key, row=row, stale_tabs=stale_tabs, actor=session.get('username'))
+    except Exception as e:
+        print(f"Error publishing admin {kind} event: {e}")
+        return None
+
+
+def get_admin_event_stats():
+    """
+    Get admin event stream counters for this worker
+    """
+    return admin_event_bus.stats()
+
+
+def stream_admin_events(stream, keepalive=15, max_lifetime=300):
+    """
+    Yield SSE messages from a stream until it overflows or reaches max_lifetime
+    """
+    deadline = time.monotonic() + max_lifetime
+    try:
+        # Reconnect delay for the browser's EventSource
+        yield "retry: 3000\n\n"
+        while time.monotonic() < deadline:
+            if stream.overflowed:
+                yield "event: resync\ndata: {}\n\n"
+                return
+            try:
+                yield stream.queue.get(timeout=keepalive)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+    finally:
+        admin_event_bus.unsubscribe(stream)
+
+
+def register_admin_event_routes(app):
+    """Register admin change event routes"""
+
+    @app.route('/admin/events', methods=['GET'])
+    @admin_required
+    def admin_events():
+        """
+        Server-Sent Events stream of admin changes (dashboards, permissions, user roles)
+        """
+        last_event_id = request.headers.get('Last-Event-ID', type=int)
+        stream = admin_event_bus.subscribe(session.get('role'), last_event_id)
+        if stream is None:
+            response = jsonify({'success': False, 'error': 'Too many open admin event streams'})
+            response.headers['Retry-After'] = '30'
+            return response, 503
+
+        body = stream_admin_events(stream, ADMIN_EVENTS_KEEPALIVE, ADMIN_EVENTS_MAX_LIFETIME)
+        return Response(body, mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-store',
+            'X-Accel-Buffering': 'no'
+        })
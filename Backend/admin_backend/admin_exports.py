@@ -0,0 +1,191 @@
+#admin_exports
+
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import datetime
+from flask import request, jsonify, session, Response
+from Backend.DB_backend.db_connection import get_dedicated_db_connection, close_db_connection
+from Backend.DB_backend.login_logout import admin_required
+from Backend.admin_backend.admin_overview import parse_log_date
+from Backend.admin_backend.admin_json import json_value
+
+# Rows read from the database per fetchmany call (memory use is bounded by this, not by table size)
+EXPORT_FETCH_SIZE = int(os.getenv('EXPORT_FETCH_SIZE', '1000'))
+EXPORT_GZIP_LEVEL = int(os.getenv('EXPORT_GZIP_LEVEL', '6'))
+
+# Exportable datasets: columns, the column the date range filters on, and a stable order
+EXPORTS = {
+    'user-logs': {
+        'table': 'UserLogs',
+        'columns': ('LogID', 'UserID', 'UserName', 'UserEmail', 'Action', 'LogTime'),
+        'date_column': 'LogTime',
+        'order_by': 'LogTime, LogID'
+    },
+    'user-logs-archive': {
+        'table': 'UserLogsArchive',
+        'columns': ('LogID', 'UserID', 'UserName', 'UserEmail', 'Action', 'LogTime', 'ArchivedAt'),
+        'date_column': 'LogTime',
+        'order_by': 'LogTime, LogID'
+    },
+    'users': {
+        'table': 'Users',
+        'columns': ('UserID', 'UserEmail', 'UserName', 'DepartmentID', 'DepartmentName', 'Role', 'CreatedAt'),
+        'date_column': 'CreatedAt',
+        'order_by': 'UserID'
+    }
+}
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+
+def format_csv_rows(columns, rows, header=False):
+    """
+    Returns: CSV text for the rows (with a header line first if header is set)
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def format_ndjson_rows(columns, rows, header=False):
+    """
+    Returns: one JSON object per line for the rows
+    """
+    return ''.join(
+        json.dumps({column: json_value(value) for column, value in zip(columns, row)}) + '\n'
+        for row in rows
+    )
+
+
+FORMATTERS = {
+    'csv': format_csv_rows,
+    'ndjson': format_ndjson_rows
+}
+
+
+def open_export_cursor(dataset, date_from=None, date_to=None):
+    """
+    Run the export query for a dataset on a dedicated connection
+    date_from: inclusive lower bound, date_to: exclusive upper bound
+    Returns: (connection, cursor) - the caller closes the connection when done
+    Raises: RuntimeError if the database is unavailable
+    """
+    export = EXPORTS[dataset]
+    conditions = []
+    params = []
+    if date_from is not None:
+        conditions.append(f"{export['date_column']} >= ?")
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append(f"{export['date_column']} < ?")
+        params.append(date_to)
+    
+    query = f"""
+        SELECT {", ".join(export['columns'])}
+        FROM {export['table']}
+        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+        ORDER BY {export['order_by']}
+    """
+    
+    conn = get_dedicated_db_connection()
+    if not conn:
+        raise RuntimeError('Database connection failed')
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+    except Exception:
+        close_db_connection(conn)
+        raise
+    return conn, cursor
+
+
+def stream_export(conn, cursor, columns, export_format, compress=False, fetch_size=1000):
+    """
+    Yield the cursor's rows as CSV or NDJSON, fetch_size rows at a time,
+    gzip-compressed if compress is set; the connection is closed at the end
+    (also when the client disconnects and the generator is closed early)
+    """
+    formatter = FORMATTERS[export_format]
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None
+    
+    def text_chunks():
+        # CSV header line (nothing for NDJSON), then one chunk per fetchmany
+        yield formatter(columns, [], header=True)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                return
+            yield formatter(columns, rows)
+    
+    try:
+        for text in text_chunks():
+            chunk = text.encode('utf-8')
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+        if compressor is not None:
+            yield compressor.flush()
+    except Exception as e:
+        # Headers are already sent; the truncated download is the only signal left
+        print(f"Error streaming export: {e}")
+    finally:
+        close_db_connection(conn)
+
+
+def register_admin_exports_routes(app):
+    """Register admin export routes"""
+    
+    @app.route('/admin/export/<dataset>', methods=['GET'])
+    @admin_required
+    def export_dataset(dataset):
+        """
+        Stream a full export of UserLogs ('user-logs'), rows moved out of it by the
+        retention job ('user-logs-archive') or Users ('users')
+        Query: format (csv | ndjson), date_from, date_to (YYYY-MM-DD or ISO datetime, UTC), gzip (1 to compress)
+        """
+        if dataset not in EXPORTS:
+            return jsonify({'success': False, 'error': f'Unknown export: {dataset}'}), 404
+        
+        export_format = request.args.get('format', 'csv').strip().lower()
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'success': False, 'error': f'Invalid format: {export_format}'}), 400
+        
+        try:
+            date_from = parse_log_date(request.args.get('date_from', '').strip())
+            date_to = parse_log_date(request.args.get('date_to', '').strip(), end_of_day=True)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': f'Invalid date: {e}'}), 400
+        
+        compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+        
+        try:
+            conn, cursor = open_export_cursor(dataset, date_from, date_to)
+        except Exception as e:
+            print(f"Error starting {dataset} export: {e}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+        
+        print(f"Export of {dataset} ({export_format}) started by {session.get('username')}")
+        
+        filename = f"{dataset}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+        mimetype = EXPORT_FORMATS[export_format]
+        if compress:
+            filename += '.gz'
+            mimetype = 'application/gzip'
+        
+        body = stream_export(conn, cursor, EXPORTS[dataset]['columns'], export_format,
+                             compress=compress, fetch_size=EXPORT_FETCH_SIZE)
+        return Response(body, mimetype=mimetype, headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Cache-Control': 'no-store',
+            'X-Accel-Buffering': 'no'
+        })
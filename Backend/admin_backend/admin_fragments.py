@@ -0,0 +1,114 @@
+#admin_fragments
+
+import os
+import time
+from flask import render_template, session, jsonify, make_response
+from Backend.DB_backend.login_logout import admin_required
+from Backend.cache_backend.shared_cache import shared_cache
+
+# Seconds a rendered admin tab is reused (writes through the admin routes drop it sooner)
+ADMIN_FRAGMENT_CACHE_TTL = int(os.getenv('ADMIN_FRAGMENT_CACHE_TTL', '60'))
+
+
+def _overview_context():
+    from Backend.admin_backend.admin_overview import get_overview_stats
+    return {'overview_stats': get_overview_stats()}
+
+
+def _dashboards_context():
+    from Backend.admin_backend.admin_reports import get_all_dashboards
+    return {'dashboards': get_all_dashboards()}
+
+
+def _departments_context():
+    from Backend.admin_backend.admin_departments import get_departments_with_dashboards
+    return {'departments_with_dashboards': get_departments_with_dashboards()}
+
+
+def _permissions_context():
+    from Backend.admin_backend.admin_reports import get_all_dashboards
+    from Backend.admin_backend.admin_departments import get_all_departments
+    from Backend.admin_backend.admin_permissions import get_department_permissions
+    return {
+        'permissions': get_department_permissions(),
+        'dashboards': get_all_dashboards(),
+        'departments': get_all_departments()
+    }
+
+
+def _users_context():
+    from Backend.admin_backend.admin_users import get_all_users
+    return {'users': get_all_users()}
+
+
+# Tab id (the section id in the admin shell) -> template, data loader and the tables it shows.
+# A tab with no tables is not cached here (the overview keeps its own short-lived snapshot).
+ADMIN_TABS = {
+    'overview': {'template': 'admin/admin_overview.html', 'context': _overview_context, 'tables': None},
+    'dashboards': {'template': 'admin/admin_reports.html', 'context': _dashboards_context, 'tables': ('Dashboards',)},
+    'departments': {
+        'template': 'admin/admin_departments.html',
+        'context': _departments_context,
+        'tables': ('Departments', 'Dashboards', 'DepartmentDashboards')
+    },
+    'permissions': {
+        'template': 'admin/admin_permissions.html',
+        'context': _permissions_context,
+        'tables': ('Departments', 'Dashboards', 'DepartmentDashboards')
+    },
+    'users': {'template': 'admin/admin_users.html', 'context': _users_context, 'tables': ('Users',)},
+    'configuration': {'template': 'admin/admin_configuration.html', 'context': dict, 'tables': ()},
+    'refresh_agent': {'template': 'admin/admin_refresh_agent.html', 'context': dict, 'tables': ()}
+}
+
+
+def render_admin_tab(tab, role):
+    """
+    Render one admin tab as an HTML fragment, from the shared cache when possible
+    (fragments differ by role: superusers get the read-only variant)
+    Returns: HTML string
+    """
+    config = ADMIN_TABS[tab]
+    cacheable = config['tables'] is not None
+    key = f"{tab}:{role}"
+
+    if cacheable:
+        html = shared_cache.get('admin_fragments', key)
+        if html is not None:
+            return html
+
+    started = time.perf_counter()
+    html = render_template(config['template'], role=role, **config['context']())
+    if cacheable:
+        shared_cache.record_fill('admin_fragments', time.perf_counter() - started)
+        shared_cache.set('admin_fragments', key, html, ADMIN_FRAGMENT_CACHE_TTL, tag=tab)
+    return html
+
+
+def invalidate_admin_fragments(*tables):
+    """
+    Drop cached tabs that show any of the given tables (call after writing to them)
+    """
+    for tab, config in ADMIN_TABS.items():
+        if config['tables'] and set(config['tables']) & set(tables):
+            shared_cache.delete_tag('admin_fragments', tab)
+
+
+def register_admin_fragment_routes(app):
+    """Register admin tab fragment routes"""
+
+    @app.route('/admin/tab/<tab>', methods=['GET'])
+    @admin_required
+    def admin_tab_fragment(tab):
+        """
+        HTML fragment for one admin tab, loaded by the admin shell when the tab is first shown
+        """
+        if tab not in ADMIN_TABS:
+            return jsonify({'success': False, 'error': f'Unknown tab: {tab}'}), 404
+        try:
+            response = make_response(render_admin_tab(tab, session.get('role')))
+            response.headers['Cache-Control'] = 'private, no-store'
+            return response
+        except Exception as e:
+            print(f"Error rendering admin tab {tab}: {e}")
+            return jsonify({'success': False, 'error': str(e)}), 500
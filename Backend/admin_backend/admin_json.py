@@ -0,0 +1,15 @@
+#admin_json
+
+from datetime import date, datetime
+from decimal import Decimal
+
+
+def json_value(value):
+    """
+    Returns: a database value json.dumps accepts (dates as ISO 8601 strings, decimals as strings)
+    """
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
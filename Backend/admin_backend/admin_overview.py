@@ -1,109 +1,315 @@
 #admin_overview
-from flask import render_template, session
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import render_template, session, request, jsonify
 from Backend.DB_backend.db_connection import get_db_connection, close_db_connection
 from Backend.DB_backend.login_logout import admin_required
+from Backend.DB_backend.user_log_maintenance import user_log_rollups_ready
+from Backend.cache_backend.shared_cache import shared_cache
+
+# Seconds the overview snapshot is reused before the counters are read again
+ADMIN_OVERVIEW_STATS_TTL = int(os.getenv('ADMIN_OVERVIEW_STATS_TTL', '30'))
+
+# Rows per page of the user logs API (the client may ask for up to USER_LOGS_MAX_PAGE_SIZE)
+USER_LOGS_PAGE_SIZE = int(os.getenv('USER_LOGS_PAGE_SIZE', '50'))
+USER_LOGS_MAX_PAGE_SIZE = int(os.getenv('USER_LOGS_MAX_PAGE_SIZE', '500'))
+
+# One batch, two result sets: every scalar counter, then dashboards per department.
+# LogTime is stored in UTC (see user_log_writer), so "today" is the UTC day.
+# "Active users (7 days)" is a rolling window: the last 7 x 24 hours.
+OVERVIEW_STATS_QUERY = """
+    SET NOCOUNT ON;
+    DECLARE @today DATETIME2 = CAST(CAST(SYSUTCDATETIME() AS date) AS DATETIME2);
+    DECLARE @week_start DATETIME2 = DATEADD(day, -7, SYSUTCDATETIME());
+    {activity_setup}
+
+    SELECT
+        (SELECT COUNT(*) FROM Users),
+        (SELECT COUNT(*) FROM Departments),
+        (SELECT COUNT(*) FROM Dashboards),
+        (SELECT COUNT(DISTINCT DashboardID) FROM Dashboards WHERE Status = 'Active'),
+        (SELECT COUNT(*) FROM DepartmentDashboards),
+        {activity_counters};
+
+    SELECT dep.DepartmentID, dep.DepartmentName, COUNT(dd.DashboardID)
+    FROM Departments dep
+    LEFT JOIN DepartmentDashboards dd ON dd.DepartmentID = dep.DepartmentID
+    GROUP BY dep.DepartmentID, dep.DepartmentName
+    ORDER BY dep.DepartmentName;
+"""
+
+# Activity from the rollups up to the maintenance watermark plus the raw rows after it,
+# so the cost stays flat however much history UserLogs holds (see user_log_maintenance).
+# Daily rollups only cover whole days, so the partial first day of the rolling week is
+# read from raw rows (still in UserLogs: archival keeps USER_LOG_RETENTION_DAYS of them).
+ROLLUP_ACTIVITY_SETUP = """
+    DECLARE @rolled_up_to DATETIME2 = (SELECT RolledUpTo FROM UserLogMaintenance WHERE JobName = 'UserLogs');
+    DECLARE @today_raw_from DATETIME2 = CASE WHEN @rolled_up_to > @today THEN @rolled_up_to ELSE @today END;
+    DECLARE @week_raw_from DATETIME2 = CASE WHEN @rolled_up_to > @week_start THEN @rolled_up_to ELSE @week_start END;
+    DECLARE @week_first_full_day DATE = DATEADD(day, 1, CAST(@week_start AS date));
+"""
+
+ROLLUP_ACTIVITY_COUNTERS = """
+        (SELECT ISNULL(SUM(Logins), 0) FROM UserLogRollupsHourly WHERE BucketStart >= @today AND BucketStart < @today_raw_from)
+            + (SELECT COUNT(*) FROM UserLogs WHERE Action = 'Login' AND LogTime >= @today_raw_from),
+        (SELECT COUNT(*) FROM (
+            SELECT UserID FROM UserActivityDaily WHERE ActivityDate >= @week_first_full_day AND Logins > 0
+            UNION
+            SELECT UserID FROM UserLogs
+            WHERE Action = 'Login' AND LogTime >= @week_start AND LogTime < CAST(@week_first_full_day AS DATETIME2)
+            UNION
+            SELECT UserID FROM UserLogs WHERE Action = 'Login' AND LogTime >= @week_raw_from
+        ) AS active_users)
+"""
+
+# Until the maintenance job has created the rollup tables
+RAW_ACTIVITY_COUNTERS = """
+        (SELECT COUNT(*) FROM UserLogs WHERE Action = 'Login' AND LogTime >= @today),
+        (SELECT COUNT(DISTINCT UserID) FROM UserLogs WHERE Action = 'Login' AND LogTime >= @week_start)
+"""
+
+OVERVIEW_COUNTERS = (
+    'users_count',
+    'departments_count',
+    'dashboards_count',
+    'active_dashboards_count',
+    'permissions_count',
+    'logins_today',
+    'active_users_7d'
+)
+
+_overview_lock = threading.Lock()
+_overview_snapshot = None
+_overview_snapshot_at = 0
+
+
+def _empty_overview_stats():
+    stats = {name: 0 for name in OVERVIEW_COUNTERS}
+    stats['dashboards_per_department'] = []
+    return stats
+
+
+def _fetch_overview_stats():
+    """
+    Read every overview counter in one round trip
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError('Database connection failed')
+    
+    cursor = conn.cursor()
+    if user_log_rollups_ready(cursor):
+        query = OVERVIEW_STATS_QUERY.format(activity_setup=ROLLUP_ACTIVITY_SETUP, activity_counters=ROLLUP_ACTIVITY_COUNTERS)
+    else:
+        query = OVERVIEW_STATS_QUERY.format(activity_setup='', activity_counters=RAW_ACTIVITY_COUNTERS)
+    cursor.execute(query)
+    counters = cursor.fetchone()
+    cursor.nextset()
+    departments = cursor.fetchall()
+    close_db_connection(conn)
+    
+    stats = dict(zip(OVERVIEW_COUNTERS, (value or 0 for value in counters)))
+    stats['dashboards_per_department'] = [
+        {'DepartmentID': dept[0], 'DepartmentName': dept[1], 'DashboardCount': dept[2]}
+        for dept in departments
+    ]
+    stats['generated_at'] = time.time()
+    return stats
+
+
+def get_overview_stats():
+    """
+    Get all admin overview counters as one snapshot, reused for ADMIN_OVERVIEW_STATS_TTL seconds
+    (and shared with the other workers through the shared cache)
+    """
+    global _overview_snapshot, _overview_snapshot_at
+    
+    with _overview_lock:
+        if _overview_snapshot is not None and time.time() - _overview_snapshot_at < ADMIN_OVERVIEW_STATS_TTL:
+            return _overview_snapshot
+        
+        try:
+            stats = shared_cache.get('overview_stats', 'snapshot')
+            if stats is None:
+                started = time.perf_counter()
+                stats = _fetch_overview_stats()
+                shared_cache.record_fill('overview_stats', time.perf_counter() - started)
+                shared_cache.set('overview_stats', 'snapshot', stats, ADMIN_OVERVIEW_STATS_TTL)
+            _overview_snapshot = stats
+            _overview_snapshot_at = stats['generated_at']
+            return stats
+        except Exception as e:
+            print(f"Error getting overview stats: {e}")
+            return _overview_snapshot or _empty_overview_stats()
 
 
 def get_users_count():
     """
     Get total count of users
     """
-    try:
-        conn = get_db_connection()
-        if not conn:
-            return 0
-        
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM Users")
-        count = cursor.fetchone()[0]
-        close_db_connection(conn)
-        
-        return count
-    except Exception as e:
-        print(f"Error getting users count: {e}")
-        return 0
+    return get_overview_stats()['users_count']
 
 
 def get_departments_count():
     """
     Get total count of departments
     """
-    try:
-        conn = get_db_connection()
-        if not conn:
-            return 0
-        
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM Departments")
-        count = cursor.fetchone()[0]
-        close_db_connection(conn)
-        
-        return count
-    except Exception as e:
-        print(f"Error getting departments count: {e}")
-        return 0
+    return get_overview_stats()['departments_count']
 
 
 def get_active_dashboards_count():
     """
     Get count of active dashboards
     """
-    try:
-        conn = get_db_connection()
-        if not conn:
-            return 0
-        
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(DISTINCT DashboardID) FROM Dashboards WHERE Status = 'Active'")
-        count = cursor.fetchone()[0]
-        close_db_connection(conn)
-        
-        return count
-    except Exception as e:
-        print(f"Error getting active dashboards count: {e}")
-        return 0
+    return get_overview_stats()['active_dashboards_count']
 
 
-def get_all_user_logs():
+def encode_log_cursor(log_time, log_id):
     """
-    Fetch all user logs from database - ordered by most recent first
+    Returns: opaque keyset cursor pointing just past the given row
     """
-    try:
-        conn = get_db_connection()
-        if not conn:
-            return []
-        
-        cursor = conn.cursor()
-        
-        query = """
-            SELECT LogID, UserID, UserName, UserEmail, Action, LogTime
-            FROM UserLogs
-            ORDER BY LogTime DESC
-        """
-        
-        cursor.execute(query)
-        logs = cursor.fetchall()
-        close_db_connection(conn)
-        
-        logs_list = []
-        for log in logs:
-            logs_list.append({
-                'LogID': log[0],
-                'UserID': log[1],
-                'UserName': log[2],
-                'UserEmail': log[3],
-                'Action': log[4],
-                'LogTime': log[5]
-            })
-        
-        return logs_list
-    except Exception as e:
-        print(f"Error fetching user logs: {e}")
-        return []
+    return f"{log_time.isoformat()}_{log_id}"
+
+
+def decode_log_cursor(cursor):
+    """
+    Returns: (log_time, log_id) from encode_log_cursor
+    Raises: ValueError for a malformed cursor
+    """
+    log_time, _, log_id = cursor.rpartition('_')
+    return datetime.fromisoformat(log_time), int(log_id)
+
+
+def parse_log_date(value, end_of_day=False):
+    """
+    Parse a date (YYYY-MM-DD) or datetime (ISO 8601) filter value
+    end_of_day: a bare date means "up to the end of that day"
+    Returns: datetime or None for an empty value
+    Raises: ValueError for a malformed value
+    """
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def escape_like(value):
+    """
+    Returns: value with LIKE wildcards escaped (SQL Server bracket syntax)
+    """
+    return value.replace('[', '[[]').replace('%', '[%]').replace('_', '[_]')
+
+
+def get_user_logs_page(page_size=None, cursor=None, user_id=None, user_name=None, email=None,
+                       action=None, date_from=None, date_to=None):
+    """
+    Fetch one page of user logs, most recent first, using keyset pagination on (LogTime, LogID)
+    (served by IX_UserLogs_LogTime_LogID from schema_migrations, each page costs the same however
+    deep it is)
+    cursor: next_cursor of the previous page (None for the first page)
+    user_name / email: prefix match; action: exact match
+    date_from: inclusive lower bound, date_to: exclusive upper bound (datetimes, UTC)
+    Returns: {'logs': [...], 'next_cursor': str or None, 'page_size': int}
+    Raises: ValueError for a malformed cursor, RuntimeError if the database is unavailable
+    """
+    page_size = min(max(int(page_size or USER_LOGS_PAGE_SIZE), 1), USER_LOGS_MAX_PAGE_SIZE)
+    
+    conditions = []
+    params = []
+    if user_id is not None:
+        conditions.append("UserID = ?")
+        params.append(user_id)
+    if user_name:
+        conditions.append("UserName LIKE ?")
+        params.append(escape_like(user_name) + '%')
+    if email:
+        conditions.append("UserEmail LIKE ?")
+        params.append(escape_like(email) + '%')
+    if action:
+        conditions.append("Action = ?")
+        params.append(action)
+    if date_from is not None:
+        conditions.append("LogTime >= ?")
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append("LogTime < ?")
+        params.append(date_to)
+    if cursor:
+        last_time, last_id = decode_log_cursor(cursor)
+        conditions.append("(LogTime < ? OR (LogTime = ? AND LogID < ?))")
+        params.extend([last_time, last_time, last_id])
+    
+    # One extra row tells us whether another page exists
+    query = f"""
+        SELECT TOP ({page_size + 1}) LogID, UserID, UserName, UserEmail, Action, LogTime
+        FROM UserLogs
+        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+        ORDER BY LogTime DESC, LogID DESC
+    """
+    
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError('Database connection failed')
+    
+    db_cursor = conn.cursor()
+    db_cursor.execute(query, params)
+    logs = db_cursor.fetchall()
+    close_db_connection(conn)
     
+    next_cursor = None
+    if len(logs) > page_size:
+        logs = logs[:page_size]
+        next_cursor = encode_log_cursor(logs[-1][5], logs[-1][0])
+    
+    logs_list = []
+    for log in logs:
+        logs_list.append({
+            'LogID': log[0],
+            'UserID': log[1],
+            'UserName': log[2],
+            'UserEmail': log[3],
+            'Action': log[4],
+            'LogTime': log[5].strftime('%Y-%m-%d %H:%M:%S') if log[5] else None
+        })
+    
+    return {'logs': logs_list, 'next_cursor': next_cursor, 'page_size': page_size}
+
+
+def register_admin_overview_routes(app):
+    """Register admin overview routes"""
+    
+    @app.route('/admin/api/user-logs', methods=['GET'])
+    @admin_required
+    def api_user_logs():
+        """
+        One page of user activity logs
+        Query: cursor, page_size, user_id, user, email, action, date_from, date_to
+        """
+        try:
+            page = get_user_logs_page(
+                page_size=request.args.get('page_size', type=int),
+                cursor=request.args.get('cursor') or None,
+                user_id=request.args.get('user_id', type=int),
+                user_name=request.args.get('user', '').strip(),
+                email=request.args.get('email', '').strip(),
+                action=request.args.get('action', '').strip(),
+                date_from=parse_log_date(request.args.get('date_from', '').strip()),
+                date_to=parse_log_date(request.args.get('date_to', '').strip(), end_of_day=True)
+            )
+            return jsonify({'success': True, **page}), 200
+        except ValueError as e:
+            return jsonify({'success': False, 'error': f'Invalid filter or cursor: {e}'}), 400
+        except Exception as e:
+            print(f"Error fetching user logs: {e}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+
 
 if __name__=="__main__":
     print(get_users_count())
     print(get_departments_count())
     print(get_active_dashboards_count())
-    print(get_all_user_logs())
\ No newline at end of file
+    print(get_user_logs_page())
\ No newline at end of file
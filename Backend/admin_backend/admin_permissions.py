@@ -3,16 +3,31 @@
 from flask import request, jsonify, session
 from Backend.DB_backend.db_connection import get_db_connection, close_db_connection
 from Backend.DB_backend.login_logout import admin_write_required
+from Backend.DB_backend.reference_cache import reference_cache, invalidate_reference_data
+from Backend.user_backend.acl_index import invalidate_acl_index
+from Backend.admin_backend.admin_fragments import invalidate_admin_fragments
+from Backend.admin_backend.admin_events import publish_admin_event, render_admin_row
+from Backend.powerbi_backend.embed_token_refresher import embed_session_scheduler
 
 
 def get_department_permissions():
+    """
+    Fetch all department permissions (cached, see reference_cache)
+    """
+    try:
+        return reference_cache.get('department_permissions', ('DepartmentDashboards',), _fetch_department_permissions)
+    except Exception:
+        return []
+
+
+def _fetch_department_permissions():
     """
     Fetch all department permissions from database
     """
     try:
         conn = get_db_connection()
         if not conn:
-            return []
+            raise RuntimeError('Database connection failed')
         
         cursor = conn.cursor()
         
@@ -42,7 +57,7 @@ def get_department_permissions():
         return permissions_list
     except Exception as e:
         print(f"Error fetching department permissions: {e}")
-        return []
+        raise
 
 
 def register_admin_permissions_routes(app):
@@ -90,6 +105,7 @@ def register_admin_permissions_routes(app):
             insert_query = """
                 INSERT INTO DepartmentDashboards 
                 (DepartmentID, DepartmentName, DashboardID, DashboardName, GrantedAt, GrantedBy)
+                OUTPUT INSERTED.DepartmentDashboardID, INSERTED.GrantedAt, INSERTED.GrantedBy
                 VALUES (?, ?, ?, ?, GETDATE(), ?)
             """
             
@@ -100,11 +116,33 @@ def register_admin_permissions_routes(app):
                 dashboard_name,
                 session.get('username')
             ))
+            inserted = cursor.fetchone()
             
             conn.commit()
             close_db_connection(conn)
             
-            return jsonify({'success': True, 'message': 'Permission granted successfully'}), 200
+            invalidate_acl_index()
+            invalidate_reference_data('DepartmentDashboards')
+            invalidate_admin_fragments('DepartmentDashboards')
+            
+            permission = {
+                'DepartmentDashboardID': inserted[0],
+                'DepartmentID': department_id,
+                'DepartmentName': department_name,
+                'DashboardID': dashboard_id,
+                'DashboardName': dashboard_name,
+                'GrantedAt': inserted[1],
+                'GrantedBy': inserted[2]
+            }
+            event_id = publish_admin_event('permission', 'created', permission['DepartmentDashboardID'], permission, stale_tabs=('departments',))
+            
+            return jsonify({
+                'success': True,
+                'message': 'Permission granted successfully',
+                'permission': permission,
+                'event_id': event_id,
+                'html': render_admin_row('permission', permission)
+            }), 200
         
         except Exception as e:
             print(f"Error granting dashboard permission: {e}")
@@ -123,13 +161,28 @@ def register_admin_permissions_routes(app):
             
             cursor = conn.cursor()
             
-            query = "DELETE FROM DepartmentDashboards WHERE DepartmentDashboardID = ?"
+            query = """
+                DELETE FROM DepartmentDashboards
+                OUTPUT DELETED.DepartmentDashboardID, DELETED.DepartmentID, DELETED.DashboardID
+                WHERE DepartmentDashboardID = ?
+            """
             cursor.execute(query, (permission_id,))
+            deleted = cursor.fetchone()
             
             conn.commit()
             close_db_connection(conn)
             
-            return jsonify({'success': True, 'message': 'Permission revoked successfully'}), 200
+            if not deleted:
+                return jsonify({'success': False, 'error': 'Permission not found'}), 404
+            
+            invalidate_acl_index()
+            invalidate_reference_data('DepartmentDashboards')
+            invalidate_admin_fragments('DepartmentDashboards')
+            # The department's open reports stop getting refreshed tokens
+            embed_session_scheduler.forget(dashboard_id=deleted[2], department_id=deleted[1])
+            event_id = publish_admin_event('permission', 'deleted', permission_id, stale_tabs=('departments',))
+            
+            return jsonify({'success': True, 'message': 'Permission revoked successfully', 'event_id': event_id}), 200
         
         except Exception as e:
             print(f"Error revoking dashboard permission: {e}")
@@ -3,22 +3,62 @@
 from flask import request, jsonify, session
 from Backend.DB_backend.db_connection import get_db_connection, close_db_connection
 from Backend.DB_backend.login_logout import admin_write_required
+from Backend.powerbi_backend.embed_token_cache import purge_report_embed_tokens
+from Backend.powerbi_backend.report_metadata_cache import refresh_report_metadata
+from Backend.powerbi_backend.embed_token_refresher import embed_session_scheduler
+from Backend.DB_backend.reference_cache import reference_cache, invalidate_reference_data
+from Backend.user_backend.acl_index import invalidate_acl_index
+from Backend.admin_backend.admin_fragments import invalidate_admin_fragments
+from Backend.admin_backend.admin_events import publish_admin_event, render_admin_row
+
+DASHBOARD_COLUMNS = (
+    'DashboardID', 'DashboardName', 'ReportID', 'GroupID', 'CoreDatasetID',
+    'ProxyDatasetID', 'CreatedAt', 'CreatedBy', 'UpdatedAt', 'UpdatedBy', 'Status', 'Description', 'DashboardOwner', 'Alert'
+)
+
+# OUTPUT clause returning the written dashboard row, in DASHBOARD_COLUMNS order
+DASHBOARD_OUTPUT = 'OUTPUT ' + ', '.join(f'INSERTED.{column}' for column in DASHBOARD_COLUMNS)
+
+# Other admin tabs that show dashboard names or the dashboard list
+DASHBOARD_STALE_TABS = ('departments', 'permissions')
 
 
 def get_all_dashboards():
+    """
+    Fetch all dashboards, newest first (cached, see reference_cache)
+    """
+    try:
+        return reference_cache.get('dashboards', ('Dashboards',), _fetch_all_dashboards)
+    except Exception:
+        return []
+
+
+def get_dashboards_by_id():
+    """
+    Shared DashboardID -> dashboard map from the reference data cache (read-only: do not modify)
+    Raises if the dashboards cannot be loaded
+    """
+    return reference_cache.get(
+        'dashboards_by_id',
+        ('Dashboards',),
+        lambda: {d['DashboardID']: d for d in _fetch_all_dashboards()},
+        copy_result=False
+    )
+
+
+def _fetch_all_dashboards():
     """
     Fetch all dashboards from database
     """
     try:
         conn = get_db_connection()
         if not conn:
-            return []
+            raise RuntimeError('Database connection failed')
         
         cursor = conn.cursor()
         
-        query = """
-            SELECT DashboardID, DashboardName, ReportID, GroupID, CoreDatasetID, 
-                   ProxyDatasetID, CreatedAt, CreatedBy, UpdatedAt, UpdatedBy, Status, Description, DashboardOwner, Alert
+        query = f"""
+            SELECT {', '.join(DASHBOARD_COLUMNS)}
             FROM Dashboards
             ORDER BY DashboardID DESC
         """
@@ -27,29 +67,17 @@ def get_all_dashboards():
         dashboards = cursor.fetchall()
         close_db_connection(conn)
         
-        dashboard_list = []
-        for dashboard in dashboards:
-            dashboard_list.append({
-                'DashboardID': dashboard[0],
-                'DashboardName': dashboard[1],
-                'ReportID': dashboard[2],
-                'GroupID': dashboard[3],
-                'CoreDatasetID': dashboard[4],
-                'ProxyDatasetID': dashboard[5],
-                'CreatedAt': dashboard[6],
-                'CreatedBy': dashboard[7],
-                'UpdatedAt': dashboard[8],
-                'UpdatedBy': dashboard[9],
-                'Status': dashboard[10],
-                'Description': dashboard[11],
-                'DashboardOwner': dashboard[12],
-                'Alert': dashboard[13]
-            })
-        
-        return dashboard_list
+        return [_dashboard_dict(dashboard) for dashboard in dashboards]
     except Exception as e:
         print(f"Error fetching all dashboards: {e}")
-        return []
+        raise
+
+
+def _dashboard_dict(row):
+    """
+    Returns: dashboard dict from a row selected in DASHBOARD_COLUMNS order
+    """
+    return dict(zip(DASHBOARD_COLUMNS, row))
 
 
 def register_admin_reports_routes(app):
@@ -119,9 +147,10 @@ def register_admin_reports_routes(app):
             
             cursor = conn.cursor()
             
-            query = """
+            query = f"""
                 INSERT INTO Dashboards 
                 (DashboardName, ReportID, GroupID, CoreDatasetID, ProxyDatasetID, Description, CreatedBy, Status, DashboardOwner, Alert, CreatedAt)
+                {DASHBOARD_OUTPUT}
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, GETDATE())
             """
             
@@ -137,11 +166,24 @@ def register_admin_reports_routes(app):
                 dashboard_owner if dashboard_owner else None,
                 alert if alert else None
             ))
+            dashboard = _dashboard_dict(cursor.fetchone())
             
             conn.commit()
             close_db_connection(conn)
             
-            return jsonify({'success': True, 'message': 'Dashboard added successfully'}), 200
+            refresh_report_metadata(group_id, report_id)
+            invalidate_acl_index()
+            invalidate_reference_data('Dashboards')
+            invalidate_admin_fragments('Dashboards')
+            event_id = publish_admin_event('dashboard', 'created', dashboard['DashboardID'], dashboard, stale_tabs=DASHBOARD_STALE_TABS)
+            
+            return jsonify({
+                'success': True,
+                'message': 'Dashboard added successfully',
+                'dashboard': dashboard,
+                'event_id': event_id,
+                'html': render_admin_row('dashboard', dashboard)
+            }), 200
         
         except Exception as e:
             print(f"Error adding dashboard: {e}")
@@ -182,10 +224,11 @@ def register_admin_reports_routes(app):
             
             cursor = conn.cursor()
             
-            query = """
+            query = f"""
                 UPDATE Dashboards 
                 SET DashboardName = ?, ReportID = ?, GroupID = ?, CoreDatasetID = ?, 
                     ProxyDatasetID = ?, Description = ?, Status = ?, DashboardOwner = ?, Alert = ?, UpdatedBy = ?, UpdatedAt = GETDATE()
+                {DASHBOARD_OUTPUT}
                 WHERE DashboardID = ?
             """
             
@@ -202,11 +245,32 @@ def register_admin_reports_routes(app):
                 updated_by,
                 dashboard_id
             ))
+            row = cursor.fetchone()
             
             conn.commit()
             close_db_connection(conn)
             
-            return jsonify({'success': True, 'message': 'Dashboard updated successfully'}), 200
+            if not row:
+                return jsonify({'success': False, 'error': 'Dashboard not found'}), 404
+            dashboard = _dashboard_dict(row)
+            
+            purge_report_embed_tokens(report_id)
+            refresh_report_metadata(group_id, report_id)
+            # Status may have changed
+            invalidate_acl_index()
+            invalidate_reference_data('Dashboards')
+            invalidate_admin_fragments('Dashboards')
+            # Open reports re-request a token for the new configuration
+            embed_session_scheduler.forget(dashboard_id=dashboard_id)
+            event_id = publish_admin_event('dashboard', 'updated', dashboard_id, dashboard, stale_tabs=DASHBOARD_STALE_TABS)
+            
+            return jsonify({
+                'success': True,
+                'message': 'Dashboard updated successfully',
+                'dashboard': dashboard,
+                'event_id': event_id,
+                'html': render_admin_row('dashboard', dashboard)
+            }), 200
         
         except Exception as e:
             print(f"Error updating dashboard: {e}")
@@ -225,14 +289,45 @@ def register_admin_reports_routes(app):
             
             cursor = conn.cursor()
             
-            query = "DELETE FROM Dashboards WHERE DashboardID = ?"
+            query = "DELETE FROM Dashboards OUTPUT DELETED.DashboardID WHERE DashboardID = ?"
             cursor.execute(query, (dashboard_id,))
+            deleted = cursor.fetchone()
             
             conn.commit()
             close_db_connection(conn)
             
-            return jsonify({'success': True, 'message': 'Dashboard deleted successfully'}), 200
+            if not deleted:
+                return jsonify({'success': False, 'error': 'Dashboard not found'}), 404
+            
+            embed_session_scheduler.forget(dashboard_id=dashboard_id)
+            invalidate_acl_index()
+            invalidate_reference_data('Dashboards', 'DepartmentDashboards')
+            invalidate_admin_fragments('Dashboards', 'DepartmentDashboards')
+            event_id = publish_admin_event('dashboard', 'deleted', dashboard_id, stale_tabs=DASHBOARD_STALE_TABS)
+            
+            return jsonify({'success': True, 'message': 'Dashboard deleted successfully', 'event_id': event_id}), 200
         
         except Exception as e:
             print(f"Error deleting dashboard: {e}")
-            return jsonify({'success': False, 'error': str(e)}), 500
\ No newline at end of file
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/admin/purge-embed-tokens/<int:dashboard_id>', methods=['POST'])
+    @admin_write_required
+    def purge_embed_tokens(dashboard_id):
+        """
+        Purge cached embed tokens for a dashboard's report - Admin only
+        """
+        try:
+            from Backend.user_backend.user_interface import get_dashboard_by_id
+            
+            dashboard = get_dashboard_by_id(dashboard_id)
+            if not dashboard:
+                return jsonify({'success': False, 'error': 'Dashboard not found'}), 404
+            
+            purged = purge_report_embed_tokens(dashboard['ReportID'])
+            
+            return jsonify({'success': True, 'purged': purged, 'message': f'{purged} cached embed token(s) purged'}), 200
+        
+        except Exception as e:
+            print(f"Error purging embed tokens: {e}")
+            return jsonify({'success': False, 'error': str(e)}), 500
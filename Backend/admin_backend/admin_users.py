@@ -3,6 +3,11 @@
 from flask import request, jsonify, session
 from Backend.DB_backend.db_connection import get_db_connection, close_db_connection
 from Backend.DB_backend.login_logout import admin_required, admin_write_required
+from Backend.DB_backend.identity_cache import invalidate_identity_cache
+from Backend.admin_backend.admin_fragments import invalidate_admin_fragments
+from Backend.admin_backend.admin_events import publish_admin_event, render_admin_row
+
+USER_COLUMNS = ('UserID', 'UserEmail', 'UserName', 'DepartmentID', 'DepartmentName', 'Role', 'CreatedAt')
 
 
 def get_all_users():
@@ -16,8 +21,8 @@ def get_all_users():
         
         cursor = conn.cursor()
         
-        query = """
-            SELECT UserID, UserEmail, UserName, DepartmentID, DepartmentName, Role, CreatedAt
+        query = f"""
+            SELECT {', '.join(USER_COLUMNS)}
             FROM Users
             ORDER BY UserID DESC
         """
@@ -26,19 +31,7 @@ def get_all_users():
         users = cursor.fetchall()
         close_db_connection(conn)
         
-        user_list = []
-        for user in users:
-            user_list.append({
-                'UserID': user[0],
-                'UserEmail': user[1],
-                'UserName': user[2],
-                'DepartmentID': user[3],
-                'DepartmentName': user[4],
-                'Role': user[5],
-                'CreatedAt': user[6]
-            })
-        
-        return user_list
+        return [dict(zip(USER_COLUMNS, user)) for user in users]
     except Exception as e:
         print(f"Error fetching all users: {e}")
         return []
@@ -102,10 +95,14 @@ def register_admin_users_routes(app):
             cursor.execute(query, (new_role, user_id))
             
             conn.commit()
+            # The user's next request picks up the new role (see revalidate_session)
+            invalidate_identity_cache()
+            invalidate_admin_fragments('Users')
             
-            cursor.execute(verify_query, (user_id,))
+            cursor.execute(f"SELECT {', '.join(USER_COLUMNS)} FROM Users WHERE UserID = ?", (user_id,))
             updated_user = cursor.fetchone()
-            updated_role = updated_user[1] if updated_user else None
+            updated_user = dict(zip(USER_COLUMNS, updated_user)) if updated_user else None
+            updated_role = updated_user['Role'] if updated_user else None
             
             close_db_connection(conn)
             
@@ -114,6 +111,7 @@ def register_admin_users_routes(app):
                 return jsonify({'success': False, 'error': 'Role update failed - please try again'}), 500
             
             print(f"SUCCESS: User {user_id} role changed from {old_role} to {new_role}")
+            event_id = publish_admin_event('user', 'updated', updated_user['UserID'], updated_user)
             
             if is_self_update:
                 return jsonify({
@@ -121,13 +119,17 @@ def register_admin_users_routes(app):
                     'message': f'Your role has been updated successfully from {old_role.upper()} to {new_role.upper()}. Redirecting...',
                     'is_self_update': True,
                     'new_role': new_role,
-                    'old_role': old_role
+                    'old_role': old_role,
+                    'user': updated_user
                 }), 200
             else:
                 return jsonify({
                     'success': True, 
                     'message': f'User role updated successfully from {old_role.upper()} to {new_role.upper()}',
-                    'is_self_update': False
+                    'is_self_update': False,
+                    'user': updated_user,
+                    'event_id': event_id,
+                    'html': render_admin_row('user', updated_user)
                 }), 200
         
         except Exception as e:
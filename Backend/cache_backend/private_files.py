@@ -0,0 +1,80 @@
+#private_files.py
+
+import getpass
+import os
+import stat
+import tempfile
+
+# Directory for the files this host's workers share (shared cache, sessions, signing key).
+# Created 0700; an existing one must belong to the app's user.
+_USER = os.getuid() if hasattr(os, 'getuid') else getpass.getuser()
+APP_DATA_DIR = os.getenv('APP_DATA_DIR', os.path.join(tempfile.gettempdir(), f"bi_insights-{_USER}"))
+
+# Never follow a symlink planted where a private file is expected
+O_NOFOLLOW = getattr(os, 'O_NOFOLLOW', 0)
+
+
+def _check_private(path, file_type):
+    """
+    Refuse a path another user could have created or written to
+    Raises: PermissionError
+    """
+    st = os.lstat(path)
+    kind = 'directory' if file_type == stat.S_IFDIR else 'regular file'
+    if stat.S_IFMT(st.st_mode) != file_type:
+        raise PermissionError(f"{path} is not a {kind}")
+    if not hasattr(os, 'getuid'):
+        # No POSIX owners (Windows): the per-user temp directory is private already
+        return
+    if st.st_uid != os.getuid():
+        raise PermissionError(f"{path} is owned by uid {st.st_uid}, not by this user (uid {os.getuid()})")
+    if file_type == stat.S_IFREG and st.st_mode & 0o022:
+        raise PermissionError(f"{path} is writable by other users")
+    if st.st_mode & 0o077:
+        os.chmod(path, stat.S_IMODE(st.st_mode) & 0o700)
+
+
+def private_data_dir():
+    """
+    Returns: APP_DATA_DIR, created 0700 if missing
+    Raises: PermissionError if it exists but is not a directory owned by this user
+    """
+    os.makedirs(APP_DATA_DIR, mode=0o700, exist_ok=True)
+    _check_private(APP_DATA_DIR, stat.S_IFDIR)
+    return APP_DATA_DIR
+
+
+def check_private_file(path):
+    """
+    Raises: PermissionError unless path is a regular file owned by this user and not writable by others
+    """
+    _check_private(path, stat.S_IFREG)
+
+
+def create_private_file(path):
+    """
+    Create an empty 0600 file unless one exists, then check it
+    Returns: path
+    Raises: PermissionError (see check_private_file)
+    """
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | O_NOFOLLOW, 0o600)
+        os.close(fd)
+    except FileExistsError:
+        pass
+    check_private_file(path)
+    return path
+
+
+def prepare_sqlite_file(path):
+    """
+    Create a SQLite database file 0600 (its -wal and -shm files inherit the mode)
+    and check it and any journal files already beside it
+    Returns: path
+    Raises: PermissionError
+    """
+    create_private_file(path)
+    for suffix in ('-wal', '-shm', '-journal'):
+        if os.path.lexists(path + suffix):
+            check_private_file(path + suffix)
+    return path
@@ -0,0 +1,513 @@
+#shared_cache.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from Backend.cache_backend.private_files import private_data_dir, prepare_sqlite_file
+
+# One SQLite file on the container's local disk, shared by every gunicorn worker
+SHARED_CACHE_ENABLED = os.getenv('SHARED_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# Defaults to shared_cache.sqlite3 in the app's private data directory (APP_DATA_DIR)
+SHARED_CACHE_PATH = os.getenv('SHARED_CACHE_PATH')
+SHARED_CACHE_BUSY_TIMEOUT = float(os.getenv('SHARED_CACHE_BUSY_TIMEOUT', '2'))
+# Seconds between reads of an invalidation signal's version (per process)
+SHARED_CACHE_SIGNAL_INTERVAL = float(os.getenv('SHARED_CACHE_SIGNAL_INTERVAL', '1'))
+# Seconds between writes of this worker's counters to the shared stats table
+SHARED_CACHE_STATS_INTERVAL = float(os.getenv('SHARED_CACHE_STATS_INTERVAL', '10'))
+# Expired entries are deleted once every this many writes
+SHARED_CACHE_PURGE_EVERY = int(os.getenv('SHARED_CACHE_PURGE_EVERY', '500'))
+# Seconds published events stay readable by the other workers
+SHARED_CACHE_EVENT_RETENTION = int(os.getenv('SHARED_CACHE_EVENT_RETENTION', '600'))
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        namespace TEXT NOT NULL,
+        key TEXT NOT NULL,
+        tag TEXT,
+        value BLOB NOT NULL,
+        stored_at REAL NOT NULL,
+        expires_at REAL NOT NULL,
+        PRIMARY KEY (namespace, key)
+    );
+    CREATE INDEX IF NOT EXISTS entries_tag ON entries (namespace, tag);
+    CREATE TABLE IF NOT EXISTS signals (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS worker_stats (
+        pid INTEGER NOT NULL,
+        namespace TEXT NOT NULL,
+        hits INTEGER NOT NULL,
+        misses INTEGER NOT NULL,
+        sets INTEGER NOT NULL,
+        fills INTEGER NOT NULL,
+        fill_ms REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (pid, namespace)
+    );
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        channel TEXT NOT NULL,
+        payload BLOB NOT NULL,
+        created_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS events_channel ON events (channel, id);
+"""
+
+
+class CacheUnavailable(sqlite3.Error):
+    """
+    The shared cache file could not be opened (the store is now disabled)
+    """
+
+
+class SharedCache:
+    """
+    Key/value store shared by all worker processes on this host (SQLite, WAL mode).
+    Values are stored as JSON (tuples come back as lists); entries carry an expiry
+    and an optional tag for bulk deletes.
+    Named signals are version counters: a writer bumps one after a change and the
+    other workers notice it on their next poll and drop their in-process copies.
+    Event channels are short-lived append-only logs that every worker reads from.
+    If the file cannot be opened (or is not private to this user) the store is
+    disabled for this process and callers fall back to their own in-process caches;
+    any other error, such as a busy database, only makes that one call a miss.
+    """
+
+    def __init__(self, path, enabled=True, busy_timeout=2, stats_interval=10, purge_every=500, event_retention=600):
+        self.path = path
+        self.enabled = enabled
+        self.disabled_reason = None if enabled else 'SHARED_CACHE_ENABLED is off'
+        self.busy_timeout = busy_timeout
+        self.stats_interval = stats_interval
+        self.purge_every = purge_every
+        self.event_retention = event_retention
+        self._writes = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._schema_ready = False
+        self._stats = {}  # namespace -> counters for this process
+        self._stats_flushed_at = 0
+        self._errors = {'busy': 0, 'errors': 0}
+
+    def _open(self):
+        if self.path is None:
+            self.path = os.path.join(private_data_dir(), 'shared_cache.sqlite3')
+        # Values written by another user would be trusted by every worker: refuse the file then
+        prepare_sqlite_file(self.path)
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        with self._lock:
+            if not self._schema_ready:
+                conn.executescript(SCHEMA)
+                self._schema_ready = True
+        return conn
+
+    def _connection(self):
+        if self._pid != os.getpid():
+            # Never use a parent's SQLite handles after fork
+            self._local = threading.local()
+            self._stats = {}
+            self._errors = {'busy': 0, 'errors': 0}
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            try:
+                conn = self._open()
+            except (sqlite3.Error, OSError) as e:
+                self._disable(e)
+                raise CacheUnavailable(str(e)) from e
+            self._local.conn = conn
+        return conn
+
+    def _disable(self, error):
+        if self.enabled:
+            print(f"Shared cache disabled for worker {os.getpid()}: {error}")
+            self.disabled_reason = str(error)
+        self.enabled = False
+
+    def _failed(self, error):
+        """
+        One call failed (it is treated as a miss); the store stays enabled
+        """
+        if isinstance(error, CacheUnavailable):
+            return
+        busy = 'locked' in str(error) or 'busy' in str(error)
+        with self._lock:
+            self._errors['busy' if busy else 'errors'] += 1
+        if not busy:
+            print(f"Shared cache error in worker {os.getpid()}: {error}")
+
+    @staticmethod
+    def _encode(value):
+        return json.dumps(value, separators=(',', ':'))
+
+    @staticmethod
+    def _decode(raw):
+        """
+        Returns: the stored value, None for a row that is not valid JSON
+        """
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    def _count(self, namespace, counter, amount=1):
+        with self._lock:
+            counters = self._stats.setdefault(namespace, {'hits': 0, 'misses': 0, 'sets': 0, 'fills': 0, 'fill_ms': 0.0})
+            counters[counter] += amount
+            flush = time.time() - self._stats_flushed_at > self.stats_interval
+            if flush:
+                self._stats_flushed_at = time.time()
+        if flush:
+            self.flush_stats()
+
+    def get(self, namespace, key):
+        """
+        Returns: cached value or None (missing, expired or store unavailable)
+        """
+        if not self.enabled:
+            return None
+        try:
+            row = self._connection().execute(
+                "SELECT value FROM entries WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, str(key), time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._failed(e)
+            return None
+        if row is None:
+            self._count(namespace, 'misses')
+            return None
+        self._count(namespace, 'hits')
+        return self._decode(row[0])
+
+    def set(self, namespace, key, value, ttl, tag=None):
+        """
+        Store a value for ttl seconds; tag groups entries for delete_tag
+        """
+        if not self.enabled or ttl <= 0:
+            return
+        now = time.time()
+        try:
+            encoded = self._encode(value)
+        except (TypeError, ValueError) as e:
+            print(f"Shared cache cannot store {namespace} value: {e}")
+            return
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, tag, value, stored_at, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, str(key), tag, encoded, now, now + ttl)
+            )
+        except sqlite3.Error as e:
+            self._failed(e)
+            return
+        self._count(namespace, 'sets')
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.purge_every == 0
+        if purge:
+            self.purge_expired()
+
+    def add(self, namespace, key, value, ttl):
+        """
+        Store a value only if the key has no live entry (an atomic claim across workers)
+        Returns: True if this call stored it
+        """
+        if not self.enabled or ttl <= 0:
+            return False
+        now = time.time()
+        try:
+            return self._connection().execute(
+                "INSERT INTO entries (namespace, key, tag, value, stored_at, expires_at) VALUES (?, ?, NULL, ?, ?, ?) "
+                "ON CONFLICT(namespace, key) DO UPDATE SET value = excluded.value, stored_at = excluded.stored_at, "
+                "expires_at = excluded.expires_at WHERE entries.expires_at <= excluded.stored_at",
+                (namespace, str(key), self._encode(value), now, now + ttl)
+            ).rowcount > 0
+        except sqlite3.Error as e:
+            self._failed(e)
+            return False
+
+    def items(self, namespace):
+        """
+        Returns: list of (key, value) for a namespace's live entries (None if the store is unavailable)
+        """
+        if not self.enabled:
+            return None
+        try:
+            rows = self._connection().execute(
+                "SELECT key, value FROM entries WHERE namespace = ? AND expires_at > ?", (namespace, time.time())
+            ).fetchall()
+        except sqlite3.Error as e:
+            self._failed(e)
+            return None
+        entries = [(key, self._decode(value)) for key, value in rows]
+        return [(key, value) for key, value in entries if value is not None]
+
+    def delete(self, namespace, key):
+        if not self.enabled:
+            return
+        try:
+            self._connection().execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, str(key)))
+        except sqlite3.Error as e:
+            self._failed(e)
+
+    def delete_tag(self, namespace, tag):
+        """
+        Returns: number of entries removed
+        """
+        if not self.enabled:
+            return 0
+        try:
+            return self._connection().execute("DELETE FROM entries WHERE namespace = ? AND tag = ?", (namespace, tag)).rowcount
+        except sqlite3.Error as e:
+            self._failed(e)
+            return 0
+
+    def clear(self, namespace=None):
+        if not self.enabled:
+            return
+        try:
+            if namespace is None:
+                self._connection().execute("DELETE FROM entries")
+            else:
+                self._connection().execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+        except sqlite3.Error as e:
+            self._failed(e)
+
+    def purge_expired(self):
+        """
+        Returns: number of expired entries removed
+        """
+        if not self.enabled:
+            return 0
+        try:
+            conn = self._connection()
+            conn.execute("DELETE FROM events WHERE created_at <= ?", (time.time() - self.event_retention,))
+            return conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),)).rowcount
+        except sqlite3.Error as e:
+            self._failed(e)
+            return 0
+
+    def append_event(self, channel, payload):
+        """
+        Append an event to a channel
+        Returns: the event's id (increasing across all workers), None if the store is unavailable
+        """
+        if not self.enabled:
+            return None
+        try:
+            event_id = self._connection().execute(
+                "INSERT INTO events (channel, payload, created_at) VALUES (?, ?, ?)",
+                (channel, self._encode(payload), time.time())
+            ).lastrowid
+        except sqlite3.Error as e:
+            self._failed(e)
+            return None
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.purge_every == 0
+        if purge:
+            self.purge_expired()
+        return event_id
+
+    def read_events(self, channel, after_id, limit=100):
+        """
+        Returns: list of (id, payload) newer than after_id, oldest first
+        (None if the store is unavailable)
+        """
+        if not self.enabled:
+            return None
+        try:
+            rows = self._connection().execute(
+                "SELECT id, payload FROM events WHERE channel = ? AND id > ? ORDER BY id LIMIT ?",
+                (channel, after_id, limit)
+            ).fetchall()
+        except sqlite3.Error as e:
+            self._failed(e)
+            return None
+        events = [(event_id, self._decode(payload)) for event_id, payload in rows]
+        return [(event_id, payload) for event_id, payload in events if payload is not None]
+
+    def event_bounds(self, channel):
+        """
+        Returns: (oldest retained id, newest id) of a channel, (0, 0) if empty, None if unavailable
+        """
+        if not self.enabled:
+            return None
+        try:
+            oldest, newest = self._connection().execute(
+                "SELECT MIN(id), MAX(id) FROM events WHERE channel = ?", (channel,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._failed(e)
+            return None
+        return (oldest or 0, newest or 0)
+
+    def record_fill(self, namespace, seconds):
+        """
+        Record the cost of producing a value this worker could not find in any cache
+        """
+        self._count(namespace, 'fills')
+        self._count(namespace, 'fill_ms', seconds * 1000)
+
+    def bump(self, name):
+        """
+        Advance a signal's version
+        Returns: the new version (None if the store is unavailable)
+        """
+        if not self.enabled:
+            return None
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO signals (name, version) VALUES (?, 1) "
+                "ON CONFLICT(name) DO UPDATE SET version = version + 1",
+                (name,)
+            )
+            return conn.execute("SELECT version FROM signals WHERE name = ?", (name,)).fetchone()[0]
+        except sqlite3.Error as e:
+            self._failed(e)
+            return None
+
+    def version(self, name):
+        """
+        Returns: a signal's current version (0 if never bumped, None if unavailable)
+        """
+        if not self.enabled:
+            return None
+        try:
+            row = self._connection().execute("SELECT version FROM signals WHERE name = ?", (name,)).fetchone()
+            return row[0] if row else 0
+        except sqlite3.Error as e:
+            self._failed(e)
+            return None
+
+    def flush_stats(self):
+        """
+        Write this worker's counters where the other workers can read them
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            snapshot = {namespace: dict(counters) for namespace, counters in self._stats.items()}
+        try:
+            conn = self._connection()
+            now = time.time()
+            for namespace, counters in snapshot.items():
+                conn.execute(
+                    "INSERT OR REPLACE INTO worker_stats (pid, namespace, hits, misses, sets, fills, fill_ms, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (os.getpid(), namespace, counters['hits'], counters['misses'], counters['sets'],
+                     counters['fills'], counters['fill_ms'], now)
+                )
+            # Workers that stopped reporting a day ago are gone
+            conn.execute("DELETE FROM worker_stats WHERE updated_at < ?", (now - 86400,))
+        except sqlite3.Error as e:
+            self._failed(e)
+
+    def stats(self):
+        """
+        Hit ratios and fill costs per worker and namespace, plus entry counts
+        """
+        with self._lock:
+            errors = dict(self._errors) if self._pid == os.getpid() else {'busy': 0, 'errors': 0}
+        stats = {'enabled': self.enabled, 'disabled_reason': self.disabled_reason, 'path': self.path,
+                 'pid': os.getpid(), 'busy': errors['busy'], 'errors': errors['errors'], 'workers': {}, 'entries': {}}
+        if not self.enabled:
+            return stats
+        self.flush_stats()
+        try:
+            conn = self._connection()
+            for pid, namespace, hits, misses, sets, fills, fill_ms, updated_at in conn.execute(
+                "SELECT pid, namespace, hits, misses, sets, fills, fill_ms, updated_at FROM worker_stats"
+            ):
+                lookups = hits + misses
+                stats['workers'].setdefault(str(pid), {})[namespace] = {
+                    'hits': hits,
+                    'misses': misses,
+                    'hit_ratio': hits / lookups if lookups else 0.0,
+                    'sets': sets,
+                    'fills': fills,
+                    'fill_ms_total': round(fill_ms, 1),
+                    'fill_ms_avg': round(fill_ms / fills, 1) if fills else 0.0,
+                    'reported_seconds_ago': round(time.time() - updated_at, 1)
+                }
+            for namespace, count in conn.execute(
+                "SELECT namespace, COUNT(*) FROM entries WHERE expires_at > ? GROUP BY namespace", (time.time(),)
+            ):
+                stats['entries'][namespace] = count
+        except sqlite3.Error as e:
+            self._failed(e)
+        return stats
+
+
+class InvalidationSignal:
+    """
+    Cross-process "something changed" flag on top of SharedCache.bump/version.
+    send() after a write; poll() returns True once per change made by another
+    process (reads the shared version at most every check_interval seconds).
+    A send that fails (busy database) is retried on the next send or poll.
+    """
+
+    def __init__(self, name, cache, check_interval=1):
+        self.name = name
+        self.cache = cache
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._seen = None
+        self._checked_at = 0
+        self._pending = False
+
+    def send(self):
+        version = self.cache.bump(self.name)
+        with self._lock:
+            self._pending = version is None and self.cache.enabled
+            if version is not None and (self._seen is None or version == self._seen + 1):
+                # Our own change; the caller has already dropped its local copy
+                self._seen = version
+
+    def poll(self):
+        now = time.time()
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return False
+            self._checked_at = now
+            pending = self._pending
+        if pending:
+            self.send()
+        version = self.cache.version(self.name)
+        with self._lock:
+            if version is None:
+                return False
+            changed = self._seen is not None and version != self._seen
+            self._seen = version
+            return changed
+
+
+shared_cache = SharedCache(
+    SHARED_CACHE_PATH,
+    enabled=SHARED_CACHE_ENABLED,
+    busy_timeout=SHARED_CACHE_BUSY_TIMEOUT,
+    stats_interval=SHARED_CACHE_STATS_INTERVAL,
+    purge_every=SHARED_CACHE_PURGE_EVERY,
+    event_retention=SHARED_CACHE_EVENT_RETENTION
+)
+
+
+def invalidation_signal(name):
+    """
+    Invalidation signal shared by every worker on this host
+    """
+    return InvalidationSignal(name, shared_cache, check_interval=SHARED_CACHE_SIGNAL_INTERVAL)
+
+
+def get_shared_cache_stats():
+    """
+    Get shared cache hit ratios and fill costs for every worker
+    """
+    return shared_cache.stats()
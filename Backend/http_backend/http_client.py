@@ -0,0 +1,261 @@
+#http_client.py
+
+import requests
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '5'))
+# Keep-alive connections per host; size it to at least worker threads + Power BI call threads
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '16'))
+HTTP_POOL_HOSTS = int(os.getenv('HTTP_POOL_HOSTS', '10'))
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '2'))
+HTTP_BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', '0.2'))
+HTTP_BACKOFF_MAX = float(os.getenv('HTTP_BACKOFF_MAX', '2'))
+# 429 handling: longest Retry-After we are willing to wait, how many callers may wait at once,
+# and how many times a throttled request is re-sent
+HTTP_RETRY_AFTER_MAX = float(os.getenv('HTTP_RETRY_AFTER_MAX', '30'))
+HTTP_RETRY_AFTER_DEFAULT = float(os.getenv('HTTP_RETRY_AFTER_DEFAULT', '5'))
+HTTP_THROTTLE_MAX_WAITERS = int(os.getenv('HTTP_THROTTLE_MAX_WAITERS', '32'))
+HTTP_THROTTLE_RETRIES = int(os.getenv('HTTP_THROTTLE_RETRIES', '2'))
+
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS')
+RETRY_STATUSES = (502, 503, 504)
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+_stats = {}
+_stats_lock = threading.Lock()
+_throttled_until = {}  # host -> epoch seconds
+_throttle_waiters = threading.BoundedSemaphore(HTTP_THROTTLE_MAX_WAITERS)
+
+
+class ThrottledError(Exception):
+    """
+    Raised when a host is throttling us (429) and the caller cannot wait:
+    Retry-After is longer than HTTP_RETRY_AFTER_MAX or the wait queue is full
+    """
+
+    def __init__(self, host, retry_after):
+        self.host = host
+        self.retry_after = retry_after
+        super().__init__(f"{host} is throttling requests, retry after {int(retry_after) + 1}s")
+
+
+def _new_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_http_session():
+    """
+    Process-wide keep-alive session (a new one is built in each forked worker)
+    """
+    global _session, _session_pid, _throttle_waiters
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            # Never reuse the parent's sockets after fork
+            _session = _new_session()
+            _session_pid = os.getpid()
+            _throttle_waiters = threading.BoundedSemaphore(HTTP_THROTTLE_MAX_WAITERS)
+            with _stats_lock:
+                _stats.clear()
+        return _session
+
+
+def reset_http_session():
+    """
+    Drop the current session and its connections (next call builds a new one)
+    """
+    global _session, _session_pid
+    with _session_lock:
+        if _session is not None and _session_pid == os.getpid():
+            _session.close()
+        _session = None
+        _session_pid = None
+
+
+def _host_stats(host):
+    return _stats.setdefault(host, {
+        'requests': 0,
+        'errors': 0,
+        'retries': 0,
+        'latency_total_ms': 0.0,
+        'latency_max_ms': 0.0,
+        'throttled': 0,
+        'throttle_waits': 0,
+        'throttle_rejections': 0
+    })
+
+
+def _count(host, counter):
+    with _stats_lock:
+        _host_stats(host)[counter] += 1
+
+
+def _record(host, elapsed, error=False, retried=False):
+    with _stats_lock:
+        host_stats = _host_stats(host)
+        host_stats['requests'] += 1
+        host_stats['latency_total_ms'] += elapsed * 1000
+        host_stats['latency_max_ms'] = max(host_stats['latency_max_ms'], elapsed * 1000)
+        if error:
+            host_stats['errors'] += 1
+        if retried:
+            host_stats['retries'] += 1
+
+
+def backoff_delay(attempt):
+    """
+    Full-jitter exponential backoff for retry number attempt (1-based)
+    """
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header (delta seconds or HTTP date)
+    Returns: seconds to wait
+    """
+    if not value:
+        return HTTP_RETRY_AFTER_DEFAULT
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return HTTP_RETRY_AFTER_DEFAULT
+
+
+def _wait_for_throttle(host):
+    """
+    Block until the host's Retry-After window has passed, if we are allowed to wait
+    """
+    delay = _throttled_until.get(host, 0) - time.time()
+    if delay <= 0:
+        return
+    if delay > HTTP_RETRY_AFTER_MAX or not _throttle_waiters.acquire(blocking=False):
+        _count(host, 'throttle_rejections')
+        raise ThrottledError(host, delay)
+    try:
+        _count(host, 'throttle_waits')
+        time.sleep(delay)
+    finally:
+        _throttle_waiters.release()
+
+
+def http_request(method, url, retries=None, **kwargs):
+    """
+    Send a request on the shared session with default connect/read timeouts.
+    Idempotent methods are retried on connection errors, timeouts and 502/503/504
+    with jittered backoff; other methods are sent once.
+    A 429 response marks the host as throttled for its Retry-After period: every
+    request to that host waits out the window (bounded queue, see ThrottledError)
+    and the throttled request itself is re-sent up to HTTP_THROTTLE_RETRIES times.
+    Returns: requests.Response (raises requests exceptions like requests.request)
+    """
+    method = method.upper()
+    kwargs.setdefault('timeout', (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+    if retries is None:
+        retries = HTTP_MAX_RETRIES if method in IDEMPOTENT_METHODS else 0
+
+    host = urlsplit(url).netloc
+    session = get_http_session()
+    attempt = 0
+    throttle_attempt = 0
+    while True:
+        _wait_for_throttle(host)
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            _record(host, time.perf_counter() - start, error=True, retried=attempt > 0)
+            attempt += 1
+            if attempt > retries:
+                raise
+            time.sleep(backoff_delay(attempt))
+            continue
+
+        _record(host, time.perf_counter() - start, error=response.status_code >= 500, retried=attempt > 0)
+        if response.status_code == 429:
+            _count(host, 'throttled')
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            _throttled_until[host] = max(_throttled_until.get(host, 0), time.time() + retry_after)
+            if throttle_attempt < HTTP_THROTTLE_RETRIES and retry_after <= HTTP_RETRY_AFTER_MAX:
+                throttle_attempt += 1
+                response.close()
+                continue
+            return response
+        if response.status_code in RETRY_STATUSES and attempt < retries:
+            attempt += 1
+            response.close()
+            time.sleep(backoff_delay(attempt))
+            continue
+        return response
+
+
+def http_get(url, **kwargs):
+    """GET on the shared session (retried)"""
+    return http_request('GET', url, **kwargs)
+
+
+def http_post(url, **kwargs):
+    """POST on the shared session (not retried)"""
+    return http_request('POST', url, **kwargs)
+
+
+class SharedHttpClient:
+    """
+    requests-compatible client for MSAL's http_client argument.
+    Resolves the session per call so MSAL apps built before a fork stay safe.
+    """
+
+    def get(self, url, **kwargs):
+        return http_request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return http_request('POST', url, **kwargs)
+
+    def close(self):
+        pass
+
+
+shared_http_client = SharedHttpClient()
+
+
+def get_http_stats():
+    """
+    Per-host latency and connection reuse statistics for this process
+    """
+    with _stats_lock:
+        stats = {host: dict(values) for host, values in _stats.items()}
+
+    for host_stats in stats.values():
+        host_stats['latency_avg_ms'] = host_stats['latency_total_ms'] / host_stats['requests'] if host_stats['requests'] else 0.0
+
+    with _session_lock:
+        session = _session if _session_pid == os.getpid() else None
+    if session is not None:
+        adapter = session.get_adapter('https://')
+        for key in list(adapter.poolmanager.pools.keys()):
+            pool = adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            host = pool.host if pool.port in (None, 443, 80) else f"{pool.host}:{pool.port}"
+            host_stats = stats.setdefault(host, {})
+            host_stats['connections_opened'] = pool.num_connections
+            host_stats['pool_requests'] = pool.num_requests
+            host_stats['connections_reused'] = max(pool.num_requests - pool.num_connections, 0)
+
+    return stats
@@ -0,0 +1,222 @@
+#embed_token_cache.py
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from Backend.cache_backend.shared_cache import shared_cache, invalidation_signal
+
+# Stop serving a cached embed token this many seconds before its expiration
+EMBED_TOKEN_REFRESH_MARGIN = int(os.getenv('EMBED_TOKEN_REFRESH_MARGIN', '600'))
+# Upper bound on how long any entry is kept, whatever Power BI says
+EMBED_TOKEN_CACHE_TTL = int(os.getenv('EMBED_TOKEN_CACHE_TTL', '3600'))
+EMBED_TOKEN_CACHE_MAX_ENTRIES = int(os.getenv('EMBED_TOKEN_CACHE_MAX_ENTRIES', '2000'))
+
+SHARED_NAMESPACE = 'embed_token'
+
+
+def parse_expiration(expiration):
+    """
+    Parse the GenerateToken 'expiration' value (ISO 8601, UTC)
+    Returns: epoch seconds or None if missing/invalid
+    """
+    if not expiration:
+        return None
+    try:
+        value = expiration.replace('Z', '+00:00')
+        # Power BI sends 7 fractional digits; fromisoformat accepts at most 6
+        if '.' in value:
+            head, rest = value.split('.', 1)
+            digits = ''.join(ch for ch in rest if ch.isdigit())
+            value = f"{head}.{digits[:6]}{rest[len(digits):]}"
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    except (ValueError, AttributeError):
+        return None
+
+
+class EmbedTokenCache:
+    """
+    LRU + TTL cache of Power BI embed tokens.
+    Keyed by (group, report, datasets, username, roles); an entry is served until
+    refresh_margin seconds before the token's own expiration and never longer than ttl.
+    With a shared store, tokens are written through to it and local misses are
+    looked up there, so a token generated by one worker serves all of them;
+    purges are broadcast to the other workers through signal.
+    """
+
+    def __init__(self, max_entries=2000, ttl=3600, refresh_margin=600, shared=None, signal=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.shared = shared
+        self.signal = signal
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, expires_at, report_id, stored_at)
+        self._stats = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0, 'purged': 0}
+
+    @staticmethod
+    def make_key(group_id, report_id, datasets, username, roles):
+        return (
+            (group_id or '').lower(),
+            (report_id or '').lower(),
+            tuple(sorted(d.strip().lower() for d in datasets if d and d.strip())),
+            (username or '').lower(),
+            tuple(sorted(roles or []))
+        )
+
+    def _poll_signal(self):
+        if self.signal is not None and self.signal.poll():
+            # Tokens were purged through another worker
+            self._clear_local()
+
+    def _store_local(self, key, value, expires_at, stored_at):
+        # Called with self._lock held
+        self._entries[key] = (value, expires_at, key[1], stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evicted'] += 1
+
+    def _get_shared(self, key):
+        """
+        Returns: (value, expires_at, stored_at) from the shared store or None
+        """
+        if self.shared is None:
+            return None
+        stored = self.shared.get(SHARED_NAMESPACE, key)
+        if stored is None or stored[1] - time.time() <= self.refresh_margin:
+            return None
+        return stored
+
+    def get(self, key):
+        """
+        Returns: cached value or None
+        """
+        self._poll_signal()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry[0], entry[1]
+                if expires_at - now > self.refresh_margin:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return value
+                del self._entries[key]
+                self._stats['expired'] += 1
+
+        stored = self._get_shared(key)
+        with self._lock:
+            if stored is None:
+                self._stats['misses'] += 1
+                return None
+            value, expires_at, stored_at = stored
+            self._store_local(key, value, expires_at, stored_at)
+            self._stats['shared_hits'] += 1
+            return value
+
+    def put(self, key, value, expiration=None):
+        """
+        Store a value; expiration is the GenerateToken 'expiration' string
+        """
+        now = time.time()
+        expires_at = now + self.ttl + self.refresh_margin
+        token_expires_at = parse_expiration(expiration)
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+
+        with self._lock:
+            self._store_local(key, value, expires_at, now)
+        if self.shared is not None:
+            self.shared.set(SHARED_NAMESPACE, key, (value, expires_at, now), expires_at - now, tag=key[1])
+
+    def time_left(self, key):
+        """
+        Seconds until the cached token for key expires (None if not cached)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1] - time.time() if entry else None
+
+    def lifetime(self, key):
+        """
+        Returns: (stored_at, expires_at) epoch seconds for the freshest cached token, or None
+        """
+        self._poll_signal()
+        stored = self._get_shared(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if stored is not None and (entry is None or stored[2] > entry[3]):
+                # Another worker already generated a newer token
+                self._store_local(key, stored[0], stored[1], stored[2])
+                entry = self._entries[key]
+            return (entry[3], entry[1]) if entry else None
+
+    def purge_report(self, report_id):
+        """
+        Drop every cached token for a report (in every worker)
+        Returns: number of entries removed
+        """
+        report_key = (report_id or '').lower()
+        with self._lock:
+            keys = [k for k, e in self._entries.items() if e[2] == report_key]
+            for key in keys:
+                del self._entries[key]
+            self._stats['purged'] += len(keys)
+        if self.shared is not None:
+            self.shared.delete_tag(SHARED_NAMESPACE, report_key)
+        if self.signal is not None:
+            self.signal.send()
+        return len(keys)
+
+    def _clear_local(self):
+        with self._lock:
+            self._stats['purged'] += len(self._entries)
+            self._entries.clear()
+
+    def clear(self):
+        self._clear_local()
+        if self.shared is not None:
+            self.shared.clear(SHARED_NAMESPACE)
+        if self.signal is not None:
+            self.signal.send()
+
+    def stats(self):
+        """
+        Snapshot of cache counters
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['max_entries'] = self.max_entries
+            lookups = stats['hits'] + stats['shared_hits'] + stats['misses']
+            stats['hit_ratio'] = (stats['hits'] + stats['shared_hits']) / lookups if lookups else 0.0
+            return stats
+
+
+embed_token_cache = EmbedTokenCache(
+    max_entries=EMBED_TOKEN_CACHE_MAX_ENTRIES,
+    ttl=EMBED_TOKEN_CACHE_TTL,
+    refresh_margin=EMBED_TOKEN_REFRESH_MARGIN,
+    shared=shared_cache,
+    signal=invalidation_signal('embed_token')
+)
+
+
+def get_embed_token_cache_stats():
+    """
+    Get embed token cache hit/miss counters
+    """
+    return embed_token_cache.stats()
+
+
+def purge_report_embed_tokens(report_id):
+    """
+    Remove cached embed tokens for one report
+    Returns: number of entries removed
+    """
+    return embed_token_cache.purge_report(report_id)
@@ -0,0 +1,307 @@
+#embed_token_refresher.py
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from Backend.cache_backend.shared_cache import shared_cache
+from Backend.powerbi_backend.embed_token_cache import embed_token_cache
+from Backend.powerbi_backend.embed_token_url import (
+    get_embed_token,
+    embed_token_cache_key,
+    POWERBI_CLIENT_ID,
+    POWERBI_CLIENT_SECRET,
+    POWERBI_TENANT_ID
+)
+
+# Regenerate a live session's token once this fraction of its lifetime has passed
+EMBED_REFRESH_FRACTION = float(os.getenv('EMBED_REFRESH_FRACTION', '0.5'))
+# How often the report page heartbeats, and how long without one before a session is dropped
+EMBED_HEARTBEAT_INTERVAL = int(os.getenv('EMBED_HEARTBEAT_INTERVAL', '60'))
+EMBED_SESSION_IDLE_TIMEOUT = int(os.getenv('EMBED_SESSION_IDLE_TIMEOUT', '300'))
+EMBED_REFRESH_TICK = int(os.getenv('EMBED_REFRESH_TICK', '15'))
+EMBED_REFRESH_WORKERS = int(os.getenv('EMBED_REFRESH_WORKERS', '4'))
+# Seconds a worker holds its claim on a due refresh (other workers skip that token meanwhile)
+EMBED_REFRESH_LEASE = int(os.getenv('EMBED_REFRESH_LEASE', '60'))
+
+SESSION_NAMESPACE = 'embed_sessions'
+LEASE_NAMESPACE = 'embed_refresh_lease'
+
+# get_embed_token arguments kept with a session; the service principal comes from the environment
+SESSION_TOKEN_FIELDS = ('report_id', 'group_id', 'core_dataset', 'proxy_dataset', 'username', 'roles')
+
+
+class EmbedSessionScheduler:
+    """
+    Tracks live report embeds (one per user and dashboard) and regenerates their
+    embed tokens in the background before they run out, so the report page can
+    pick up a fresh token from the embed token cache without waiting on Power BI.
+    Sessions that stop heartbeating for idle_timeout seconds are dropped.
+    With a shared store, sessions live there so a heartbeat can reach any worker,
+    and each due refresh is claimed by one worker for lease seconds instead of
+    running in all of them. Without one, each worker tracks its own sessions.
+    """
+
+    def __init__(self, refresh_fraction=0.5, idle_timeout=300, tick=15, workers=4, shared=None, lease=60):
+        self.refresh_fraction = refresh_fraction
+        self.idle_timeout = idle_timeout
+        self.tick = tick
+        self.workers = workers
+        self.shared = shared
+        self.lease = lease
+        self._reset_state()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_state)
+
+    def _reset_state(self):
+        # Threads, executors and held locks do not survive fork: start over in the child
+        self._lock = threading.Lock()
+        self._sessions = {}  # "user_id:dashboard_id" -> session dict (without a shared store)
+        self._refreshing = set()
+        self._thread = None
+        self._executor = None
+        self._stop = threading.Event()
+        self._stats = {'registered': 0, 'heartbeats': 0, 'refreshes': 0, 'refresh_errors': 0,
+                       'expired_sessions': 0, 'claimed_elsewhere': 0}
+
+    @staticmethod
+    def _key(user_id, dashboard_id):
+        return f"{user_id}:{dashboard_id}"
+
+    def _use_shared(self):
+        return self.shared is not None and self.shared.enabled
+
+    def _save(self, key, session):
+        if self._use_shared():
+            self.shared.set(SESSION_NAMESPACE, key, session, self.idle_timeout)
+        else:
+            with self._lock:
+                self._sessions[key] = session
+
+    def _load(self, key):
+        if self._use_shared():
+            return self.shared.get(SESSION_NAMESPACE, key)
+        with self._lock:
+            session = self._sessions.get(key)
+        if session is None or time.time() - session['last_seen'] > self.idle_timeout:
+            return None
+        return session
+
+    def _delete(self, key):
+        if self._use_shared():
+            self.shared.delete(SESSION_NAMESPACE, key)
+        else:
+            with self._lock:
+                self._sessions.pop(key, None)
+
+    def _all(self):
+        """
+        Returns: list of (key, session) for live sessions (idle local ones are dropped)
+        """
+        if self._use_shared():
+            # Idle sessions expire in the store (each heartbeat rewrites them with a fresh ttl)
+            return self.shared.items(SESSION_NAMESPACE) or []
+        now = time.time()
+        with self._lock:
+            for key in [k for k, s in self._sessions.items() if now - s['last_seen'] > self.idle_timeout]:
+                del self._sessions[key]
+                self._stats['expired_sessions'] += 1
+            return list(self._sessions.items())
+
+    @staticmethod
+    def token_args(session):
+        """
+        Returns: get_embed_token keyword arguments for a session
+        """
+        return dict(session['token_args'], client_id=POWERBI_CLIENT_ID, tenant_id=POWERBI_TENANT_ID,
+                    client_secret=POWERBI_CLIENT_SECRET)
+
+    @staticmethod
+    def cache_key(token_args):
+        return embed_token_cache_key(
+            token_args['group_id'], token_args['report_id'], token_args['core_dataset'],
+            token_args.get('proxy_dataset'), token_args.get('username'), token_args.get('roles')
+        )
+
+    def start(self):
+        """
+        Start the refresh loop in this process (threads do not survive fork; call again in each worker)
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop = threading.Event()
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='embed-refresh')
+            self._thread = threading.Thread(target=self._run, name='embed-refresh-scheduler', daemon=True)
+            self._thread.start()
+
+    def register(self, user_id, dashboard_id, token_args, department_id=None):
+        """
+        Start (or restart) tracking an embed session
+        token_args: keyword arguments that were passed to get_embed_token
+        department_id: the viewer's department (its sessions are dropped when its access is revoked)
+        """
+        self.start()
+        self._save(self._key(user_id, dashboard_id), {
+            'user_id': user_id,
+            'dashboard_id': dashboard_id,
+            'department_id': department_id,
+            'token_args': {field: token_args.get(field) for field in SESSION_TOKEN_FIELDS},
+            'last_seen': time.time()
+        })
+        with self._lock:
+            self._stats['registered'] += 1
+
+    def heartbeat(self, user_id, dashboard_id):
+        """
+        Mark a session as still open
+        Returns: session dict or None if the session is unknown
+        """
+        key = self._key(user_id, dashboard_id)
+        session = self._load(key)
+        if session is None:
+            return None
+        session['last_seen'] = time.time()
+        self._save(key, session)
+        with self._lock:
+            self._stats['heartbeats'] += 1
+        return session
+
+    def current_token(self, user_id, dashboard_id):
+        """
+        Heartbeat a session and return its pre-minted token
+        Returns: ((embed_token, embed_url, workspace_name, report_name), seconds_left, error_message)
+        """
+        session = self.heartbeat(user_id, dashboard_id)
+        if session is None:
+            return None, None, 'No live embed session'
+
+        token_args = self.token_args(session)
+        cache_key = self.cache_key(token_args)
+        value = embed_token_cache.get(cache_key)
+        if value is None:
+            # The scheduler has not caught up (purged or evicted); mint it now
+            token, embed_url, workspace_name, report_name, error = get_embed_token(**token_args)
+            if error:
+                return None, None, error
+            value = (token, embed_url, workspace_name, report_name)
+
+        return value, embed_token_cache.time_left(cache_key), None
+
+    def forget(self, user_id=None, dashboard_id=None, department_id=None):
+        """
+        Drop sessions for a user, dashboard and/or department (access revoked, dashboard changed)
+        Returns: number of sessions removed
+        """
+        removed = 0
+        for key, session in self._all():
+            if ((user_id is None or session['user_id'] == user_id)
+                    and (dashboard_id is None or session['dashboard_id'] == dashboard_id)
+                    and (department_id is None or session['department_id'] == department_id)):
+                self._delete(key)
+                removed += 1
+        return removed
+
+    def _due(self, cache_key, now):
+        lifetime = embed_token_cache.lifetime(cache_key)
+        if lifetime is None:
+            return True
+        stored_at, expires_at = lifetime
+        refresh_at = stored_at + (expires_at - stored_at) * self.refresh_fraction
+        # Never later than the point where the cache itself stops serving the token
+        refresh_at = min(refresh_at, expires_at - embed_token_cache.refresh_margin - self.tick)
+        return now >= refresh_at
+
+    def _claim(self, refresh_key):
+        # Without a shared store every worker refreshes its own sessions
+        if not self._use_shared():
+            return True
+        return self.shared.add(LEASE_NAMESPACE, refresh_key, os.getpid(), self.lease)
+
+    def _refresh(self, refresh_key, dashboard_id, token_args):
+        try:
+            _, _, _, _, error = get_embed_token(**token_args, force_refresh=True)
+            with self._lock:
+                self._stats['refreshes'] += 1
+                if error:
+                    self._stats['refresh_errors'] += 1
+            if error:
+                print(f"Error refreshing embed token for dashboard {dashboard_id}: {error}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(refresh_key)
+
+    def run_once(self):
+        """
+        Drop idle sessions and schedule refreshes that are due
+        Returns: number of refreshes scheduled
+        """
+        now = time.time()
+        scheduled = 0
+        for _, session in self._all():
+            token_args = self.token_args(session)
+            cache_key = self.cache_key(token_args)
+            # One refresh per token, however many sessions (or workers) share it
+            refresh_key = str(cache_key)
+            with self._lock:
+                if refresh_key in self._refreshing:
+                    continue
+            if not self._due(cache_key, now):
+                continue
+            if not self._claim(refresh_key):
+                with self._lock:
+                    self._stats['claimed_elsewhere'] += 1
+                continue
+            with self._lock:
+                if refresh_key in self._refreshing:
+                    continue
+                self._refreshing.add(refresh_key)
+            self._executor.submit(self._refresh, refresh_key, session['dashboard_id'], token_args)
+            scheduled += 1
+        return scheduled
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error in embed token refresh scheduler: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def stats(self):
+        live_sessions = len(self._all())
+        with self._lock:
+            stats = dict(self._stats)
+            stats['live_sessions'] = live_sessions
+            stats['shared'] = self._use_shared()
+            stats['refreshing'] = len(self._refreshing)
+            stats['refresh_fraction'] = self.refresh_fraction
+            return stats
+
+
+embed_session_scheduler = EmbedSessionScheduler(
+    refresh_fraction=EMBED_REFRESH_FRACTION,
+    idle_timeout=EMBED_SESSION_IDLE_TIMEOUT,
+    tick=EMBED_REFRESH_TICK,
+    workers=EMBED_REFRESH_WORKERS,
+    shared=shared_cache,
+    lease=EMBED_REFRESH_LEASE
+)
+
+
+def start_embed_session_scheduler():
+    """
+    Start the background embed token refresher in this process
+    """
+    embed_session_scheduler.start()
+
+
+def get_embed_session_stats():
+    """
+    Get live embed session and background refresh counters
+    """
+    return embed_session_scheduler.stats()
@@ -1,99 +1,333 @@
 #embed_token_url.py
 
-import msal
-import requests
 import os
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    # dotenv not available (that's okay in production)
-    pass
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from Backend.powerbi_backend.msal_clients import service_client_registry, POWERBI_SCOPE
+from Backend.http_backend.http_client import http_post, parse_retry_after, ThrottledError
+from Backend.powerbi_backend.single_flight import SingleFlight
+from Backend.cache_backend.shared_cache import shared_cache
+from Backend.powerbi_backend.embed_token_cache import embed_token_cache
+from Backend.powerbi_backend.report_metadata_cache import (
+    report_metadata_cache,
+    fetch_report_metadata,
+    fetch_workspace_name,
+    fetch_report_info,
+    build_report_metadata
+)
 
 POWERBI_CLIENT_ID = os.getenv('POWERBI_CLIENT_ID')
 POWERBI_CLIENT_SECRET = os.getenv('POWERBI_CLIENT_SECRET')
 POWERBI_TENANT_ID = os.getenv('POWERBI_TENANT_ID')
 
+# Overlap the workspace lookup with the report lookup and GenerateToken on a thread pool
+POWERBI_PARALLEL_CALLS = os.getenv('POWERBI_PARALLEL_CALLS', 'true').lower() in ('1', 'true', 'yes')
+POWERBI_CALL_WORKERS = int(os.getenv('POWERBI_CALL_WORKERS', '8'))
 
-def get_embed_token(client_id, tenant_id, client_secret, report_id, group_id, core_dataset, proxy_dataset="", username="user@example.com", roles=None):
+POWERBI_SINGLE_FLIGHT_TIMEOUT = float(os.getenv('POWERBI_SINGLE_FLIGHT_TIMEOUT', '30'))
+# Most reports packed into one multi-resource GenerateToken call
+POWERBI_BATCH_MAX_REPORTS = int(os.getenv('POWERBI_BATCH_MAX_REPORTS', '20'))
+
+embed_token_single_flight = SingleFlight(wait_timeout=POWERBI_SINGLE_FLIGHT_TIMEOUT)
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """
+    Shared thread pool for Power BI REST calls (recreated in a forked worker)
+    """
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=POWERBI_CALL_WORKERS, thread_name_prefix='powerbi-call')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _timed(timings, stage, func, *args):
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        if timings is not None:
+            timings[stage] = round((time.perf_counter() - start) * 1000, 1)
+
+
+def _generate_token(headers, payload):
+    """
+    Call GenerateToken
+    Returns: (token_json, error_message)
+    """
+    token_url = 'https://api.powerbi.com/v1.0/myorg/GenerateToken'
+    token_resp = http_post(token_url, headers=headers, json=payload)
+
+    if token_resp.status_code == 429:
+        retry_after = parse_retry_after(token_resp.headers.get('Retry-After'))
+        return None, f"Power BI is busy right now, please try again in {int(retry_after) + 1} seconds"
+
+    if token_resp.status_code != 200:
+        error_text = token_resp.text
+        return None, f"Token generation failed: {error_text}"
+
+    return token_resp.json(), None
+
+
+def _request_embed_token(client_id, tenant_id, client_secret, report_id, group_id, core_dataset, proxy_dataset, username, roles, client_registry, use_cache, parallel, timings, cache_key):
+    """
+    Run the AAD / Power BI round trips for get_embed_token and fill the caches
+    Returns: (embed_token, embed_url, workspace_name, report_name, error_message)
+    """
+    started = time.perf_counter()
+    registry = client_registry or service_client_registry
+    result = _timed(timings, 'aad_token', registry.acquire_token, tenant_id, client_id, client_secret, POWERBI_SCOPE)
+    
+    if 'access_token' not in result:
+        error_msg = result.get('error_description', 'Unknown error')
+        return None, None, None, None, f"Error acquiring access token: {error_msg}"
+    
+    access_token = result['access_token']
+    
+    headers = {
+        'Authorization': f'Bearer {access_token}',
+        'Content-Type': 'application/json'
+    }
+    
+    datasets_list = [{"id": core_dataset, "xmlaPermissions": "ReadOnly"}]
+    if proxy_dataset and proxy_dataset.strip():
+        datasets_list.append({"id": proxy_dataset, "xmlaPermissions": "ReadOnly"})
+    
+    identity_datasets = [core_dataset]
+    
+    payload = {
+        "datasets": datasets_list,
+        "reports": [{"id": report_id}],
+        "targetWorkspaces": [{"id": group_id}],
+        "accessLevel": "View",
+        "identities": [
+            {
+                "username": username,
+                "roles": roles if roles else ["RM"],
+                "datasets": identity_datasets
+            }
+        ]
+    }
+    
+    metadata = report_metadata_cache.get(group_id, report_id, headers) if use_cache else None
+    metadata_cached = metadata is not None
+    if timings is not None:
+        timings['report_metadata_cache'] = 'hit' if metadata_cached else 'miss'
+    
+    if metadata_cached:
+        token_data, error = _timed(timings, 'generate_token', _generate_token, headers, payload)
+    elif parallel:
+        # The workspace lookup overlaps the other two calls. GenerateToken waits for the report
+        # lookup, so a bad report ID or missing access never spends a (throttled) token call
+        workspace_future = _get_executor().submit(_timed, timings, 'workspace_lookup', fetch_workspace_name, headers, group_id)
+        report_result = _timed(timings, 'report_lookup', fetch_report_info, headers, group_id, report_id)
+        error = report_result[1]
+        if not error:
+            token_data, error = _timed(timings, 'generate_token', _generate_token, headers, payload)
+            metadata, metadata_error = build_report_metadata(workspace_future.result(), report_result)
+            error = metadata_error or error
+    else:
+        workspace_result = _timed(timings, 'workspace_lookup', fetch_workspace_name, headers, group_id)
+        report_result = _timed(timings, 'report_lookup', fetch_report_info, headers, group_id, report_id)
+        metadata, error = build_report_metadata(workspace_result, report_result)
+        if not error:
+            token_data, error = _timed(timings, 'generate_token', _generate_token, headers, payload)
+    
+    if error:
+        return None, None, None, None, error
+    
+    if use_cache and not metadata_cached:
+        report_metadata_cache.put(group_id, report_id, metadata)
+    
+    workspace_name = metadata['workspace_name']
+    report_name = metadata['report_name']
+    embed_token = token_data.get('token')
+    embed_url = metadata['embed_url']
+
+    if use_cache and embed_token:
+        embed_token_cache.put(cache_key, (embed_token, embed_url, workspace_name, report_name), token_data.get('expiration'))
+        shared_cache.record_fill('embed_token', time.perf_counter() - started)
+
+    return embed_token, embed_url, workspace_name, report_name, None
+
+
+def embed_token_cache_key(group_id, report_id, core_dataset, proxy_dataset, username, roles):
+    """
+    Embed token cache key for one report as requested by get_embed_token
+    """
+    return embed_token_cache.make_key(group_id, report_id, [core_dataset, proxy_dataset], username, roles if roles else ["RM"])
+
+
+def get_embed_token(client_id, tenant_id, client_secret, report_id, group_id, core_dataset, proxy_dataset="", username="user@example.com", roles=None, client_registry=None, use_cache=True, parallel=None, timings=None, force_refresh=False):
     """
     Generate Power BI embed token with workspace name and report name
+    The AAD access token comes from client_registry (default: the shared service-principal registry)
+    With use_cache a still-valid token for the same report, datasets, username and roles is reused,
+    and workspace/report names and embedUrl come from the report metadata cache
+    With parallel (default POWERBI_PARALLEL_CALLS) the metadata lookups and GenerateToken run concurrently
+    Concurrent identical requests are coalesced into one upstream call (single flight)
+    With force_refresh a new token is generated and cached even if a valid one is cached
+    If a timings dict is passed, per-stage durations in milliseconds are written into it
     Returns: (embed_token, embed_url, workspace_name, report_name, error_message)
     """
+    started = time.perf_counter()
+    if parallel is None:
+        parallel = POWERBI_PARALLEL_CALLS
+
+    try:
+        cache_key = embed_token_cache_key(group_id, report_id, core_dataset, proxy_dataset, username, roles)
+        if use_cache and not force_refresh:
+            cached = embed_token_cache.get(cache_key)
+            if cached:
+                embed_token, embed_url, workspace_name, report_name = cached
+                if timings is not None:
+                    timings['embed_token_cache'] = 'hit'
+                return embed_token, embed_url, workspace_name, report_name, None
+
+        request_args = (client_id, tenant_id, client_secret, report_id, group_id, core_dataset, proxy_dataset,
+                        username, roles, client_registry, use_cache, parallel, timings, cache_key)
+        if not use_cache:
+            return _request_embed_token(*request_args)
+
+        # Identical concurrent requests wait for one in-flight call and share its result
+        result, shared = embed_token_single_flight.do(cache_key, lambda: _request_embed_token(*request_args))
+        if shared and timings is not None:
+            timings['single_flight'] = 'shared'
+        return result
+    
+    except ThrottledError as e:
+        return None, None, None, None, f"Power BI is busy right now, please try again in {int(e.retry_after) + 1} seconds"
+    except Exception as e:
+        return None, None, None, None, f"Error: {str(e)}"
+    finally:
+        if timings is not None:
+            timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def _get_report_metadata(headers, group_id, report_id):
+    """
+    Report metadata from cache, fetched and cached on a miss
+    Returns: (metadata_dict, error_message)
+    """
+    metadata = report_metadata_cache.get(group_id, report_id, headers)
+    if metadata is not None:
+        return metadata, None
+    metadata, error = fetch_report_metadata(headers, group_id, report_id)
+    if metadata:
+        report_metadata_cache.put(group_id, report_id, metadata)
+    return metadata, error
+
+
+def get_multi_embed_token(client_id, tenant_id, client_secret, reports, username="user@example.com", roles=None):
+    """
+    Generate one multi-resource embed token per workspace for several reports
+    reports: list of dicts with key (the caller's id for the entry, e.g. a DashboardID),
+    report_id, group_id, core_dataset, proxy_dataset; entries may share a report
+    with different datasets
+    Each entry's token is also stored in the embed token cache under its single-report key,
+    so a later get_embed_token for any of them is a cache hit
+    Returns: ({key: (embed_token, embed_url, workspace_name, report_name)}, {key: error_message})
+    """
+    roles = roles if roles else ["RM"]
+    results = {}
+    errors = {}
+
     try:
-        authority = f'https://login.microsoftonline.com/{tenant_id}'
-        scope = ['https://analysis.windows.net/powerbi/api/.default']
-        
-        app_msal = msal.ConfidentialClientApplication(
-            client_id,
-            authority=authority,
-            client_credential=client_secret
-        )
-        
-        result = app_msal.acquire_token_for_client(scopes=scope)
-        
-        if 'access_token' not in result:
-            error_msg = result.get('error_description', 'Unknown error')
-            return None, None, None, None, f"Error acquiring access token: {error_msg}"
-        
-        access_token = result['access_token']
-        
+        pending = []
+        for report in reports:
+            cache_key = embed_token_cache_key(report['group_id'], report['report_id'], report['core_dataset'], report.get('proxy_dataset'), username, roles)
+            cached = embed_token_cache.get(cache_key)
+            if cached:
+                results[report['key']] = cached
+            else:
+                pending.append((report, cache_key))
+
+        if not pending:
+            return results, errors
+
+        token_result = service_client_registry.acquire_token(tenant_id, client_id, client_secret, scopes=POWERBI_SCOPE)
+        if 'access_token' not in token_result:
+            error_msg = f"Error acquiring access token: {token_result.get('error_description', 'Unknown error')}"
+            return results, {report['key']: error_msg for report, _ in pending}
+
         headers = {
-            'Authorization': f'Bearer {access_token}',
+            'Authorization': f"Bearer {token_result['access_token']}",
             'Content-Type': 'application/json'
         }
-        
-        powerbi_api = 'https://api.powerbi.com/v1.0/myorg'
-        
-        workspace_name = 'Unknown Workspace'
-        try:
-            group_url = f"{powerbi_api}/groups/{group_id}"
-            group_resp = requests.get(group_url, headers=headers, timeout=5)
-            if group_resp.status_code == 200:
-                workspace_name = group_resp.json().get('name', 'Unknown Workspace')
-        except Exception as e:
-            print(f"Error fetching workspace name: {e}")
-            workspace_name = 'Unknown Workspace'
-        
-        report_url = f"{powerbi_api}/groups/{group_id}/reports/{report_id}"
-        report_resp = requests.get(report_url, headers=headers, timeout=5)
-        
-        if report_resp.status_code != 200:
-            return None, None, None, None, f"Report not found: {report_resp.status_code}"
-        
-        report_name = report_resp.json().get('name', 'Unknown Report')
-        
-        datasets_list = [{"id": core_dataset, "xmlaPermissions": "ReadOnly"}]
-        if proxy_dataset and proxy_dataset.strip():
-            datasets_list.append({"id": proxy_dataset, "xmlaPermissions": "ReadOnly"})
-        
-        identity_datasets = [core_dataset]
-        
-        payload = {
-            "datasets": datasets_list,
-            "reports": [{"id": report_id}],
-            "targetWorkspaces": [{"id": group_id}],
-            "accessLevel": "View",
-            "identities": [
-                {
-                    "username": username,
-                    "roles": roles if roles else ["RM"],
-                    "datasets": identity_datasets
+
+        executor = _get_executor()
+        metadata_futures = {}
+        for report, _ in pending:
+            if report['report_id'] not in metadata_futures:
+                metadata_futures[report['report_id']] = executor.submit(_get_report_metadata, headers, report['group_id'], report['report_id'])
+
+        by_workspace = {}
+        for report, cache_key in pending:
+            # Only reports the lookup found go into a GenerateToken call (one bad ID fails the whole call)
+            metadata, metadata_error = metadata_futures[report['report_id']].result()
+            if metadata_error:
+                errors[report['key']] = metadata_error
+                continue
+            by_workspace.setdefault(report['group_id'], []).append((report, cache_key, metadata))
+
+        token_futures = []
+        for group_id, group_reports in by_workspace.items():
+            for start in range(0, len(group_reports), POWERBI_BATCH_MAX_REPORTS):
+                chunk = group_reports[start:start + POWERBI_BATCH_MAX_REPORTS]
+
+                datasets = []
+                for report, _, _ in chunk:
+                    for dataset_id in (report['core_dataset'], report.get('proxy_dataset')):
+                        if dataset_id and dataset_id.strip() and dataset_id not in datasets:
+                            datasets.append(dataset_id)
+                core_datasets = []
+                report_ids = []
+                for report, _, _ in chunk:
+                    if report['core_dataset'] not in core_datasets:
+                        core_datasets.append(report['core_dataset'])
+                    if report['report_id'] not in report_ids:
+                        report_ids.append(report['report_id'])
+
+                payload = {
+                    "datasets": [{"id": dataset_id, "xmlaPermissions": "ReadOnly"} for dataset_id in datasets],
+                    "reports": [{"id": report_id} for report_id in report_ids],
+                    "targetWorkspaces": [{"id": group_id}],
+                    "accessLevel": "View",
+                    "identities": [
+                        {
+                            "username": username,
+                            "roles": roles,
+                            "datasets": core_datasets
+                        }
+                    ]
                 }
-            ]
-        }
-        
-        token_url = f"{powerbi_api}/GenerateToken"
-        token_resp = requests.post(token_url, headers=headers, json=payload, timeout=5)
-        
-        if token_resp.status_code != 200:
-            error_text = token_resp.text
-            return None, None, None, None, f"Token generation failed: {error_text}"
-        
-        embed_token = token_resp.json().get('token')
-        embed_url = report_resp.json().get('embedUrl')
-
-        return embed_token, embed_url, workspace_name, report_name, None
-    
+                token_futures.append((chunk, executor.submit(_generate_token, headers, payload)))
+
+        for chunk, future in token_futures:
+            token_data, error = future.result()
+            for report, cache_key, metadata in chunk:
+                if error:
+                    errors[report['key']] = error
+                    continue
+                value = (token_data.get('token'), metadata['embed_url'], metadata['workspace_name'], metadata['report_name'])
+                embed_token_cache.put(cache_key, value, token_data.get('expiration'))
+                results[report['key']] = value
+
+        return results, errors
+
+    except ThrottledError as e:
+        message = f"Power BI is busy right now, please try again in {int(e.retry_after) + 1} seconds"
     except Exception as e:
-        return None, None, None, None, f"Error: {str(e)}"
\ No newline at end of file
+        message = f"Error: {str(e)}"
+
+    for report in reports:
+        if report['key'] not in results:
+            errors[report['key']] = message
+    return results, errors
@@ -0,0 +1,153 @@
+#msal_clients.py
+
+import msal
+import os
+import hashlib
+import threading
+import time
+from Backend.http_backend.http_client import shared_http_client
+
+POWERBI_SCOPE = ['https://analysis.windows.net/powerbi/api/.default']
+
+# Seconds before expiry at which a cached AAD token is no longer handed out
+POWERBI_TOKEN_REFRESH_MARGIN = int(os.getenv('POWERBI_TOKEN_REFRESH_MARGIN', '300'))
+# Ad-hoc credentials from the configuration tab are forgotten after this many seconds
+CONFIG_CLIENT_TTL = int(os.getenv('CONFIG_CLIENT_TTL', '600'))
+CONFIG_CLIENT_MAX_ENTRIES = int(os.getenv('CONFIG_CLIENT_MAX_ENTRIES', '20'))
+
+
+def _fingerprint(secret):
+    return hashlib.sha256((secret or '').encode('utf-8')).hexdigest()
+
+
+class MsalClientRegistry:
+    """
+    Process-wide registry of MSAL confidential clients keyed by (tenant, client_id).
+    With shared_cache the clients share one MSAL token cache; the service-principal
+    access token for each set of scopes is reused until refresh_margin seconds
+    before it expires.
+    A client is rebuilt if its secret changes; with entry_ttl set, clients unused
+    for that long are dropped (used for the short-lived configuration partition).
+    """
+
+    def __init__(self, name, refresh_margin=300, entry_ttl=None, max_entries=None, shared_cache=True):
+        self.name = name
+        self.refresh_margin = refresh_margin
+        self.entry_ttl = entry_ttl
+        self.max_entries = max_entries
+        self.shared_cache = shared_cache
+        self._lock = threading.Lock()
+        self._token_cache = msal.TokenCache()
+        self._entries = {}  # (tenant, client_id) -> entry dict
+        self._stats = {'token_hits': 0, 'token_misses': 0, 'apps_created': 0, 'apps_expired': 0}
+
+    def _evict_expired(self, now):
+        if self.entry_ttl is None:
+            return
+        for key in [k for k, e in self._entries.items() if now - e['last_used'] > self.entry_ttl]:
+            del self._entries[key]
+            self._stats['apps_expired'] += 1
+
+    def _get_entry(self, tenant_id, client_id, client_secret, now):
+        key = (tenant_id, client_id)
+        fingerprint = _fingerprint(client_secret)
+        entry = self._entries.get(key)
+
+        if entry is None or entry['fingerprint'] != fingerprint:
+            if self.max_entries and key not in self._entries and len(self._entries) >= self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k]['last_used'])
+                del self._entries[oldest]
+                self._stats['apps_expired'] += 1
+            app = msal.ConfidentialClientApplication(
+                client_id,
+                authority=f'https://login.microsoftonline.com/{tenant_id}',
+                client_credential=client_secret,
+                # Unshared caches keep a token from being served for a different secret
+                token_cache=self._token_cache if self.shared_cache else msal.TokenCache(),
+                http_client=shared_http_client
+            )
+            entry = {
+                'app': app,
+                'fingerprint': fingerprint,
+                'tokens': {},  # scopes tuple -> (access_token, expires_at)
+                'last_used': now,
+                'lock': threading.Lock()
+            }
+            self._entries[key] = entry
+            self._stats['apps_created'] += 1
+
+        entry['last_used'] = now
+        return entry
+
+    def acquire_token(self, tenant_id, client_id, client_secret, scopes=None):
+        """
+        Get an app-only access token, from cache when it is still fresh
+        Returns: MSAL result dict ('access_token' on success, 'error_description' otherwise)
+        """
+        scopes = scopes or POWERBI_SCOPE
+        scopes_key = tuple(sorted(scopes))
+        now = time.time()
+
+        with self._lock:
+            self._evict_expired(now)
+            entry = self._get_entry(tenant_id, client_id, client_secret, now)
+
+        # One refresh per client at a time; other callers wait and reuse its token
+        with entry['lock']:
+            access_token, expires_at = entry['tokens'].get(scopes_key, (None, 0))
+            if access_token and expires_at - time.time() > self.refresh_margin:
+                with self._lock:
+                    self._stats['token_hits'] += 1
+                return {'access_token': access_token}
+
+            result = entry['app'].acquire_token_for_client(scopes=scopes)
+            with self._lock:
+                self._stats['token_misses'] += 1
+
+            if 'access_token' in result:
+                entry['tokens'][scopes_key] = (result['access_token'], time.time() + int(result.get('expires_in', 0)))
+            return result
+
+    def clear(self):
+        """
+        Drop every client and cached token in this registry
+        """
+        with self._lock:
+            self._entries.clear()
+            self._token_cache = msal.TokenCache()
+
+    def stats(self):
+        """
+        Snapshot of registry counters
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['name'] = self.name
+            stats['apps'] = len(self._entries)
+            return stats
+
+
+# Service principal used for every dashboard embed
+service_client_registry = MsalClientRegistry(
+    'service',
+    refresh_margin=POWERBI_TOKEN_REFRESH_MARGIN
+)
+
+# Ad-hoc credentials typed into the admin configuration tab
+configuration_client_registry = MsalClientRegistry(
+    'configuration',
+    refresh_margin=POWERBI_TOKEN_REFRESH_MARGIN,
+    entry_ttl=CONFIG_CLIENT_TTL,
+    max_entries=CONFIG_CLIENT_MAX_ENTRIES,
+    shared_cache=False
+)
+
+
+def get_msal_client_stats():
+    """
+    Get token hit/miss counters for both registries
+    """
+    return {
+        'service': service_client_registry.stats(),
+        'configuration': configuration_client_registry.stats()
+    }
@@ -0,0 +1,303 @@
+#report_metadata_cache.py
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from Backend.powerbi_backend.msal_clients import service_client_registry, POWERBI_SCOPE
+from Backend.http_backend.http_client import http_get
+from Backend.cache_backend.shared_cache import shared_cache, invalidation_signal
+
+POWERBI_CLIENT_ID = os.getenv('POWERBI_CLIENT_ID')
+POWERBI_CLIENT_SECRET = os.getenv('POWERBI_CLIENT_SECRET')
+POWERBI_TENANT_ID = os.getenv('POWERBI_TENANT_ID')
+
+POWERBI_API = 'https://api.powerbi.com/v1.0/myorg'
+
+# Entries older than REFRESH_AFTER are served but refreshed in the background;
+# entries older than TTL are refetched before use
+REPORT_METADATA_TTL = int(os.getenv('REPORT_METADATA_TTL', '86400'))
+REPORT_METADATA_REFRESH_AFTER = int(os.getenv('REPORT_METADATA_REFRESH_AFTER', '21600'))
+
+SHARED_NAMESPACE = 'report_metadata'
+
+
+def fetch_workspace_name(headers, group_id):
+    """
+    Fetch the workspace name for a group
+    Returns: (workspace_name, found) - 'Unknown Workspace' when the lookup fails
+    """
+    try:
+        group_url = f"{POWERBI_API}/groups/{group_id}"
+        group_resp = http_get(group_url, headers=headers)
+        if group_resp.status_code == 200:
+            return group_resp.json().get('name', 'Unknown Workspace'), True
+    except Exception as e:
+        print(f"Error fetching workspace name: {e}")
+    return 'Unknown Workspace', False
+
+
+def fetch_report_info(headers, group_id, report_id):
+    """
+    Fetch report name and embedUrl
+    Returns: (report_json, error_message)
+    """
+    report_url = f"{POWERBI_API}/groups/{group_id}/reports/{report_id}"
+    report_resp = http_get(report_url, headers=headers)
+
+    if report_resp.status_code != 200:
+        return None, f"Report not found: {report_resp.status_code}"
+
+    return report_resp.json(), None
+
+
+def build_report_metadata(workspace_result, report_result):
+    """
+    Combine fetch_workspace_name and fetch_report_info results
+    Returns: (metadata_dict, error_message)
+    """
+    workspace_name, workspace_found = workspace_result
+    report_json, error = report_result
+    if error:
+        return None, error
+
+    return {
+        'workspace_name': workspace_name,
+        'report_name': report_json.get('name', 'Unknown Report'),
+        'embed_url': report_json.get('embedUrl'),
+        'complete': workspace_found
+    }, None
+
+
+def fetch_report_metadata(headers, group_id, report_id):
+    """
+    Fetch workspace name, report name and embedUrl from the Power BI REST API
+    Returns: (metadata_dict, error_message)
+    """
+    return build_report_metadata(
+        fetch_workspace_name(headers, group_id),
+        fetch_report_info(headers, group_id, report_id)
+    )
+
+
+def get_service_headers():
+    """
+    Authorization headers for the configured service principal
+    Returns: (headers, error_message)
+    """
+    if not all([POWERBI_CLIENT_ID, POWERBI_TENANT_ID, POWERBI_CLIENT_SECRET]):
+        return None, 'Power BI service principal is not configured'
+
+    result = service_client_registry.acquire_token(POWERBI_TENANT_ID, POWERBI_CLIENT_ID, POWERBI_CLIENT_SECRET, scopes=POWERBI_SCOPE)
+    if 'access_token' not in result:
+        return None, f"Error acquiring access token: {result.get('error_description', 'Unknown error')}"
+
+    return {
+        'Authorization': f"Bearer {result['access_token']}",
+        'Content-Type': 'application/json'
+    }, None
+
+
+class ReportMetadataCache:
+    """
+    Long-lived cache of report metadata keyed by (group_id, report_id).
+    Stale entries are served while a background refresh runs; incomplete
+    entries (workspace lookup failed) are refreshed on their next use.
+    With a shared store, entries are written through to it and local misses are
+    looked up there; invalidations are broadcast to the other workers through signal.
+    """
+
+    def __init__(self, ttl=86400, refresh_after=21600, shared=None, signal=None):
+        self.ttl = ttl
+        self.refresh_after = refresh_after
+        self.shared = shared
+        self.signal = signal
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (metadata, fetched_at)
+        self._refreshing = set()
+        self._executor = None
+        self._pid = os.getpid()
+        self._stats = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'stale_hits': 0, 'refreshes': 0, 'refresh_errors': 0}
+
+    @staticmethod
+    def make_key(group_id, report_id):
+        return ((group_id or '').lower(), (report_id or '').lower())
+
+    def _get_executor(self):
+        if self._executor is None or self._pid != os.getpid():
+            # Executor threads do not survive fork
+            self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='report-metadata')
+            self._refreshing = set()
+            self._pid = os.getpid()
+        return self._executor
+
+    def get(self, group_id, report_id, headers=None):
+        """
+        Returns: cached metadata dict or None; schedules a refresh when stale
+        """
+        if self.signal is not None and self.signal.poll():
+            # Entries were invalidated through another worker
+            with self._lock:
+                self._entries.clear()
+
+        key = self.make_key(group_id, report_id)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+        if (entry is None or now - entry[1] > self.ttl) and self.shared is not None:
+            entry = self.shared.get(SHARED_NAMESPACE, key)
+            if entry is not None:
+                with self._lock:
+                    self._entries[key] = entry
+                    self._stats['shared_hits'] += 1
+
+        with self._lock:
+            if entry is None or now - entry[1] > self.ttl:
+                self._stats['misses'] += 1
+                return None
+            metadata, fetched_at = entry
+            stale = now - fetched_at > self.refresh_after or not metadata['complete']
+            if stale:
+                self._stats['stale_hits'] += 1
+            else:
+                self._stats['hits'] += 1
+
+        if stale:
+            self.refresh_async(group_id, report_id, headers)
+        return metadata
+
+    def put(self, group_id, report_id, metadata):
+        key = self.make_key(group_id, report_id)
+        entry = (metadata, time.time())
+        with self._lock:
+            self._entries[key] = entry
+        if self.shared is not None:
+            self.shared.set(SHARED_NAMESPACE, key, entry, self.ttl)
+
+    def invalidate(self, group_id, report_id):
+        key = self.make_key(group_id, report_id)
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete(SHARED_NAMESPACE, key)
+        if self.signal is not None:
+            self.signal.send()
+
+    def refresh(self, group_id, report_id, headers=None):
+        """
+        Refetch one entry now
+        Returns: error message or None
+        """
+        if headers is None:
+            headers, error = get_service_headers()
+            if error:
+                return error
+
+        started = time.perf_counter()
+        try:
+            metadata, error = fetch_report_metadata(headers, group_id, report_id)
+        except Exception as e:
+            metadata, error = None, str(e)
+        shared_cache.record_fill(SHARED_NAMESPACE, time.perf_counter() - started)
+
+        with self._lock:
+            self._stats['refreshes'] += 1
+            if error:
+                self._stats['refresh_errors'] += 1
+        if metadata:
+            self.put(group_id, report_id, metadata)
+        elif error:
+            print(f"Error refreshing report metadata for {report_id}: {error}")
+        return error
+
+    def refresh_async(self, group_id, report_id, headers=None):
+        """
+        Schedule a background refresh unless one is already running for this entry
+        """
+        key = self.make_key(group_id, report_id)
+        with self._lock:
+            executor = self._get_executor()
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self.refresh(group_id, report_id, headers)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        executor.submit(run)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            return stats
+
+
+report_metadata_cache = ReportMetadataCache(
+    ttl=REPORT_METADATA_TTL,
+    refresh_after=REPORT_METADATA_REFRESH_AFTER,
+    shared=shared_cache,
+    signal=invalidation_signal('report_metadata')
+)
+
+
+def refresh_report_metadata(group_id, report_id):
+    """
+    Drop and refill one report's metadata in the background (after dashboard add/update)
+    """
+    report_metadata_cache.invalidate(group_id, report_id)
+    report_metadata_cache.refresh_async(group_id, report_id)
+
+
+def warm_report_metadata_cache():
+    """
+    Fill the cache for every report in the Dashboards table
+    Returns: number of reports loaded
+    """
+    from Backend.DB_backend.db_connection import get_db_connection, close_db_connection
+
+    try:
+        conn = get_db_connection()
+        if not conn:
+            return 0
+
+        cursor = conn.cursor()
+        cursor.execute("SELECT DISTINCT GroupID, ReportID FROM Dashboards WHERE GroupID IS NOT NULL AND ReportID IS NOT NULL")
+        reports = cursor.fetchall()
+        close_db_connection(conn)
+
+        headers, error = get_service_headers()
+        if error:
+            print(f"Skipping report metadata warm-up: {error}")
+            return 0
+
+        loaded = 0
+        for report in reports:
+            if report_metadata_cache.refresh(report[0], report[1], headers) is None:
+                loaded += 1
+
+        print(f"Report metadata cache warmed: {loaded}/{len(reports)} reports")
+        return loaded
+    except Exception as e:
+        print(f"Error warming report metadata cache: {e}")
+        return 0
+
+
+def start_report_metadata_warmup():
+    """
+    Warm the cache on a background thread so startup is not delayed
+    """
+    thread = threading.Thread(target=warm_report_metadata_cache, name='report-metadata-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def get_report_metadata_cache_stats():
+    """
+    Get report metadata cache counters
+    """
+    return report_metadata_cache.stats()
@@ -0,0 +1,68 @@
+#single_flight.py
+
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the
+    function, callers arriving while it is in flight wait and share its result.
+    """
+
+    def __init__(self, wait_timeout=30):
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {'leaders': 0, 'shared': 0, 'wait_timeouts': 0}
+
+    def do(self, key, func):
+        """
+        Run func() once per key at a time
+        Returns: (result, shared) - shared is True when another caller's result was reused
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self._stats['leaders'] += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self._stats['shared'] += 1
+                leader = False
+
+        if not leader:
+            if not call.done.wait(self.wait_timeout):
+                with self._lock:
+                    self._stats['wait_timeouts'] += 1
+                # The leader is stuck; do the work ourselves rather than fail
+                return func(), False
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+            return stats
@@ -0,0 +1,233 @@
+#acl_index.py
+
+import os
+import threading
+import time
+from Backend.DB_backend.db_connection import get_db_connection, close_db_connection
+from Backend.cache_backend.shared_cache import shared_cache, invalidation_signal
+
+# Seconds between checks that the DepartmentDashboards/Dashboards tables have not changed
+# (catches grants and revokes made through another worker)
+ACL_VERSION_CHECK_INTERVAL = int(os.getenv('ACL_VERSION_CHECK_INTERVAL', '30'))
+# Seconds between load attempts while the database is failing (the last loaded index is served meanwhile)
+ACL_RETRY_INTERVAL = int(os.getenv('ACL_RETRY_INTERVAL', '10'))
+
+ACL_VERSION_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM DepartmentDashboards),
+        (SELECT CHECKSUM_AGG(BINARY_CHECKSUM(DepartmentID, DashboardID)) FROM DepartmentDashboards),
+        (SELECT COUNT(*) FROM Dashboards),
+        (SELECT CHECKSUM_AGG(BINARY_CHECKSUM(DashboardID, Status)) FROM Dashboards)
+"""
+
+ACL_LOAD_QUERY = """
+    SELECT d.DashboardID, d.Status, dd.DepartmentID
+    FROM Dashboards d
+    LEFT JOIN DepartmentDashboards dd ON d.DashboardID = dd.DashboardID
+"""
+
+
+class AclIndex:
+    """
+    In-memory copy of the dashboard ACL: department -> set of dashboard IDs,
+    plus each dashboard's status. Loaded in one query, reloaded after
+    invalidate() or when the periodic version check sees the tables change.
+    invalidate() is broadcast to the other workers through a shared signal.
+    While one caller reloads, the others keep using the last loaded index; after a
+    failed load, the next attempt waits retry_interval seconds.
+    """
+
+    def __init__(self, check_interval=30, signal=None, retry_interval=10):
+        self.check_interval = check_interval
+        self.signal = signal
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._generation = 0  # bumped by invalidate(); a load only clears _stale if unchanged
+        self._departments = {}  # department_id -> frozenset of dashboard IDs
+        self._status = {}  # dashboard_id -> status
+        self._version = None
+        self._loaded = False
+        self._stale = True
+        self._checked_at = 0
+        self._checking = False
+        self._failed_at = 0
+        self._stats = {'loads': 0, 'load_errors': 0, 'version_checks': 0, 'version_changes': 0, 'invalidations': 0,
+                       'lookups': 0, 'stale_served': 0}
+
+    def _load(self):
+        """
+        Read the whole ACL in one round trip
+        Returns: True on success
+        """
+        with self._lock:
+            generation = self._generation
+        started = time.perf_counter()
+        try:
+            conn = get_db_connection()
+            if not conn:
+                raise RuntimeError('Database connection failed')
+
+            cursor = conn.cursor()
+            cursor.execute(ACL_VERSION_QUERY)
+            version = tuple(cursor.fetchone())
+            cursor.execute(ACL_LOAD_QUERY)
+            rows = cursor.fetchall()
+            close_db_connection(conn)
+        except Exception as e:
+            print(f"Error loading dashboard ACL index: {e}")
+            with self._lock:
+                self._stats['load_errors'] += 1
+                self._failed_at = time.time()
+            return False
+
+        departments = {}
+        status = {}
+        for dashboard_id, dashboard_status, department_id in rows:
+            status[dashboard_id] = dashboard_status
+            if department_id is not None:
+                departments.setdefault(department_id, set()).add(dashboard_id)
+
+        with self._lock:
+            self._departments = {dept: frozenset(ids) for dept, ids in departments.items()}
+            self._status = status
+            self._version = version
+            self._loaded = True
+            self._stale = generation != self._generation
+            self._checked_at = time.time()
+            self._failed_at = 0
+            self._stats['loads'] += 1
+        shared_cache.record_fill('acl_index', time.perf_counter() - started)
+        return True
+
+    def _check_version(self):
+        try:
+            conn = get_db_connection()
+            if not conn:
+                return
+            cursor = conn.cursor()
+            cursor.execute(ACL_VERSION_QUERY)
+            version = tuple(cursor.fetchone())
+            close_db_connection(conn)
+        except Exception as e:
+            print(f"Error checking dashboard ACL version: {e}")
+            with self._lock:
+                # Keep the current index and check again after another interval
+                self._checked_at = time.time()
+            return
+
+        with self._lock:
+            self._stats['version_checks'] += 1
+            self._checked_at = time.time()
+            if version != self._version:
+                self._stats['version_changes'] += 1
+                self._stale = True
+
+    def _ensure_fresh(self):
+        if self.signal is not None and self.signal.poll():
+            # Another worker changed a grant or dashboard
+            self.invalidate(broadcast=False)
+
+        with self._lock:
+            self._stats['lookups'] += 1
+            stale = self._stale
+            check = (not stale and not self._checking
+                     and time.time() - self._checked_at > self.check_interval)
+            if check:
+                # One caller checks; the rest keep using the current index meanwhile
+                self._checking = True
+
+        if check:
+            try:
+                self._check_version()
+            finally:
+                with self._lock:
+                    self._checking = False
+                    stale = self._stale
+
+        if not stale:
+            return
+
+        with self._lock:
+            loaded = self._loaded
+            backing_off = time.time() - self._failed_at < self.retry_interval
+        # With an index loaded, one caller reloads and the rest keep using it meanwhile;
+        # before the first load there is nothing to serve, so callers wait for that one load
+        if backing_off or not self._load_lock.acquire(blocking=not loaded):
+            if loaded:
+                with self._lock:
+                    self._stats['stale_served'] += 1
+            return
+        try:
+            with self._lock:
+                retry = self._stale and time.time() - self._failed_at >= self.retry_interval
+            if retry:
+                self._load()
+        finally:
+            self._load_lock.release()
+
+    def invalidate(self, broadcast=True):
+        """
+        Force a reload on the next lookup (after a grant, revoke or dashboard change)
+        """
+        with self._lock:
+            self._stale = True
+            self._generation += 1
+            self._stats['invalidations'] += 1
+        if broadcast and self.signal is not None:
+            self.signal.send()
+
+    def dashboard_ids_for_department(self, department_id):
+        """
+        Returns: frozenset of dashboard IDs granted to the department
+        """
+        self._ensure_fresh()
+        with self._lock:
+            return self._departments.get(department_id, frozenset())
+
+    def has_access(self, department_id, dashboard_id):
+        """
+        Returns: True if the dashboard is granted to the department
+        """
+        return dashboard_id in self.dashboard_ids_for_department(department_id)
+
+    def dashboard_status(self, dashboard_id):
+        """
+        Returns: dashboard status ('Active', 'Inactive', ...) or None if unknown
+        """
+        self._ensure_fresh()
+        with self._lock:
+            return self._status.get(dashboard_id)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['loaded'] = self._loaded
+            stats['stale'] = self._stale
+            stats['failed_seconds_ago'] = round(time.time() - self._failed_at, 1) if self._failed_at else None
+            stats['departments'] = len(self._departments)
+            stats['dashboards'] = len(self._status)
+            stats['grants'] = sum(len(ids) for ids in self._departments.values())
+            stats['checked_seconds_ago'] = round(time.time() - self._checked_at, 1) if self._checked_at else None
+            return stats
+
+
+acl_index = AclIndex(
+    check_interval=ACL_VERSION_CHECK_INTERVAL,
+    signal=invalidation_signal('acl_index'),
+    retry_interval=ACL_RETRY_INTERVAL
+)
+
+
+def invalidate_acl_index():
+    """
+    Reload the dashboard ACL index on its next use
+    """
+    acl_index.invalidate()
+
+
+def get_acl_index_stats():
+    """
+    Get dashboard ACL index counters
+    """
+    return acl_index.stats()
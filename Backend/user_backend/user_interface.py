@@ -4,19 +4,20 @@
 from flask import render_template, request, redirect, url_for, session, jsonify
 from Backend.DB_backend.db_connection import get_db_connection, close_db_connection
 from Backend.DB_backend.login_logout import login_required
-from Backend.powerbi_backend.embed_token_url import get_embed_token
+from Backend.powerbi_backend.embed_token_url import get_embed_token, get_multi_embed_token
+from Backend.powerbi_backend.embed_token_refresher import embed_session_scheduler, EMBED_HEARTBEAT_INTERVAL
+from Backend.user_backend.acl_index import acl_index
+from Backend.DB_backend.identity_cache import identity_cache
+from Backend.admin_backend.admin_reports import get_all_dashboards, get_dashboards_by_id
 import os
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    # dotenv not available (that's okay in production)
-    pass
 
 POWERBI_CLIENT_ID = os.getenv('POWERBI_CLIENT_ID')
 POWERBI_CLIENT_SECRET = os.getenv('POWERBI_CLIENT_SECRET')
 POWERBI_TENANT_ID = os.getenv('POWERBI_TENANT_ID')
 
+# Most dashboards accepted by one /user/report-tokens request
+REPORT_TOKENS_MAX_DASHBOARDS = int(os.getenv('REPORT_TOKENS_MAX_DASHBOARDS', '100'))
+
 
 def get_user_department_info(user_id):
     """
@@ -94,63 +95,19 @@ def get_user_accessible_dashboards(user_id):
     Get dashboards accessible to a user based on their role and department
     """
     try:
-        conn = get_db_connection()
-        if not conn:
+        user = identity_cache.get_by_id(user_id)
+        if not user:
             return []
         
-        cursor = conn.cursor()
-        
-        role_query = "SELECT Role, DepartmentID FROM Users WHERE UserID = ?"
-        cursor.execute(role_query, (user_id,))
-        user_info = cursor.fetchone()
-        
-        if not user_info:
-            close_db_connection(conn)
-            return []
-        
-        user_role = user_info[0]
-        user_department_id = user_info[1]
+        user_role = user['Role']
+        user_department_id = user['DepartmentID']
         
+        dashboards = get_all_dashboards()
         if user_role in ['admin', 'superuser']:
-            query = """
-                SELECT DashboardID, DashboardName, ReportID, GroupID, CoreDatasetID, 
-                       ProxyDatasetID, CreatedAt, CreatedBy, UpdatedAt, UpdatedBy, Status, Description, DashboardOwner, Alert
-                FROM Dashboards
-                ORDER BY DashboardID DESC
-            """
-            cursor.execute(query)
-        else:
-            query = """
-                SELECT DISTINCT d.DashboardID, d.DashboardName, d.ReportID, d.GroupID, d.CoreDatasetID, 
-                       d.ProxyDatasetID, d.CreatedAt, d.CreatedBy, d.UpdatedAt, d.UpdatedBy, d.Status, d.Description, d.DashboardOwner, d.Alert
-                FROM Dashboards d
-                INNER JOIN DepartmentDashboards dd ON d.DashboardID = dd.DashboardID
-                WHERE dd.DepartmentID = ?
-                ORDER BY d.DashboardID DESC
-            """
-            cursor.execute(query, (user_department_id,))
+            return dashboards
         
-        dashboards = cursor.fetchall()
-        close_db_connection(conn)
-        
-        dashboard_list = []
-        for dashboard in dashboards:
-            dashboard_list.append({
-                'DashboardID': dashboard[0],
-                'DashboardName': dashboard[1],
-                'ReportID': dashboard[2],
-                'GroupID': dashboard[3],
-                'CoreDatasetID': dashboard[4],
-                'ProxyDatasetID': dashboard[5],
-                'CreatedAt': dashboard[6],
-                'CreatedBy': dashboard[7],
-                'UpdatedAt': dashboard[8],
-                'UpdatedBy': dashboard[9],
-                'Status': dashboard[10],
-                'Description': dashboard[11],
-                'DashboardOwner': dashboard[12],
-                'Alert': dashboard[13]
-            })
+        granted = acl_index.dashboard_ids_for_department(user_department_id)
+        dashboard_list = [d for d in dashboards if d['DashboardID'] in granted]
         
         return dashboard_list
     except Exception as e:
@@ -160,48 +117,65 @@ def get_user_accessible_dashboards(user_id):
 
 def get_dashboard_by_id(dashboard_id):
     """
-    Fetch dashboard details from database by ID
+    Fetch dashboard details by ID (from the reference data cache)
     """
     try:
+        dashboard = get_dashboards_by_id().get(dashboard_id)
+        return dict(dashboard) if dashboard else None
+    except Exception as e:
+        print(f"Error fetching dashboard: {e}")
+        return None
+
+
+def get_accessible_dashboards_by_ids(dashboard_ids, user_role, department_id):
+    """
+    Fetch the requested dashboards the user may open, checking access for all of them in one query
+    Admins and superusers get every requested dashboard; other users only Active ones granted to their department
+    """
+    try:
+        if user_role not in ['admin', 'superuser']:
+            granted = acl_index.dashboard_ids_for_department(department_id)
+            dashboard_ids = [
+                dashboard_id for dashboard_id in dashboard_ids
+                if dashboard_id in granted and acl_index.dashboard_status(dashboard_id) == 'Active'
+            ]
+        
+        if not dashboard_ids:
+            return []
+        
         conn = get_db_connection()
         if not conn:
-            return None
+            return []
         
         cursor = conn.cursor()
         
-        query = """
-            SELECT DashboardID, DashboardName, ReportID, GroupID, CoreDatasetID, 
-                   ProxyDatasetID, CreatedAt, CreatedBy, UpdatedAt, UpdatedBy, Status, Description, DashboardOwner, Alert
+        placeholders = ', '.join('?' for _ in dashboard_ids)
+        query = f"""
+            SELECT DashboardID, DashboardName, ReportID, GroupID, CoreDatasetID, ProxyDatasetID, Status
             FROM Dashboards
-            WHERE DashboardID = ?
+            WHERE DashboardID IN ({placeholders})
         """
+        cursor.execute(query, tuple(dashboard_ids))
         
-        cursor.execute(query, (dashboard_id,))
-        dashboard = cursor.fetchone()
+        dashboards = cursor.fetchall()
         close_db_connection(conn)
         
-        if dashboard:
-            return {
+        dashboard_list = []
+        for dashboard in dashboards:
+            dashboard_list.append({
                 'DashboardID': dashboard[0],
                 'DashboardName': dashboard[1],
                 'ReportID': dashboard[2],
                 'GroupID': dashboard[3],
                 'CoreDatasetID': dashboard[4],
                 'ProxyDatasetID': dashboard[5],
-                'CreatedAt': dashboard[6],
-                'CreatedBy': dashboard[7],
-                'UpdatedAt': dashboard[8],
-                'UpdatedBy': dashboard[9],
-                'Status': dashboard[10],
-                'Description': dashboard[11],
-                'DashboardOwner': dashboard[12],
-                'Alert': dashboard[13]
-            }
+                'Status': dashboard[6]
+            })
         
-        return None
+        return dashboard_list
     except Exception as e:
-        print(f"Error fetching dashboard: {e}")
-        return None
+        print(f"Error fetching dashboards by ids: {e}")
+        return []
 
 
 def register_user_routes(app):
@@ -251,20 +225,7 @@ def register_user_routes(app):
             
             if user_role not in ['admin', 'superuser']:
                 user_department_id = session.get('department_id')
-                conn = get_db_connection()
-                if not conn:
-                    return jsonify({'success': False, 'error': 'Database connection failed'}), 500
-                
-                cursor = conn.cursor()
-                check_query = """
-                    SELECT COUNT(*) FROM DepartmentDashboards 
-                    WHERE DepartmentID = ? AND DashboardID = ?
-                """
-                cursor.execute(check_query, (user_department_id, dashboard_id))
-                access_count = cursor.fetchone()[0]
-                close_db_connection(conn)
-                
-                if access_count == 0:
+                if not acl_index.has_access(user_department_id, dashboard_id):
                     return jsonify({'success': False, 'error': 'You do not have access to this dashboard'}), 403
             
             client_id = POWERBI_CLIENT_ID
@@ -279,22 +240,28 @@ def register_user_routes(app):
             if not all([client_id, tenant_id, client_secret, report_id, group_id, core_dataset]):
                 return jsonify({'success': False, 'error': 'Invalid dashboard configuration'}), 400
             
-            token, embed_url, workspace_name, report_name, error = get_embed_token(
-                client_id=client_id,
-                tenant_id=tenant_id,
-                client_secret=client_secret,
-                report_id=report_id,
-                group_id=group_id,
-                core_dataset=core_dataset,
-                proxy_dataset=proxy_dataset,
-                username=session.get('email'),
-                roles=['RM']
-            )
+            token_args = {
+                'client_id': client_id,
+                'tenant_id': tenant_id,
+                'client_secret': client_secret,
+                'report_id': report_id,
+                'group_id': group_id,
+                'core_dataset': core_dataset,
+                'proxy_dataset': proxy_dataset,
+                'username': session.get('email'),
+                'roles': ['RM']
+            }
+            # Stage timings (cache hits, upstream latencies) are only shown to admins and superusers
+            timings = {} if user_role in ['admin', 'superuser'] else None
+            token, embed_url, workspace_name, report_name, error = get_embed_token(**token_args, timings=timings)
             
             if error:
                 return jsonify({'success': False, 'error': error}), 400
             
-            return jsonify({
+            # The report page heartbeats this session and picks up background-refreshed tokens
+            embed_session_scheduler.register(user_id, dashboard_id, token_args, department_id=session.get('department_id'))
+            
+            response = {
                 'success': True,
                 'token': token,
                 'embed_url': embed_url,
@@ -302,13 +269,137 @@ def register_user_routes(app):
                 'workspace_name': workspace_name,
                 'report_name': report_name,
                 'dashboard_name': dashboard['DashboardName'],
+                'dashboard_id': dashboard_id,
                 'message': 'Report token generated successfully!'
-            }), 200
+            }
+            if timings is not None:
+                response['timings'] = timings
+            
+            return jsonify(response), 200
         
         except Exception as e:
             print(f"Error generating report token: {e}")
             return jsonify({'success': False, 'error': str(e)}), 500
 
+    @app.route('/user/report-tokens', methods=['POST'])
+    @login_required
+    def user_report_tokens():
+        """
+        Generate embed tokens for several dashboards at once (one GenerateToken call per workspace)
+        """
+        try:
+            data = request.get_json(silent=True) or {}
+            
+            dashboard_ids = []
+            for dashboard_id in data.get('dashboard_ids', []):
+                try:
+                    dashboard_id = int(dashboard_id)
+                except (TypeError, ValueError):
+                    continue
+                if dashboard_id not in dashboard_ids:
+                    dashboard_ids.append(dashboard_id)
+            
+            if not dashboard_ids:
+                return jsonify({'success': False, 'error': 'No dashboards requested'}), 400
+            
+            if len(dashboard_ids) > REPORT_TOKENS_MAX_DASHBOARDS:
+                return jsonify({'success': False, 'error': 'Too many dashboards requested'}), 400
+            
+            if not all([POWERBI_CLIENT_ID, POWERBI_TENANT_ID, POWERBI_CLIENT_SECRET]):
+                return jsonify({'success': False, 'error': 'Invalid dashboard configuration'}), 400
+            
+            dashboards = get_accessible_dashboards_by_ids(dashboard_ids, session.get('role'), session.get('department_id'))
+            dashboards = [d for d in dashboards if d['ReportID'] and d['GroupID'] and d['CoreDatasetID']]
+            
+            reports = []
+            for dashboard in dashboards:
+                reports.append({
+                    'key': dashboard['DashboardID'],
+                    'report_id': dashboard['ReportID'],
+                    'group_id': dashboard['GroupID'],
+                    'core_dataset': dashboard['CoreDatasetID'],
+                    'proxy_dataset': dashboard['ProxyDatasetID'] or ''
+                })
+            
+            results, report_errors = get_multi_embed_token(
+                client_id=POWERBI_CLIENT_ID,
+                tenant_id=POWERBI_TENANT_ID,
+                client_secret=POWERBI_CLIENT_SECRET,
+                reports=reports,
+                username=session.get('email'),
+                roles=['RM']
+            )
+            
+            tokens = {}
+            errors = {}
+            for dashboard, report in zip(dashboards, reports):
+                dashboard_id = dashboard['DashboardID']
+                if dashboard_id in results:
+                    token, embed_url, workspace_name, report_name = results[dashboard_id]
+                    tokens[dashboard_id] = {
+                        'token': token,
+                        'embed_url': embed_url,
+                        'report_id': report['report_id'],
+                        'workspace_name': workspace_name,
+                        'report_name': report_name,
+                        'dashboard_name': dashboard['DashboardName'],
+                        'dashboard_id': dashboard_id
+                    }
+                    # Same as the single-token route: opened tiles heartbeat and get refreshed tokens
+                    embed_session_scheduler.register(session.get('user_id'), dashboard_id, {
+                        'report_id': report['report_id'],
+                        'group_id': report['group_id'],
+                        'core_dataset': report['core_dataset'],
+                        'proxy_dataset': report['proxy_dataset'],
+                        'username': session.get('email'),
+                        'roles': ['RM']
+                    }, department_id=session.get('department_id'))
+                else:
+                    errors[dashboard_id] = report_errors.get(dashboard_id, 'Token generation failed')
+            
+            allowed_ids = {d['DashboardID'] for d in dashboards}
+            for dashboard_id in dashboard_ids:
+                if dashboard_id not in allowed_ids:
+                    errors[dashboard_id] = 'You do not have access to this dashboard'
+            
+            return jsonify({'success': True, 'tokens': tokens, 'errors': errors}), 200
+        
+        except Exception as e:
+            print(f"Error generating report tokens: {e}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/token/refresh/<int:dashboard_id>', methods=['POST'])
+    @login_required
+    def refresh_report_token(dashboard_id):
+        """
+        Heartbeat from an open report; returns the session's pre-minted embed token from cache
+        """
+        try:
+            # Access may have been revoked (possibly through another worker) since the session started
+            if session.get('role') not in ['admin', 'superuser']:
+                if not acl_index.has_access(session.get('department_id'), dashboard_id) or acl_index.dashboard_status(dashboard_id) != 'Active':
+                    embed_session_scheduler.forget(user_id=session.get('user_id'), dashboard_id=dashboard_id)
+                    return jsonify({'success': False, 'error': 'You do not have access to this dashboard'}), 403
+            
+            value, expires_in, error = embed_session_scheduler.current_token(session.get('user_id'), dashboard_id)
+            
+            if error:
+                status = 404 if value is None and error == 'No live embed session' else 400
+                return jsonify({'success': False, 'error': error}), status
+            
+            token, embed_url, workspace_name, report_name = value
+            
+            return jsonify({
+                'success': True,
+                'token': token,
+                'embed_url': embed_url,
+                'expires_in': int(expires_in) if expires_in is not None else None
+            }), 200
+        
+        except Exception as e:
+            print(f"Error refreshing report token: {e}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+
     @app.route('/view-report')
     @login_required
     def view_report():
@@ -321,7 +412,7 @@ def register_user_routes(app):
         report_name = request.args.get('reportName', 'Power BI Report')
         username = session.get('username', 'User')
         
-        return render_template('powerbi_report.html', report_name=report_name, username=username)
+        return render_template('powerbi_report.html', report_name=report_name, username=username, heartbeat_interval=EMBED_HEARTBEAT_INTERVAL)
     
 
 if __name__=="__main__":
@@ -1,28 +1,7 @@
 #app.py
 
-from flask import Flask, render_template, request, session, redirect, url_for, flash
-import os
-from datetime import timedelta
-import secrets
-from functools import wraps
-
-# Import all modules
-from Backend.DB_backend.db_connection import get_db_connection, close_db_connection
-from Backend.DB_backend.login_logout import register_login_routes, login_required, admin_required, admin_write_required
-from Backend.user_backend.user_interface import register_user_routes
-from Backend.powerbi_backend.embed_token_url import get_embed_token
-from Backend.admin_backend.admin_overview import (
-    get_users_count,
-    get_departments_count,
-    get_active_dashboards_count,
-    get_all_user_logs
-)
-from Backend.admin_backend.admin_reports import register_admin_reports_routes, get_all_dashboards
-from Backend.admin_backend.admin_departments import get_all_departments, get_departments_with_dashboards
-from Backend.admin_backend.admin_permissions import register_admin_permissions_routes, get_department_permissions
-from Backend.admin_backend.admin_users import register_admin_users_routes, get_all_users
-from Backend.admin_backend.admin_configuration_test import register_admin_configuration_routes
-
+# Read .env once, before any Backend module reads its settings from the environment at import
+# (gunicorn.conf.py does the same before preloading this module)
 try:
     from dotenv import load_dotenv
     load_dotenv()
@@ -30,164 +9,228 @@ except ImportError:
     # dotenv not available (that's okay in production)
     pass
 
-# Load environment variables
+from flask import Flask, render_template, request, session, redirect, url_for, flash, jsonify
+import os
+from datetime import timedelta
+from functools import wraps
 
+# Import all modules
+from Backend.DB_backend.db_connection import get_db_connection, close_db_connection, init_db_session, dispose_pool
+from Backend.DB_backend.session_store import init_server_sessions
+from Backend.DB_backend.login_logout import register_login_routes, login_required, admin_required, admin_write_required
+from Backend.user_backend.user_interface import register_user_routes
+from Backend.powerbi_backend.embed_token_url import get_embed_token, POWERBI_CLIENT_ID, POWERBI_CLIENT_SECRET, POWERBI_TENANT_ID
+from Backend.powerbi_backend.embed_token_refresher import embed_session_scheduler, start_embed_session_scheduler
+from Backend.powerbi_backend.report_metadata_cache import start_report_metadata_warmup
+from Backend.DB_backend.user_log_maintenance import start_user_log_maintenance, user_log_maintenance
+from Backend.DB_backend.user_log_writer import user_log_writer
+from Backend.DB_backend.identity_cache import start_identity_cache_warmup
+from Backend.admin_backend.admin_overview import register_admin_overview_routes
+from Backend.admin_backend.admin_fragments import register_admin_fragment_routes
+from Backend.admin_backend.admin_reports import register_admin_reports_routes
+from Backend.admin_backend.admin_permissions import register_admin_permissions_routes
+from Backend.admin_backend.admin_users import register_admin_users_routes
+from Backend.admin_backend.admin_exports import register_admin_exports_routes
+from Backend.admin_backend.admin_events import register_admin_event_routes
+from Backend.admin_backend.admin_configuration_test import register_admin_configuration_routes
+from Backend.admin_backend.admin_diagnostics import register_admin_diagnostics_routes
+from Backend.http_backend.http_client import reset_http_session
+from Backend.cache_backend.shared_cache import shared_cache
 
-# Initialize Flask App
-app = Flask(__name__)
-app.secret_key = secrets.token_hex(16)
 
-# Session Configuration
-app.config['SESSION_COOKIE_SECURE'] = False
-app.config['SESSION_COOKIE_HTTPONLY'] = True
-app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)
+def create_app():
+    """
+    Build the Flask app: configuration, sessions and routes.
+    Opens no connections and starts no threads, so gunicorn can call it once in
+    the master (preload_app) and fork workers from the result.
+    Returns: Flask app
+    """
+    app = Flask(__name__)
+
+    # Session Configuration (PERMANENT_SESSION_LIFETIME is the idle timeout: expiry slides with each request)
+    app.config['SESSION_COOKIE_SECURE'] = os.getenv('SESSION_COOKIE_SECURE', 'false').lower() in ('1', 'true', 'yes')
+    app.config['SESSION_COOKIE_HTTPONLY'] = True
+    app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+    app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)
+
+    # Server-side sessions with a stable signing key, valid on every worker
+    init_server_sessions(app)
+
+    # Request-scoped database connection
+    init_db_session(app)
+
+    # Register all blueprints and routes
+    register_app_routes(app)
+    register_login_routes(app)
+    register_user_routes(app)
+    register_admin_overview_routes(app)
+    register_admin_fragment_routes(app)
+    register_admin_reports_routes(app)
+    register_admin_permissions_routes(app)
+    register_admin_users_routes(app)
+    register_admin_exports_routes(app)
+    register_admin_event_routes(app)
+    register_admin_configuration_routes(app)
+    register_admin_diagnostics_routes(app)
+
+    return app
+
+
+def start_background_tasks():
+    """
+    Start this process's background work (threads do not survive fork:
+    call once in each worker, after it is forked)
+    """
+    # Fill the report metadata cache from the Dashboards table
+    start_report_metadata_warmup()
 
-# Register all blueprints and routes
-register_login_routes(app)
-register_user_routes(app)
-register_admin_reports_routes(app)
-register_admin_permissions_routes(app)
-register_admin_users_routes(app)
-register_admin_configuration_routes(app)
+    # Load every user's identity so logins and role checks skip the Users query
+    start_identity_cache_warmup()
 
+    # Roll UserLogs up into activity tables and archive old rows in the background
+    start_user_log_maintenance()
 
-@app.route('/')
-def index():
-    """
-    Index route - redirect to login or dashboard based on session
-    """
-    if 'user_id' in session:
-        return redirect(url_for('user_dashboard'))
-    return redirect(url_for('login')) # in login_logout.py
+    # Refresh live report sessions' embed tokens (any worker may pick up a due refresh)
+    start_embed_session_scheduler()
 
 
-@app.route('/admin')
-@admin_required
-def admin_dashboard():
+def shutdown_background_tasks(timeout=10):
     """
-    Admin and Superuser dashboard
+    Stop background work and write out what is buffered (worker exit)
     """
-    users = get_all_users()
-    departments = get_all_departments()
-    dashboards = get_all_dashboards()
-    permissions = get_department_permissions()
-    departments_with_dashboards = get_departments_with_dashboards()
-    user_logs = get_all_user_logs()
-    users_count = get_users_count()
-    departments_count = get_departments_count()
-    active_dashboards_count = get_active_dashboards_count()
+    user_log_maintenance.stop()
+    embed_session_scheduler.stop()
+
+    # Queued UserLogs rows are written before the worker goes away
+    if not user_log_writer.flush(timeout):
+        print("User log writer did not drain before shutdown")
+    user_log_writer.stop(timeout)
+
+    # Keep this worker's cache counters in the diagnostics after it exits
+    shared_cache.flush_stats()
+
+    dispose_pool()
+    reset_http_session()
+
+
+def register_app_routes(app):
+    """Register index, admin shell, report token, error and debug routes"""
+
+    @app.route('/')
+    def index():
+        """
+        Index route - redirect to login or dashboard based on session
+        """
+        if 'user_id' in session:
+            return redirect(url_for('user_dashboard'))
+        return redirect(url_for('login')) # in login_logout.py
+
+    @app.route('/admin')
+    @admin_required
+    def admin_dashboard():
+        """
+        Admin and Superuser dashboard shell (each tab is loaded from /admin/tab/<tab>)
+        """
+        context = {
+            'username': session.get('username'),
+            'role': session.get('role')
+        }
     
-    context = {
-        'username': session.get('username'),
-        'role': session.get('role'),
-        'users': users,
-        'departments': departments,
-        'dashboards': dashboards,
-        'permissions': permissions,
-        'departments_with_dashboards': departments_with_dashboards,
-        'user_logs': user_logs,
-        'users_count': users_count,
-        'departments_count': departments_count,
-        'active_dashboards_count': active_dashboards_count
-    }
-    
-    return render_template('admin/admin_dashboard.html', **context)
-
+        return render_template('admin/admin_dashboard.html', **context)
 
-@app.route('/admin/report-token/<int:dashboard_id>', methods=['POST'])
-@admin_required
-def admin_report_token(dashboard_id):
-    """
-    Generate Power BI embed token for a dashboard from database
-    """
-    from Backend.user_backend.user_interface import get_dashboard_by_id
+    @app.route('/admin/report-token/<int:dashboard_id>', methods=['POST'])
+    @admin_required
+    def admin_report_token(dashboard_id):
+        """
+        Generate Power BI embed token for a dashboard from database
+        """
+        from Backend.user_backend.user_interface import get_dashboard_by_id
 
-    try:
-        dashboard = get_dashboard_by_id(dashboard_id)
+        try:
+            dashboard = get_dashboard_by_id(dashboard_id)
 
-        if not dashboard:
-            return {'success': False, 'error': 'Dashboard not found'}, 404
+            if not dashboard:
+                return {'success': False, 'error': 'Dashboard not found'}, 404
 
-        from Backend.DB_backend.db_connection import get_db_connection, close_db_connection
-        import os
-        from dotenv import load_dotenv
-        from flask import jsonify
-        
-        load_dotenv()
-        
-        POWERBI_CLIENT_ID = os.getenv('POWERBI_CLIENT_ID')
-        POWERBI_CLIENT_SECRET = os.getenv('POWERBI_CLIENT_SECRET')
-        POWERBI_TENANT_ID = os.getenv('POWERBI_TENANT_ID')
+            client_id = POWERBI_CLIENT_ID
+            tenant_id = POWERBI_TENANT_ID
+            client_secret = POWERBI_CLIENT_SECRET
         
-        client_id = POWERBI_CLIENT_ID
-        tenant_id = POWERBI_TENANT_ID
-        client_secret = POWERBI_CLIENT_SECRET
+            report_id = dashboard['ReportID']
+            group_id = dashboard['GroupID']
+            core_dataset = dashboard['CoreDatasetID']
+            proxy_dataset = dashboard['ProxyDatasetID'] or ''
         
-        report_id = dashboard['ReportID']
-        group_id = dashboard['GroupID']
-        core_dataset = dashboard['CoreDatasetID']
-        proxy_dataset = dashboard['ProxyDatasetID'] or ''
+            if not all([client_id, tenant_id, client_secret, report_id, group_id, core_dataset]):
+                return jsonify({'success': False, 'error': 'Invalid dashboard configuration'}), 400
         
-        if not all([client_id, tenant_id, client_secret, report_id, group_id, core_dataset]):
-            return jsonify({'success': False, 'error': 'Invalid dashboard configuration'}), 400
+            token_args = {
+                'client_id': client_id,
+                'tenant_id': tenant_id,
+                'client_secret': client_secret,
+                'report_id': report_id,
+                'group_id': group_id,
+                'core_dataset': core_dataset,
+                'proxy_dataset': proxy_dataset,
+                'username': session.get('email'),
+                'roles': ['RM']
+            }
+            timings = {}
+            token, embed_url, workspace_name, report_name, error = get_embed_token(**token_args, timings=timings)
         
-        token, embed_url, workspace_name, report_name, error = get_embed_token(
-            client_id=client_id,
-            tenant_id=tenant_id,
-            client_secret=client_secret,
-            report_id=report_id,
-            group_id=group_id,
-            core_dataset=core_dataset,
-            proxy_dataset=proxy_dataset,
-            username=session.get('email'),
-            roles=['RM']
-        )
+            if error:
+                return jsonify({'success': False, 'error': error}), 400
         
-        if error:
-            return jsonify({'success': False, 'error': error}), 400
+            # The report page heartbeats this session and picks up background-refreshed tokens
+            embed_session_scheduler.register(session.get('user_id'), dashboard_id, token_args, department_id=session.get('department_id'))
         
-        return jsonify({
-            'success': True,
-            'token': token,
-            'embed_url': embed_url,
-            'report_id': report_id,
-            'workspace_name': workspace_name,
-            'report_name': report_name,
-            'dashboard_name': dashboard['DashboardName'],
-            'message': 'Report token generated successfully!'
-        }), 200
+            return jsonify({
+                'success': True,
+                'token': token,
+                'embed_url': embed_url,
+                'report_id': report_id,
+                'workspace_name': workspace_name,
+                'report_name': report_name,
+                'dashboard_name': dashboard['DashboardName'],
+                'dashboard_id': dashboard_id,
+                'timings': timings,
+                'message': 'Report token generated successfully!'
+            }), 200
     
-    except Exception as e:
-        print(f"Error generating report token: {e}")
-        from flask import jsonify
-        return jsonify({'success': False, 'error': str(e)}), 500
+        except Exception as e:
+            print(f"Error generating report token: {e}")
+            return jsonify({'success': False, 'error': str(e)}), 500
 
+    @app.errorhandler(404)
+    def not_found(error):
+        """Handle 404 errors"""
+        return render_template('error.html', error_code=404, error_message='Page not found'), 404
 
-@app.errorhandler(404)
-def not_found(error):
-    """Handle 404 errors"""
-    return render_template('error.html', error_code=404, error_message='Page not found'), 404
+    @app.errorhandler(500)
+    def internal_error(error):
+        """Handle 500 errors"""
+        return render_template('error.html', error_code=500, error_message='Internal server error'), 500
 
+    @app.route('/debug/test-db', methods=['GET'])
+    @admin_required
+    def test_db():
+        """
+        Test database connection (admins only)
+        """
+        conn = get_db_connection()
+        if conn:
+            close_db_connection(conn)
+            return "Database connection successful!", 200
+        return "Database connection failed!", 500
 
-@app.errorhandler(500)
-def internal_error(error):
-    """Handle 500 errors"""
-    return render_template('error.html', error_code=500, error_message='Internal server error'), 500
 
-
-@app.route('/debug/test-db', methods=['GET'])
-def test_db():
-    """
-    Test database connection (remove in production)
-    """
-    conn = get_db_connection()
-    if conn:
-        close_db_connection(conn)
-        return "Database connection successful!", 200
-    return "Database connection failed!", 500
+# WSGI entry point (gunicorn app:app)
+app = create_app()
 
 
 if __name__ == '__main__':
+    # Development server; production runs gunicorn -c gunicorn.conf.py app:app
+    start_background_tasks()
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port,debug=True)
-
+    debug = os.getenv('FLASK_DEBUG', 'false').lower() in ('1', 'true', 'yes')
+    app.run(host='0.0.0.0', port=port, debug=debug, threaded=True)
@@ -0,0 +1,157 @@
+#bench_departments_with_dashboards.py
+#
+# Compares the old per-department query loop with the bulk version of
+# get_departments_with_dashboards at 10, 100 and 1000 departments.
+# Runs against an in-memory SQLite copy of the three tables; every query
+# pays --rtt-ms of simulated network round trip to the database server.
+#
+#   python benchmarks/bench_departments_with_dashboards.py [--rtt-ms 1.0] [--repeat 5]
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Backend.admin_backend import admin_departments
+
+DEPARTMENT_COUNTS = (10, 100, 1000)
+DASHBOARD_COUNT = 60
+GRANTS_PER_DEPARTMENT = 6
+
+
+class LatencyCursor:
+    def __init__(self, cursor, rtt):
+        self.cursor = cursor
+        self.rtt = rtt
+        self.queries = 0
+
+    def execute(self, query, params=()):
+        time.sleep(self.rtt)
+        self.queries += 1
+        self.cursor.execute(query, params)
+        return self
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+
+class LatencyConnection:
+    def __init__(self, conn, rtt):
+        self.conn = conn
+        self.rtt = rtt
+        self.last_cursor = None
+
+    def cursor(self):
+        self.last_cursor = LatencyCursor(self.conn.cursor(), self.rtt)
+        return self.last_cursor
+
+
+def build_database(department_count):
+    conn = sqlite3.connect(':memory:')
+    conn.executescript("""
+        CREATE TABLE Departments (DepartmentID INTEGER PRIMARY KEY, DepartmentName TEXT, CreatedAt TEXT);
+        CREATE TABLE Dashboards (DashboardID INTEGER PRIMARY KEY, DashboardName TEXT, Status TEXT, Description TEXT,
+                                 CreatedBy TEXT, CreatedAt TEXT, DashboardOwner TEXT);
+        CREATE TABLE DepartmentDashboards (DepartmentDashboardID INTEGER PRIMARY KEY, DepartmentID INTEGER,
+                                           DashboardID INTEGER, GrantedAt TEXT, GrantedBy TEXT);
+        CREATE INDEX dd_department ON DepartmentDashboards (DepartmentID);
+    """)
+    rng = random.Random(department_count)
+    conn.executemany(
+        "INSERT INTO Departments VALUES (?, ?, '2024-01-01')",
+        [(i, f"Department {i:04d}") for i in range(1, department_count + 1)]
+    )
+    conn.executemany(
+        "INSERT INTO Dashboards VALUES (?, ?, 'Active', NULL, 'admin', '2024-01-01', NULL)",
+        [(i, f"Dashboard {i:03d}") for i in range(1, DASHBOARD_COUNT + 1)]
+    )
+    grants = []
+    for dept_id in range(1, department_count + 1):
+        for dashboard_id in rng.sample(range(1, DASHBOARD_COUNT + 1), GRANTS_PER_DEPARTMENT):
+            grants.append((dept_id, dashboard_id))
+    conn.executemany(
+        "INSERT INTO DepartmentDashboards (DepartmentID, DashboardID, GrantedAt, GrantedBy) VALUES (?, ?, '2024-01-02', 'admin')",
+        grants
+    )
+    return conn
+
+
+def legacy_departments_with_dashboards(conn):
+    """
+    The previous implementation: one dashboards query per department
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT DepartmentID, DepartmentName, CreatedAt FROM Departments ORDER BY DepartmentName")
+    departments = cursor.fetchall()
+
+    result = []
+    for dept in departments:
+        cursor.execute("""
+            SELECT DISTINCT d.DashboardID, d.DashboardName, d.Status, d.Description,
+                   d.CreatedBy, d.CreatedAt, dd.GrantedAt, dd.GrantedBy, d.DashboardOwner
+            FROM Dashboards d
+            INNER JOIN DepartmentDashboards dd ON d.DashboardID = dd.DashboardID
+            WHERE dd.DepartmentID = ?
+            ORDER BY d.DashboardName
+        """, (dept[0],))
+        dashboards = [
+            dict(zip(('DashboardID', 'DashboardName', 'Status', 'Description', 'CreatedBy',
+                      'CreatedAt', 'GrantedAt', 'GrantedBy', 'DashboardOwner'), dash))
+            for dash in cursor.fetchall()
+        ]
+        result.append({
+            'DepartmentID': dept[0],
+            'DepartmentName': dept[1],
+            'CreatedAt': dept[2],
+            'DashboardCount': len(dashboards),
+            'Dashboards': dashboards
+        })
+    return result
+
+
+def time_call(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark get_departments_with_dashboards')
+    parser.add_argument('--rtt-ms', type=float, default=1.0, help='simulated database round trip per query')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measurement (best is reported)')
+    args = parser.parse_args()
+    rtt = args.rtt_ms / 1000
+
+    print(f"Simulated round trip: {args.rtt_ms} ms per query, best of {args.repeat}")
+    print(f"{'departments':>12} {'old queries':>12} {'old ms':>10} {'new queries':>12} {'new ms':>10} {'speedup':>8}")
+
+    for department_count in DEPARTMENT_COUNTS:
+        conn = LatencyConnection(build_database(department_count), rtt)
+        admin_departments.get_db_connection = lambda: conn
+        admin_departments.close_db_connection = lambda c: None
+
+        old_time, old_result = time_call(lambda: legacy_departments_with_dashboards(conn), args.repeat)
+        old_queries = conn.last_cursor.queries
+        new_time, new_result = time_call(admin_departments._fetch_departments_with_dashboards, args.repeat)
+        new_queries = conn.last_cursor.queries
+
+        if old_result != new_result:
+            print(f"Result mismatch at {department_count} departments")
+            sys.exit(1)
+
+        print(f"{department_count:>12} {old_queries:>12} {old_time * 1000:>10.1f} {new_queries:>12} {new_time * 1000:>10.1f} {old_time / new_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
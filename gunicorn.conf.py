@@ -0,0 +1,67 @@
+#gunicorn.conf.py
+
+import multiprocessing
+import os
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    # dotenv not available (that's okay in production)
+    pass
+
+# Production server: gunicorn -c gunicorn.conf.py app:app
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+
+# Each worker has its own DB pool (DB_POOL_SIZE), caches and background threads,
+# so scale with threads before processes
+workers = int(os.getenv('GUNICORN_WORKERS', str(max(2, min(multiprocessing.cpu_count(), 4)))))
+
+# Requests mostly wait on Power BI, Graph and SQL: threads, not processes, cover that wait
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
+
+# An admin event stream holds a thread for its lifetime; keep most threads for requests
+os.environ.setdefault('ADMIN_EVENTS_MAX_CONNECTIONS', str(max(1, threads // 4)))
+
+# Seconds before the master replaces a worker that stops responding
+# (gthread workers report in between requests, so slow embed calls and event streams are not cut)
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+# Seconds a stopping worker gets to finish requests, drain the log writer and close pools
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+# Idle keep-alive connections are parked off the thread pool; keep above the load balancer's idle timeout
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '65'))
+
+# Import the app (and every module's configuration) once in the master, then fork workers
+preload_app = True
+
+# Worker heartbeat files in memory (a disk-backed /tmp can stall heartbeats in containers)
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+# Set GUNICORN_ACCESS_LOG empty to turn request logging off
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    """
+    Per-worker setup. The DB pool, shared cache and executors notice the new pid and
+    start empty; this builds the worker's HTTP session and starts its background
+    threads, whose warmups fill the caches and the pool.
+    """
+    from Backend.http_backend.http_client import get_http_session
+    from app import start_background_tasks
+
+    get_http_session()
+    start_background_tasks()
+
+
+def worker_exit(server, worker):
+    """
+    Drain queued UserLogs rows, stop background threads, flush cache counters and close pools
+    """
+    from app import shutdown_background_tasks
+
+    shutdown_background_tasks(timeout=max(1, graceful_timeout // 3))
@@ -0,0 +1,178 @@
+#test_connection_pool.py
+#
+# ConnectionPool checkout, timeout, recycling and fork reset against fake
+# pyodbc connections (no database needed; pyodbc itself must be installed).
+#
+#   python -m unittest discover tests
+
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import pyodbc
+    from Backend.DB_backend import db_connection
+    from Backend.DB_backend.db_connection import ConnectionPool, PoolTimeoutError
+except ImportError:
+    pyodbc = None
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, *params):
+        if self.conn.broken:
+            raise pyodbc.Error('08S01', 'Communication link failure')
+        return self
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.broken = False
+        self.closed = False
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+@unittest.skipIf(pyodbc is None, 'pyodbc is not installed')
+class ConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.created = []
+        patcher = mock.patch.object(db_connection.pyodbc, 'connect', side_effect=self._connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _connect(self, connection_string):
+        conn = FakeConnection()
+        self.created.append(conn)
+        return conn
+
+    def test_released_connection_is_reused(self):
+        pool = ConnectionPool('dsn', max_size=2)
+        conn = pool.acquire()
+        conn.close()
+        conn = pool.acquire()
+
+        self.assertEqual(len(self.created), 1)
+        self.assertEqual(self.created[0].rollbacks, 1)
+        stats = pool.stats()
+        self.assertEqual((stats['creations'], stats['checkouts'], stats['in_use'], stats['idle']), (1, 2, 1, 0))
+        conn.close()
+
+    def test_returned_wrapper_cannot_be_used(self):
+        pool = ConnectionPool('dsn')
+        conn = pool.acquire()
+        conn.close()
+        with self.assertRaises(pyodbc.ProgrammingError):
+            conn.cursor()
+
+    def test_checkout_times_out_when_pool_is_full(self):
+        pool = ConnectionPool('dsn', max_size=1, timeout=0.05)
+        held = pool.acquire()
+
+        with self.assertRaises(PoolTimeoutError):
+            pool.acquire()
+        stats = pool.stats()
+        self.assertEqual((stats['timeouts'], stats['in_use']), (1, 1))
+        held.close()
+
+    def test_waiting_checkout_gets_released_connection(self):
+        pool = ConnectionPool('dsn', max_size=1, timeout=5)
+        held = pool.acquire()
+        threading.Timer(0.05, held.close).start()
+
+        conn = pool.acquire()
+        self.assertIs(conn._conn, self.created[0])
+        stats = pool.stats()
+        self.assertEqual((stats['waits'], stats['creations']), (1, 1))
+        self.assertGreater(stats['wait_time_max'], 0)
+        conn.close()
+
+    def test_old_connection_is_closed_instead_of_reused(self):
+        pool = ConnectionPool('dsn', max_age=-1)
+        pool.acquire().close()
+
+        self.assertTrue(self.created[0].closed)
+        stats = pool.stats()
+        self.assertEqual((stats['recycled'], stats['idle'], stats['in_use']), (1, 0, 0))
+
+    def test_dead_idle_connection_is_replaced(self):
+        pool = ConnectionPool('dsn', ping_idle=-1)
+        pool.acquire().close()
+        self.created[0].broken = True
+
+        conn = pool.acquire()
+        self.assertIs(conn._conn, self.created[1])
+        self.assertTrue(self.created[0].closed)
+        self.assertEqual(pool.stats()['ping_failures'], 1)
+        conn.close()
+
+    def test_discarded_connection_is_closed_and_frees_its_slot(self):
+        pool = ConnectionPool('dsn', max_size=1, timeout=0.05)
+        pool.acquire().discard()
+
+        self.assertTrue(self.created[0].closed)
+        conn = pool.acquire()
+        self.assertIs(conn._conn, self.created[1])
+        stats = pool.stats()
+        self.assertEqual((stats['discarded'], stats['in_use'], stats['idle']), (1, 1, 0))
+        conn.close()
+
+    def test_failed_connect_frees_its_slot(self):
+        pool = ConnectionPool('dsn', max_size=1, timeout=0.05)
+        with mock.patch.object(db_connection.pyodbc, 'connect', side_effect=pyodbc.Error('HYT00', 'Login timeout')):
+            with self.assertRaises(pyodbc.Error):
+                pool.acquire()
+
+        pool.acquire().close()
+        self.assertEqual(pool.stats()['in_use'], 0)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs os.fork')
+    def test_forked_child_starts_with_an_empty_pool(self):
+        pool = ConnectionPool('dsn', max_size=2)
+        held = pool.acquire()
+        pool.acquire().close()
+        inherited_idle = self.created[1]
+
+        pid = os.fork()
+        if pid == 0:
+            ok = False
+            try:
+                # Checked out in the parent: the child must not put it in its own pool
+                held.close()
+                conn = pool.acquire()
+                stats = pool.stats()
+                ok = (conn._conn is self.created[2] and not inherited_idle.closed
+                      and stats['creations'] == 1 and stats['in_use'] == 1 and stats['idle'] == 0
+                      and stats['pid'] == os.getpid())
+            finally:
+                os._exit(0 if ok else 1)
+
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertEqual(pool.stats()['in_use'], 1)
+        held.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+#test_server_sessions.py
+#
+# ServerSessionInterface on a throwaway Flask app: session id rotation on
+# login, sliding expiry, logout and tampered cookies. Sessions live in a
+# SQLiteSessionStore in a temporary directory.
+#
+#   python -m unittest discover tests
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, session, jsonify
+from Backend.DB_backend.session_store import SessionStore, SQLiteSessionStore, ServerSessionInterface
+
+
+def create_app(interface, lifetime=3600):
+    app = Flask(__name__)
+    app.secret_key = 'test-secret'
+    app.permanent_session_lifetime = timedelta(seconds=lifetime)
+    app.session_interface = interface
+
+    @app.route('/login/<int:user_id>')
+    def login(user_id):
+        session['user_id'] = user_id
+        return 'ok'
+
+    @app.route('/set/<value>')
+    def set_value(value):
+        session['value'] = value
+        return 'ok'
+
+    @app.route('/whoami')
+    def whoami():
+        return jsonify(user_id=session.get('user_id'), value=session.get('value'))
+
+    @app.route('/logout')
+    def logout():
+        session.clear()
+        return 'ok'
+
+    return app
+
+
+class ServerSessionInterfaceTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = SQLiteSessionStore(os.path.join(directory.name, 'sessions.sqlite3'))
+        self.interface = ServerSessionInterface(self.store, touch_interval=300, purge_interval=3600)
+
+    def _client(self, lifetime=3600):
+        self.app = create_app(self.interface, lifetime)
+        return self.app.test_client()
+
+    def _sid(self, client):
+        cookie = client.get_cookie(self.app.config['SESSION_COOKIE_NAME'])
+        if cookie is None:
+            return None
+        return self.interface._signer(self.app).unsign(cookie.value).decode('utf-8')
+
+    def test_store_interface_is_abstract(self):
+        with self.assertRaises(TypeError):
+            SessionStore()
+
+    def test_cookie_carries_only_the_session_id(self):
+        client = self._client()
+        client.get('/login/1')
+        sid = self._sid(client)
+
+        self.assertIsNotNone(self.store.load(sid))
+        self.assertNotIn('user_id', client.get_cookie('session').value)
+        self.assertEqual(client.get('/whoami').get_json()['user_id'], 1)
+
+    def test_empty_session_sets_no_cookie(self):
+        client = self._client()
+        client.get('/whoami')
+        self.assertIsNone(self._sid(client))
+
+    def test_login_as_another_user_rotates_the_session_id(self):
+        client = self._client()
+        client.get('/login/1')
+        first = self._sid(client)
+
+        client.get('/set/x')
+        self.assertEqual(self._sid(client), first)
+
+        client.get('/login/2')
+        second = self._sid(client)
+        self.assertNotEqual(second, first)
+        self.assertIsNone(self.store.load(first))
+        self.assertEqual(client.get('/whoami').get_json(), {'user_id': 2, 'value': 'x'})
+        self.assertEqual(self.interface.stats()['rotations'], 1)
+
+    def test_session_expires_after_its_lifetime(self):
+        client = self._client(lifetime=0.1)
+        client.get('/login/1')
+        sid = self._sid(client)
+
+        time.sleep(0.2)
+        self.assertIsNone(self.store.load(sid))
+        self.assertIsNone(client.get('/whoami').get_json()['user_id'])
+        self.assertEqual(self.interface.stats()['misses'], 1)
+
+    def test_unchanged_session_is_touched_not_rewritten(self):
+        self.interface.touch_interval = 0
+        client = self._client()
+        client.get('/login/1')
+        _, expires_at = self.store.load(self._sid(client))
+
+        time.sleep(0.01)
+        client.get('/whoami')
+        _, touched_until = self.store.load(self._sid(client))
+        self.assertGreater(touched_until, expires_at)
+        stats = self.interface.stats()
+        self.assertEqual((stats['saves'], stats['touches']), (1, 1))
+
+    def test_touch_is_skipped_within_the_touch_interval(self):
+        client = self._client()
+        client.get('/login/1')
+        client.get('/whoami')
+        stats = self.interface.stats()
+        self.assertEqual((stats['saves'], stats['touches']), (1, 0))
+
+    def test_logout_deletes_the_session(self):
+        client = self._client()
+        client.get('/login/1')
+        sid = self._sid(client)
+
+        client.get('/logout')
+        self.assertIsNone(self.store.load(sid))
+        self.assertIsNone(self._sid(client))
+
+    def test_tampered_cookie_starts_a_new_session(self):
+        client = self._client()
+        client.get('/login/1')
+        client.set_cookie('session', client.get_cookie('session').value + 'x')
+
+        self.assertIsNone(client.get('/whoami').get_json()['user_id'])
+        self.assertEqual(self.interface.stats()['bad_signatures'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
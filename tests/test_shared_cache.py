@@ -0,0 +1,114 @@
+#test_shared_cache.py
+#
+# SharedCache expiry, claims and invalidation, on a SQLite file in a
+# temporary directory. Two SharedCache objects on one file stand in for
+# two gunicorn workers.
+#
+#   python -m unittest discover tests
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Backend.cache_backend.shared_cache import SharedCache, InvalidationSignal
+
+
+class SharedCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'shared_cache.sqlite3')
+        self.cache = SharedCache(self.path, busy_timeout=0.05)
+
+    def test_values_round_trip_as_json(self):
+        self.cache.set('reports', 'r1', {'name': 'Sales', 'pages': ('p1', 'p2')}, ttl=60)
+        self.assertEqual(self.cache.get('reports', 'r1'), {'name': 'Sales', 'pages': ['p1', 'p2']})
+        self.assertIsNone(self.cache.get('reports', 'r2'))
+        self.assertIsNone(self.cache.get('other', 'r1'))
+
+    def test_entries_expire(self):
+        self.cache.set('tokens', 'k', 'value', ttl=0.05)
+        self.cache.set('tokens', 'never', 'value', ttl=0)
+        self.assertEqual(self.cache.get('tokens', 'k'), 'value')
+
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('tokens', 'k'))
+        self.assertIsNone(self.cache.get('tokens', 'never'))
+        self.assertEqual(self.cache.items('tokens'), [])
+        self.assertEqual(self.cache.purge_expired(), 1)
+
+    def test_add_claims_only_a_free_key(self):
+        other = SharedCache(self.path)
+        self.assertTrue(self.cache.add('lease', 'k', 1, ttl=0.05))
+        self.assertFalse(other.add('lease', 'k', 2, ttl=60))
+        self.assertEqual(other.get('lease', 'k'), 1)
+
+        time.sleep(0.1)
+        self.assertTrue(other.add('lease', 'k', 2, ttl=60))
+        self.assertEqual(self.cache.get('lease', 'k'), 2)
+
+    def test_delete_tag_and_clear(self):
+        self.cache.set('tokens', 'a', 1, ttl=60, tag='report-1')
+        self.cache.set('tokens', 'b', 2, ttl=60, tag='report-1')
+        self.cache.set('tokens', 'c', 3, ttl=60, tag='report-2')
+        self.cache.set('metadata', 'a', 4, ttl=60)
+
+        self.assertEqual(self.cache.delete_tag('tokens', 'report-1'), 2)
+        self.assertEqual(self.cache.items('tokens'), [('c', 3)])
+        self.cache.delete('tokens', 'c')
+        self.assertIsNone(self.cache.get('tokens', 'c'))
+        self.cache.clear('metadata')
+        self.assertIsNone(self.cache.get('metadata', 'a'))
+
+    def test_value_that_is_not_json_is_not_stored(self):
+        self.cache.set('reports', 'r1', object(), ttl=60)
+        self.assertIsNone(self.cache.get('reports', 'r1'))
+
+    def test_invalidation_reaches_other_workers_once(self):
+        mine = InvalidationSignal('identities', self.cache, check_interval=0)
+        theirs = InvalidationSignal('identities', SharedCache(self.path), check_interval=0)
+        self.assertFalse(mine.poll())
+        self.assertFalse(theirs.poll())
+
+        mine.send()
+        self.assertTrue(theirs.poll())
+        self.assertFalse(theirs.poll())
+        self.assertFalse(mine.poll())
+
+    def test_busy_database_is_a_miss_not_an_outage(self):
+        self.cache.set('reports', 'r1', 'old', ttl=60)
+        writer = sqlite3.connect(self.path, isolation_level=None)
+        writer.execute('BEGIN IMMEDIATE')
+        try:
+            self.cache.set('reports', 'r1', 'new', ttl=60)
+        finally:
+            writer.execute('ROLLBACK')
+            writer.close()
+
+        self.assertTrue(self.cache.enabled)
+        self.assertEqual(self.cache.stats()['busy'], 1)
+        self.assertEqual(self.cache.get('reports', 'r1'), 'old')
+
+    def test_unusable_file_disables_the_cache(self):
+        cache = SharedCache(os.path.join(self.path, 'missing', 'cache.sqlite3'))
+        self.assertIsNone(cache.get('reports', 'r1'))
+        self.assertFalse(cache.enabled)
+        self.assertIsNotNone(cache.stats()['disabled_reason'])
+
+    @unittest.skipUnless(hasattr(os, 'getuid'), 'needs POSIX file owners')
+    def test_file_writable_by_others_is_refused(self):
+        open(self.path, 'w').close()
+        os.chmod(self.path, 0o666)
+        self.assertIsNone(self.cache.get('reports', 'r1'))
+        self.assertFalse(self.cache.enabled)
+        self.assertIn('writable by other users', self.cache.disabled_reason)
+
+
+if __name__ == '__main__':
+    unittest.main()
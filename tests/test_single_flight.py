@@ -0,0 +1,124 @@
+#test_single_flight.py
+#
+# SingleFlight coalescing of concurrent calls with the same key.
+#
+#   python -m unittest discover tests
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Backend.powerbi_backend.single_flight import SingleFlight
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def _start_leader(self, flight, key, func):
+        """
+        Run func as the leader for key on a thread, returning once it is in flight
+        """
+        started = threading.Event()
+        results = []
+
+        def run():
+            try:
+                results.append(flight.do(key, lambda: (started.set(), func())[1]))
+            except Exception as e:
+                results.append(e)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        self.assertTrue(started.wait(5))
+        return thread, results
+
+    def _wait_for_waiters(self, flight, count):
+        deadline = time.monotonic() + 5
+        while flight.stats()['shared'] < count:
+            self.assertLess(time.monotonic(), deadline, 'callers never joined the flight')
+            time.sleep(0.005)
+
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            release.wait(5)
+            return 'token'
+
+        leader, leader_results = self._start_leader(flight, 'k', fetch)
+        results = []
+        waiters = [threading.Thread(target=lambda: results.append(flight.do('k', fetch))) for _ in range(4)]
+        for waiter in waiters:
+            waiter.start()
+        self._wait_for_waiters(flight, 4)
+        release.set()
+        for thread in [leader] + waiters:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(leader_results, [('token', False)])
+        self.assertEqual(results, [('token', True)] * 4)
+        self.assertEqual(flight.stats(), {'leaders': 1, 'shared': 4, 'wait_timeouts': 0, 'in_flight': 0})
+
+    def test_different_keys_do_not_wait_for_each_other(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        leader, _ = self._start_leader(flight, 'slow', lambda: release.wait(5))
+
+        self.assertEqual(flight.do('fast', lambda: 'value'), ('value', False))
+        release.set()
+        leader.join(5)
+
+    def test_error_is_raised_in_every_caller(self):
+        flight = SingleFlight()
+        release = threading.Event()
+
+        def fail():
+            release.wait(5)
+            raise RuntimeError('Power BI unavailable')
+
+        leader, leader_results = self._start_leader(flight, 'k', fail)
+        errors = []
+
+        def wait():
+            try:
+                flight.do('k', fail)
+            except RuntimeError as e:
+                errors.append(e)
+
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        self._wait_for_waiters(flight, 1)
+        release.set()
+        leader.join(5)
+        waiter.join(5)
+
+        self.assertIsInstance(leader_results[0], RuntimeError)
+        self.assertEqual(errors, [leader_results[0]])
+
+    def test_stuck_leader_does_not_block_waiters_forever(self):
+        flight = SingleFlight(wait_timeout=0.05)
+        release = threading.Event()
+        leader, _ = self._start_leader(flight, 'k', lambda: release.wait(5))
+
+        self.assertEqual(flight.do('k', lambda: 'own'), ('own', False))
+        self.assertEqual(flight.stats()['wait_timeouts'], 1)
+        release.set()
+        leader.join(5)
+
+    def test_later_calls_run_again(self):
+        flight = SingleFlight()
+        values = iter(['first', 'second'])
+        self.assertEqual(flight.do('k', lambda: next(values)), ('first', False))
+        self.assertEqual(flight.do('k', lambda: next(values)), ('second', False))
+        self.assertEqual(flight.stats()['in_flight'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
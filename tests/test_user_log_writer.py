@@ -0,0 +1,130 @@
+#test_user_log_writer.py
+#
+# UserLogWriter queueing and overflow policies, with the UserLogs insert
+# replaced by an in-memory recorder (pyodbc must be installed for the import).
+#
+#   python -m unittest discover tests
+
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from Backend.DB_backend import user_log_writer
+    from Backend.DB_backend.user_log_writer import UserLogWriter
+except ImportError:
+    user_log_writer = None
+
+
+@unittest.skipIf(user_log_writer is None, 'pyodbc is not installed')
+class UserLogWriterTest(unittest.TestCase):
+    """
+    Each test queues 'a' (the worker picks it up and is held inside the insert),
+    then 'b' (fills the one-slot queue), then 'c' (overflows).
+    """
+
+    def setUp(self):
+        self.written = []
+        self.failing = set()
+        self.release = threading.Event()
+        patcher = mock.patch.object(user_log_writer, 'write_user_logs', side_effect=self._write)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.release.set)
+
+    def _write(self, rows):
+        actions = [row[3] for row in rows]
+        if 'a' in actions:
+            self.release.wait(5)
+        if self.failing.intersection(actions):
+            return False
+        self.written.extend(actions)
+        return True
+
+    def _writer(self, policy, block_timeout=0.05):
+        writer = UserLogWriter(max_size=1, batch_size=1, flush_interval=60, overflow_policy=policy,
+                               block_timeout=block_timeout, max_retries=0)
+        self.addCleanup(writer.stop, 5)
+        self.assertTrue(writer.enqueue(1, 'user', 'user@example.com', 'a'))
+        deadline = time.monotonic() + 5
+        while writer.stats()['in_flight'] != 1:
+            self.assertLess(time.monotonic(), deadline, 'worker never picked up the first event')
+            time.sleep(0.005)
+        self.assertTrue(writer.enqueue(1, 'user', 'user@example.com', 'b'))
+        return writer
+
+    def _drain(self, writer):
+        self.release.set()
+        self.assertTrue(writer.flush(timeout=5))
+
+    def test_unknown_policy_is_rejected(self):
+        with self.assertRaises(ValueError):
+            UserLogWriter(overflow_policy='drop_everything')
+
+    def test_drop_newest_rejects_the_new_event(self):
+        writer = self._writer('drop_newest')
+        self.assertFalse(writer.enqueue(1, 'user', 'user@example.com', 'c'))
+        self._drain(writer)
+
+        self.assertEqual(self.written, ['a', 'b'])
+        self.assertEqual(writer.stats()['dropped_overflow'], 1)
+
+    def test_drop_oldest_makes_room(self):
+        writer = self._writer('drop_oldest')
+        self.assertTrue(writer.enqueue(1, 'user', 'user@example.com', 'c'))
+        self._drain(writer)
+
+        self.assertEqual(self.written, ['a', 'c'])
+        self.assertEqual(writer.stats()['dropped_overflow'], 1)
+
+    def test_block_gives_up_after_timeout(self):
+        writer = self._writer('block', block_timeout=0.05)
+        start = time.monotonic()
+        self.assertFalse(writer.enqueue(1, 'user', 'user@example.com', 'c'))
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+        self._drain(writer)
+
+        self.assertEqual(self.written, ['a', 'b'])
+        self.assertEqual(writer.stats()['dropped_overflow'], 1)
+
+    def test_block_waits_for_room(self):
+        writer = self._writer('block', block_timeout=5)
+        results = []
+        producer = threading.Thread(target=lambda: results.append(writer.enqueue(1, 'user', 'user@example.com', 'c')))
+        producer.start()
+        time.sleep(0.05)
+        self.assertEqual(results, [])
+
+        self.release.set()
+        producer.join(5)
+        self._drain(writer)
+        self.assertEqual(results, [True])
+        self.assertEqual(self.written, ['a', 'b', 'c'])
+        self.assertEqual(writer.stats()['dropped_overflow'], 0)
+
+    def test_sync_writes_inline(self):
+        writer = self._writer('sync')
+        self.assertTrue(writer.enqueue(1, 'user', 'user@example.com', 'c'))
+        self.assertEqual(self.written, ['c'])
+        self._drain(writer)
+
+        self.assertEqual(self.written, ['c', 'a', 'b'])
+        self.assertEqual(writer.stats()['written_inline'], 1)
+
+    def test_sync_counts_failed_inline_write(self):
+        writer = self._writer('sync')
+        self.failing.add('c')
+        self.assertFalse(writer.enqueue(1, 'user', 'user@example.com', 'c'))
+        self._drain(writer)
+
+        self.assertEqual(self.written, ['a', 'b'])
+        self.assertEqual(writer.stats()['dropped_error'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()